@@ -0,0 +1,50 @@
+"""
+Per-call overhead of building the OpenAI client and chain versus reusing the
+cached ones in `OpenAiSearch`. No requests are sent.
+
+PYTHONPATH=src python -m benchmarks.llm_chain_benchmark
+"""
+
+import argparse
+import functools
+import timeit
+
+from langchain_core.utils.function_calling import convert_to_openai_function
+from langchain_openai import ChatOpenAI
+from pydantic.v1.types import SecretStr
+
+from llm.defs import ITINERARY_PROMPT_TEMPLATE, Itinerary
+from llm.search import OpenAiSearch
+
+API_KEY = SecretStr("sk-benchmark")
+
+
+def build_chain_per_call(llm: OpenAiSearch) -> None:
+    model = ChatOpenAI(api_key=API_KEY, temperature=0, model=OpenAiSearch.MODEL)
+    openai_functions = [convert_to_openai_function(Itinerary)]
+    _ = ITINERARY_PROMPT_TEMPLATE | model.bind(functions=openai_functions) | llm.parser
+
+
+def cached_chain(llm: OpenAiSearch) -> None:
+    llm.get_chain(ITINERARY_PROMPT_TEMPLATE, Itinerary)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    llm = OpenAiSearch(API_KEY)
+
+    for name, func in [("build per call", build_chain_per_call), ("cached", cached_chain)]:
+        seconds = timeit.timeit(functools.partial(func, llm), number=args.iterations)
+        print(f"{name:>15}: {seconds / args.iterations * 1e6:10.1f} us/call")
+
+    llm.close()
+
+
+if __name__ == "__main__":
+    main()
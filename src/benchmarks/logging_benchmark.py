@@ -0,0 +1,154 @@
+"""
+Per-itinerary cost of the search diagnostics: the unconditional `print`
+calls `SearchPlaces` used to make versus level-gated logging. Runs
+`SearchPlaces.search` for a synthetic itinerary against a warm Places cache
+from several threads, so no requests are sent and the diagnostics are a large
+share of the remaining work. Output goes to /dev/null and the best of
+`--repeats` runs is reported.
+
+PYTHONPATH=src python -m benchmarks.logging_benchmark
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import os
+import time
+import typing as T
+
+import log
+import serialization
+from google import search
+from google.places_cache import PlacesCache
+from google.search import SearchPlaces
+from google.utils import Coordinates
+
+CITY = "South Beach Miami, FL"
+ACTIVITY_TYPES = ["breakfast", "morning activity", "lunch", "afternoon activity", "dinner", "bar"]
+
+
+class PrintLogger:
+    """Formats and prints every message eagerly, like the removed `print` calls"""
+
+    def __init__(self, stream: T.TextIO) -> None:
+        self.stream = stream
+
+    def isEnabledFor(self, level: int) -> bool:  # pylint: disable=invalid-name,unused-argument
+        return True
+
+    def log(self, msg: str, *args: T.Any, **_: T.Any) -> None:
+        print(msg.format(*args), file=self.stream, flush=True)
+
+    debug = info = warning = exception = log
+
+
+class StubResponse:
+    def __init__(self, body: T.Dict[str, T.Any]) -> None:
+        self.body = body
+        self.status_code = 200
+        self.headers: T.Dict[str, str] = {}
+        self.content = serialization.dumps(body)
+
+    def json(self) -> T.Dict[str, T.Any]:
+        return self.body
+
+
+class StubTransport:
+    """Answers searchText with one place and searchNearby with 20, half of them unacceptable"""
+
+    def post(self, url: str, json_data: T.Dict[str, T.Any], **_: T.Any) -> StubResponse:
+        if url.endswith("searchText"):
+            index = abs(hash(json_data["textQuery"])) % 10000
+            return StubResponse({"places": [make_place(index, 25.78, -80.13)]})
+
+        center = json_data["locationRestriction"]["circle"]["center"]
+        return StubResponse(
+            {
+                "places": [
+                    make_place(place, center["latitude"], center["longitude"], place % 2 == 0)
+                    for place in range(20)
+                ]
+            }
+        )
+
+    def get(self, url: str, **_: T.Any) -> StubResponse:
+        raise NotImplementedError(url)
+
+
+def make_place(index: int, latitude: float, longitude: float, acceptable: bool = True) -> T.Dict:
+    return {
+        "id": f"ChIJ{index:08d}abcdefghijklmnop",
+        "formattedAddress": f"{index} Ocean Dr, Miami Beach, FL 33139, USA",
+        "displayName": {"text": f"Place {index}", "languageCode": "en"},
+        "location": {"latitude": latitude + index * 1e-4, "longitude": longitude},
+        "rating": 4.4 if acceptable else 3.0,
+        "businessStatus": "OPERATIONAL",
+        "userRatingCount": 1200 + index,
+        "primaryType": "restaurant",
+        "types": ["restaurant", "food", "point_of_interest", "establishment"],
+    }
+
+
+def make_itinerary(days: int) -> T.Dict[str, T.List[str]]:
+    entries = [(day, activity) for day in range(days) for activity in ACTIVITY_TYPES]
+    return {
+        "day": [str(day + 1) for day, _ in entries],
+        "location": [f"Place {day} {activity}" for day, activity in entries],
+        "description": [f"{activity} on day {day + 1}" for day, activity in entries],
+        "activity_type": [activity for _, activity in entries],
+    }
+
+
+def run(
+    cache: PlacesCache, itinerary: T.Dict[str, T.List[str]], itineraries: int, workers: int
+) -> float:
+    def search_one(_: int) -> None:
+        SearchPlaces("benchmark", transport=StubTransport(), cache=cache).search(  # type: ignore
+            CITY, itinerary
+        )
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        list(executor.map(search_one, range(itineraries)))
+    return (time.perf_counter() - start) / itineraries
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--itineraries", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    search.get_city_center_coordinates = lambda city_name: Coordinates(lat=25.78, lng=-80.13)
+    itinerary = make_itinerary(args.days)
+    cache = PlacesCache()
+
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        log.configure("WARNING", stream=devnull)
+        print("Warming up the Places cache (rate limited)")
+        run(cache, itinerary, 1, 1)
+
+        module_logger = search.logger
+        results: T.Dict[str, float] = {}
+        modes = [("print", "INFO"), ("logging INFO", "INFO"), ("logging DEBUG", "DEBUG")]
+        for _, (name, level) in itertools.product(range(args.repeats), modes):
+            log.configure(level, stream=devnull)
+            search.logger = PrintLogger(devnull) if name == "print" else module_logger  # type: ignore
+            seconds = run(cache, itinerary, args.itineraries, args.workers)
+            results[name] = min(results.get(name, seconds), seconds)
+        search.logger = module_logger
+        log.shutdown()
+
+    for name, seconds in results.items():
+        print(f"{name:>14}: {seconds * 1e3:8.3f} ms/itinerary")
+    saved = results["print"] - results["logging INFO"]
+    print(f"{'saved':>14}: {saved * 1e3:8.3f} ms/itinerary ({saved / results['print']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Offline throughput and latency of `SearchPlaces.search`, of the whole
+pipeline (LLM itinerary, then place search, as in the batch CLI) and of the
+streaming pipeline (`pipeline.plan_trip_streaming`, place searches started as
+the itinerary streams in) against `benchmarks.stub_server`, so no network
+access or API keys are needed. The stub runs in a subprocess so it does not
+compete with the client for the GIL. It serves the places of `--fixtures`,
+by default the anonymized South Beach searchText and searchNearby responses
+in `benchmarks/fixtures`, or a synthetic pool of `--places` with
+`--fixtures ""`, and writes completions at `--tokens-per-second`.
+
+For every mode, concurrency and itinerary length it reports throughput,
+request latency percentiles, API calls per request (counted by the stub) and
+the peak RSS of this process so far. Peak RSS only grows, so scenarios run
+from the smallest to the largest. Client side rate limits are lifted to
+`--requests-per-second` (0 keeps the configured ones).
+
+PYTHONPATH=src python -m benchmarks.pipeline_benchmark --concurrency 1,8 --days 1,3
+PYTHONPATH=src python -m benchmarks.pipeline_benchmark --modes pipeline,streaming
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import os
+import resource
+import subprocess
+import sys
+import time
+import traceback
+import typing as T
+import urllib.request
+
+import numpy as np
+from pydantic.v1.types import SecretStr
+
+import log
+import serialization
+from benchmarks.stub_server import load_fixtures
+from constants import GOOGLE_API_REQUESTS_PER_SECOND
+from executables.run_trip_tap import run_request
+from google.geocode import Geocoder, set_default_geocoder
+from google.places_api import RATE_LIMITER
+from google.search import SearchPlaces
+from google.utils import Coordinates
+from llm.search import OpenAiSearch
+from pipeline import plan_trip_streaming
+
+SOURCE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FIXTURES = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "fixtures", "south_beach_places.json"
+)
+API_KEY = "stub"
+CITY = "Stub City"
+CENTER = Coordinates(lat=25.7826, lng=-80.1341)
+ACTIVITY_TYPES = ["breakfast", "morning activity", "lunch", "afternoon activity", "dinner", "bar"]
+DEFAULT_LATENCIES = ["lognormal:0.03,0.5", "chatCompletions=lognormal:0.3,0.3"]
+DEFAULT_TOKENS_PER_SECOND = 400.0
+
+
+class StubServer:
+    """`benchmarks.stub_server` in a subprocess"""
+
+    def __init__(self, stub_args: T.List[str]) -> None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [SOURCE_PATH, env.get("PYTHONPATH")]))
+        self.process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "benchmarks.stub_server", *stub_args],
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        assert self.process.stdout is not None
+        line = self.process.stdout.readline()
+        if not line.startswith("Listening on "):
+            self.close()
+            raise RuntimeError(f"Stub server did not start: {line!r}")
+        self.url = line.split()[-1]
+
+    def stats(self) -> T.Dict[str, T.Dict[str, int]]:
+        with urllib.request.urlopen(f"{self.url}/stats") as response:
+            return T.cast(T.Dict[str, T.Dict[str, int]], serialization.loads(response.read()))
+
+    def reset(self) -> None:
+        request = urllib.request.Request(f"{self.url}/stats/reset", data=b"", method="POST")
+        with urllib.request.urlopen(request):
+            pass
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.wait()
+
+
+def make_itinerary(days: int, index: int, names: T.List[str]) -> T.Dict[str, T.List[str]]:
+    """Places of the stub, named by `names`, different ones for every request"""
+    entries = [(day, activity) for day in range(days) for activity in ACTIVITY_TYPES]
+    first = index * len(entries)
+    return {
+        "day": [str(day + 1) for day, _ in entries],
+        "location": [names[(first + entry) % len(names)] for entry in range(len(entries))],
+        "description": [f"{activity} spot" for _, activity in entries],
+        "activity_type": [activity for _, activity in entries],
+    }
+
+
+def make_inputs(days: int, index: int) -> T.Dict[str, str]:
+    return {
+        "location": CITY,
+        "number_of_people": "4",
+        "date": "November 2026",
+        "duration_days": str(days),
+        "group_type": "friends",
+        "description": f"trip {index}: beach clubs, sushi and a nice steakhouse",
+    }
+
+
+def run_scenario(
+    run_one: T.Callable[[int], None], requests: int, concurrency: int
+) -> T.Tuple[float, T.List[float], int]:
+    """(wall seconds, latency of each successful request, failed requests)"""
+
+    def timed(index: int) -> T.Optional[float]:
+        start = time.perf_counter()
+        try:
+            run_one(index)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    wall_seconds = time.perf_counter() - start
+
+    latencies = [seconds for seconds in results if seconds is not None]
+    return wall_seconds, latencies, len(results) - len(latencies)
+
+
+def peak_rss_megabytes() -> float:
+    # Kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def parse_ints(value: str) -> T.List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", type=str, default="search,pipeline,streaming")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 8])
+    parser.add_argument("--days", type=parse_ints, default=[1, 3])
+    parser.add_argument("--requests", type=int, default=16, help="Requests per scenario")
+    parser.add_argument("--radius-meters", type=int, default=1500)
+    parser.add_argument("--max-nearby-places", type=int, default=None)
+    parser.add_argument("--requests-per-second", type=float, default=10000.0)
+    parser.add_argument("--places", type=int, default=2000, help="Synthetic place pool size")
+    parser.add_argument(
+        "--fixtures", type=str, default=DEFAULT_FIXTURES, help="Places responses, empty for none"
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=DEFAULT_TOKENS_PER_SECOND, help="LLM output rate"
+    )
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=None,
+        help=f"Stub latency, [ENDPOINT=]SPEC, repeatable (default {' '.join(DEFAULT_LATENCIES)})",
+    )
+    parser.add_argument(
+        "--error-rate", action="append", default=[], help="Stub error rate, [ENDPOINT=]RATE"
+    )
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    log.configure("WARNING")
+
+    stub_args = ["--places", str(args.places), "--center", f"{CENTER['lat']},{CENTER['lng']}"]
+    stub_args += [f"--latency={spec}" for spec in args.latency or DEFAULT_LATENCIES]
+    stub_args += [f"--error-rate={spec}" for spec in args.error_rate]
+    stub_args += ["--tokens-per-second", str(args.tokens_per_second)]
+    if args.fixtures:
+        stub_args += ["--fixtures", args.fixtures]
+        names = [place["displayName"]["text"] for place in load_fixtures(args.fixtures)]
+    else:
+        names = [f"Stub Place {index}" for index in range(args.places)]
+
+    if args.requests_per_second > 0:
+        for endpoint in GOOGLE_API_REQUESTS_PER_SECOND:
+            RATE_LIMITER.set_rate(endpoint, args.requests_per_second)
+    set_default_geocoder(Geocoder(lookup=lambda city_name: CENTER, requests_per_second=1e6))
+
+    stub = StubServer(stub_args)
+    llm = OpenAiSearch(SecretStr(API_KEY), base_url=f"{stub.url}/v1")
+    shared_search = SearchPlaces(
+        API_KEY, base_url=f"{stub.url}/v1", max_nearby_places=args.max_nearby_places
+    )
+
+    def search_one(days: int, index: int) -> None:
+        # `search` keeps its results on the instance, so every request gets its own
+        SearchPlaces(
+            API_KEY, base_url=f"{stub.url}/v1", max_nearby_places=args.max_nearby_places
+        ).search(CITY, make_itinerary(days, index, names), args.radius_meters)
+
+    def pipeline_one(days: int, index: int) -> None:
+        request = (str(index), make_inputs(days, index))
+        run_request(llm, shared_search, request, args.radius_meters)
+
+    def streaming_one(days: int, index: int) -> None:
+        # `iter_search_entries` also counts its calls on the instance
+        search = SearchPlaces(
+            API_KEY, base_url=f"{stub.url}/v1", max_nearby_places=args.max_nearby_places
+        )
+        plan_trip_streaming(llm, search, make_inputs(days, index), radius_meters=args.radius_meters)
+
+    runners = {"search": search_one, "pipeline": pipeline_one, "streaming": streaming_one}
+
+    results = []
+    print(
+        f"{'mode':>9} {'conc':>4} {'days':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'calls/req':>9} {'failed':>6} {'rss MB':>7}"
+    )
+    try:
+        for days, concurrency, mode in itertools.product(
+            args.days, args.concurrency, args.modes.split(",")
+        ):
+            stub.reset()
+            wall_seconds, latencies, failed = run_scenario(
+                lambda index, runner=runners[mode], days=days: runner(days, index),  # type: ignore
+                args.requests,
+                concurrency,
+            )
+            stats = stub.stats()
+            p50, p95, p99 = (
+                np.percentile(latencies, [50, 95, 99]).tolist() if latencies else [0.0] * 3
+            )
+            result = {
+                "mode": mode,
+                "concurrency": concurrency,
+                "days": days,
+                "requests": args.requests,
+                "failed": failed,
+                "throughput_per_second": args.requests / wall_seconds,
+                "p50_seconds": p50,
+                "p95_seconds": p95,
+                "p99_seconds": p99,
+                "api_calls": stats["calls"],
+                "api_errors": stats["errors"],
+                "api_calls_per_request": sum(stats["calls"].values()) / args.requests,
+                "peak_rss_megabytes": peak_rss_megabytes(),
+            }
+            results.append(result)
+            print(
+                f"{mode:>9} {concurrency:>4} {days:>4} {result['throughput_per_second']:>8.2f} "
+                f"{p50 * 1e3:>8.1f} {p95 * 1e3:>8.1f} {p99 * 1e3:>8.1f} "
+                f"{result['api_calls_per_request']:>9.1f} {failed:>6} "
+                f"{result['peak_rss_megabytes']:>7.1f}"
+            )
+    finally:
+        llm.close()
+        stub.close()
+        log.shutdown()
+
+    if args.output:
+        with open(args.output, "wb") as outfile:
+            serialization.dump(results, outfile, pretty=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Memory and parse time of cached Places responses kept as nested dicts versus
+compact `PlacesResponse` records. Uses a synthetic 20 place searchNearby body.
+
+PYTHONPATH=src python -m benchmarks.place_memory_benchmark
+"""
+
+import argparse
+import functools
+import timeit
+import tracemalloc
+import typing as T
+
+import serialization
+from google.place import PlacesResponse
+
+TYPES = ["restaurant", "bar", "night_club", "cafe", "point_of_interest", "establishment", "food"]
+
+
+def make_response(index: int, places: int = 20) -> T.Dict[str, T.Any]:
+    return {
+        "places": [
+            {
+                "id": f"ChIJ{index:08d}{place:04d}abcdefghijklmnop",
+                "formattedAddress": f"{place} Ocean Dr, Miami Beach, FL 33139, USA",
+                "displayName": {"text": f"Place {index}-{place}", "languageCode": "en"},
+                "location": {"latitude": 25.78 + place * 1e-4, "longitude": -80.13 - index * 1e-4},
+                "rating": 4.4,
+                "googleMapsUri": f"https://maps.google.com/?cid={index * 100 + place}",
+                "websiteUri": f"https://example.com/{index}/{place}",
+                "businessStatus": "OPERATIONAL",
+                "priceLevel": "PRICE_LEVEL_MODERATE",
+                "userRatingCount": 1200 + place,
+                "primaryType": TYPES[place % len(TYPES)],
+                "types": TYPES[place % 3 :],
+                "editorialSummary": {
+                    "text": "Lively spot with cocktails and small plates.",
+                    "languageCode": "en",
+                },
+                "goodForChildren": False,
+            }
+            for place in range(places)
+        ]
+    }
+
+
+def measure(build: T.Callable[[], T.List[T.Any]]) -> T.Tuple[int, T.List[T.Any]]:
+    tracemalloc.start()
+    values = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, values
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=200)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    # Serialized like the SQLite tier, so every entry gets its own strings as it would in production
+    bodies = [serialization.dumps(make_response(index)) for index in range(args.responses)]
+    places = args.responses * 20
+
+    dict_bytes, responses = measure(lambda: [serialization.loads(body) for body in bodies])
+    compact_bytes, compact = measure(
+        lambda: [PlacesResponse.from_json(serialization.loads(body)) for body in bodies]
+    )
+
+    assert all(record.to_json() == response for record, response in zip(compact, responses))
+
+    print(f"{'dict':>8}: {dict_bytes / places:8.0f} bytes/place")
+    print(f"{'compact':>8}: {compact_bytes / places:8.0f} bytes/place")
+    print(f"{'ratio':>8}: {dict_bytes / compact_bytes:8.2f}x")
+
+    response = responses[0]
+    record = compact[0]
+    for name, func in [
+        ("from_json", functools.partial(PlacesResponse.from_json, response)),
+        ("to_json", record.to_json),
+    ]:
+        seconds = timeit.timeit(func, number=args.iterations)
+        print(f"{name:>9}: {seconds / args.iterations * 1e6:8.1f} us/response")
+
+
+if __name__ == "__main__":
+    main()
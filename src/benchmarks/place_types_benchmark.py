@@ -0,0 +1,77 @@
+"""
+Type checks over a large batch of candidate places: the Table A filter of
+`nearby_search_data` as a list scan versus `place_types.table_a_types`, and
+the includedTypes match of the spatial index as a set intersection of every
+place's types versus a precomputed `place_types` bitmask.
+
+PYTHONPATH=src python -m benchmarks.place_types_benchmark
+"""
+
+import argparse
+import random
+import timeit
+import typing as T
+
+from google import place_types
+
+EXTRA_TYPES = ["food", "point_of_interest", "establishment", "health", "finance"]
+
+
+def make_places(count: int, seed: int = 0) -> T.List[T.Tuple[str, ...]]:
+    """Types of `count` places, a few Table A types plus the usual Table B ones"""
+    generator = random.Random(seed)
+    return [
+        tuple(generator.sample(place_types.TABLE_A_TYPES, generator.randint(1, 3)))
+        + tuple(generator.sample(EXTRA_TYPES, 2))
+        for _ in range(count)
+    ]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=10)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    places = make_places(args.places)
+    table_a = list(place_types.TABLE_A_TYPES)
+    included = place_types.activity_included_types("evening activity")
+    included_set = set(included)
+    included_mask = place_types.type_mask(included)
+    masks = [place_types.type_mask(types) for types in places]
+
+    assert [[t for t in types if t in table_a] for types in places] == [
+        place_types.table_a_types(types) for types in places
+    ]
+    assert [not included_set.isdisjoint(types) for types in places] == [
+        place_types.is_compatible(mask, included_mask) for mask in masks
+    ]
+
+    cases = [
+        (
+            "table A list",
+            lambda: [[t for t in types if t in table_a] for types in places],
+        ),
+        (
+            "table A set",
+            lambda: [place_types.table_a_types(types) for types in places],
+        ),
+        (
+            "match set",
+            lambda: [not included_set.isdisjoint(types) for types in places],
+        ),
+        (
+            "match mask",
+            lambda: [mask & included_mask != 0 for mask in masks],
+        ),
+    ]
+    for name, func in cases:
+        seconds = timeit.timeit(func, number=args.iterations)
+        print(f"{name:>12}: {seconds / args.iterations / args.places * 1e9:8.1f} ns/place")
+
+
+if __name__ == "__main__":
+    main()
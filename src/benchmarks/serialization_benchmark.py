@@ -0,0 +1,65 @@
+"""
+Decode and encode time of the stdlib `json` module versus `serialization`
+(orjson) on realistic 20 place searchNearby bodies. Decoding starts from the
+raw response bytes, which `requests`' `.json()` first decodes to `str`.
+
+PYTHONPATH=src python -m benchmarks.serialization_benchmark
+"""
+
+import argparse
+import json
+import timeit
+import typing as T
+
+import serialization
+from benchmarks.place_memory_benchmark import make_response
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--responses", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=20)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    responses = [make_response(index) for index in range(args.responses)]
+    bodies = [json.dumps(response, indent=2).encode("utf-8") for response in responses]
+    assert all(serialization.loads(body) == json.loads(body) for body in bodies)
+
+    cases: T.List[T.Tuple[str, T.Callable[[], T.Any], T.Callable[[], T.Any]]] = [
+        (
+            "decode",
+            lambda: [json.loads(body.decode("utf-8")) for body in bodies],
+            lambda: [serialization.loads(body) for body in bodies],
+        ),
+        (
+            "encode",
+            lambda: [json.dumps(response).encode("utf-8") for response in responses],
+            lambda: [serialization.dumps(response) for response in responses],
+        ),
+        (
+            "pretty",
+            lambda: [json.dumps(response, indent=4).encode("utf-8") for response in responses],
+            lambda: [serialization.dumps(response, pretty=True) for response in responses],
+        ),
+    ]
+
+    print(f"{'':>8} {'json us':>9} {'orjson us':>9} {'speedup':>8}")
+    for name, stdlib, fast in cases:
+        payloads = args.responses * args.iterations
+        stdlib_seconds = timeit.timeit(stdlib, number=args.iterations) / payloads
+        fast_seconds = timeit.timeit(fast, number=args.iterations) / payloads
+        print(
+            f"{name:>8} {stdlib_seconds * 1e6:>9.1f} {fast_seconds * 1e6:>9.1f} "
+            f"{stdlib_seconds / fast_seconds:>7.1f}x"
+        )
+
+    size = sum(len(body) for body in bodies) / args.responses
+    compact = sum(len(serialization.dumps(response)) for response in responses) / args.responses
+    print(f"payload: {size:.0f} bytes as returned, {compact:.0f} bytes compact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,555 @@
+"""
+Local stub of the APIs the pipeline calls, for offline benchmarks
+
+Serves the Places API (New) searchText, searchNearby and place details
+endpoints under /v1, the legacy Maps findplacefromtext, nearbysearch and
+details endpoints under /maps/api and the OpenAI chat completions endpoint
+(function calling, streamed as server-sent events when the request sets
+`stream`) under /v1/chat/completions. Places come from a synthetic pool
+scattered around `--center`, or from `--fixtures`, a JSON file of Places API
+(New) responses (`{"places": [...]}` or a list of them, e.g.
+`benchmarks/fixtures/south_beach_places.json`), and are projected onto each
+request's field mask.
+
+The model writes its function call arguments at `--tokens-per-second`
+(unlimited by default): a streamed completion sends them a few tokens at a
+time, otherwise the whole completion is sent once it is written.
+
+Every endpoint can be given a latency distribution and an error rate, either
+for all endpoints (`--latency lognormal:0.05,0.5`) or per endpoint
+(`--latency searchNearby=uniform:0.1,0.3`). Endpoint names are the rate
+limit buckets of `places_api.endpoint_name` plus `chatCompletions`.
+GET /stats returns the calls per endpoint and POST /stats/reset clears them.
+
+PYTHONPATH=src python -m benchmarks.stub_server --port 8765
+"""
+
+import argparse
+import collections
+import hashlib
+import http.server
+import itertools
+import math
+import random
+import re
+import threading
+import time
+import typing as T
+import urllib.parse
+
+import serialization
+from google.places_api import endpoint_name
+
+CHAT_COMPLETIONS = "chatCompletions"
+LEGACY_ENDPOINTS = {"findplacefromtext", "nearbysearch", "details"}
+ALL_ENDPOINTS = "*"
+
+PLACE_TYPES = [
+    "restaurant",
+    "cafe",
+    "bar",
+    "night_club",
+    "spa",
+    "museum",
+    "park",
+    "tourist_attraction",
+    "bakery",
+    "shopping_mall",
+    "art_gallery",
+    "lodging",
+]
+ACTIVITY_TYPES = [
+    "breakfast",
+    "morning activity",
+    "lunch",
+    "afternoon activity",
+    "dinner",
+    "evening activity",
+]
+# Columns of `Itinerary`, and the order of the values of each `StreamingItinerary` activity
+ITINERARY_COLUMNS = ["day", "activity_type", "location", "description"]
+METERS_PER_DEGREE = 111320.0
+# Rough size of a token, as in the `usage` of the completions
+CHARACTERS_PER_TOKEN = 4
+# Function call arguments sent per streamed chunk
+STREAM_CHUNK_CHARACTERS = 4 * CHARACTERS_PER_TOKEN
+
+PlaceType = T.Dict[str, T.Any]
+
+
+class Latency(T.NamedTuple):
+    """`constant:SECONDS`, `uniform:LOW,HIGH` or `lognormal:MEDIAN,SIGMA`"""
+
+    distribution: str
+    params: T.Tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        distribution, _, values = spec.partition(":")
+        params = tuple(float(value) for value in values.split(",") if value)
+        expected = {"constant": 1, "uniform": 2, "lognormal": 2}
+        if expected.get(distribution) != len(params):
+            raise ValueError(f"Invalid latency {spec!r}, expected {cls.__doc__}")
+        return cls(distribution, params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.distribution == "constant":
+            return self.params[0]
+        if self.distribution == "uniform":
+            return rng.uniform(*self.params)
+        median, sigma = self.params
+        return rng.lognormvariate(math.log(median), sigma) if median > 0.0 else 0.0
+
+
+def parse_per_endpoint(specs: T.Iterable[str], parse: T.Callable[[str], T.Any]) -> T.Dict:
+    """[`SPEC` | `ENDPOINT=SPEC`, ...] to {endpoint or `*`: parsed spec}"""
+    values = {}
+    for spec in specs:
+        endpoint, _, value = spec.rpartition("=")
+        values[endpoint or ALL_ENDPOINTS] = parse(value)
+    return values
+
+
+def make_place_pool(
+    size: int, latitude: float, longitude: float, radius_meters: float, seed: int
+) -> T.List[PlaceType]:
+    rng = random.Random(seed)
+    places = []
+    for index in range(size):
+        distance = radius_meters * math.sqrt(rng.random())
+        bearing = rng.uniform(0.0, 2.0 * math.pi)
+        place_latitude = latitude + distance * math.cos(bearing) / METERS_PER_DEGREE
+        place_longitude = longitude + distance * math.sin(bearing) / (
+            METERS_PER_DEGREE * math.cos(math.radians(latitude))
+        )
+        primary_type = rng.choice(PLACE_TYPES)
+        places.append(
+            {
+                "id": f"stub{index:06d}",
+                "formattedAddress": f"{index} Stub Street, Stub City",
+                "displayName": {"text": f"Stub Place {index}", "languageCode": "en"},
+                "location": {"latitude": place_latitude, "longitude": place_longitude},
+                "rating": round(rng.uniform(3.0, 5.0), 1),
+                "googleMapsUri": f"https://maps.google.com/?cid={index}",
+                "websiteUri": f"https://example.com/{index}",
+                "businessStatus": "OPERATIONAL" if rng.random() < 0.95 else "CLOSED_TEMPORARILY",
+                "priceLevel": rng.choice(["PRICE_LEVEL_INEXPENSIVE", "PRICE_LEVEL_MODERATE"]),
+                "userRatingCount": int(rng.lognormvariate(5.0, 1.5)),
+                "primaryType": primary_type,
+                "types": [primary_type, "point_of_interest", "establishment"],
+                "editorialSummary": {
+                    "text": f"A {primary_type.replace('_', ' ')} loved by locals.",
+                    "languageCode": "en",
+                },
+                "goodForChildren": rng.random() < 0.5,
+            }
+        )
+    return places
+
+
+def load_fixtures(path: str) -> T.List[PlaceType]:
+    with open(path, "rb") as infile:
+        fixtures = serialization.loads(infile.read())
+
+    responses = fixtures if isinstance(fixtures, list) else [fixtures]
+    places: T.Dict[str, PlaceType] = {}
+    for response in responses:
+        for place in response.get("places", []):
+            places.setdefault(place["id"], place)
+    return list(places.values())
+
+
+def project(place: PlaceType, field_mask: str, prefix: str = "") -> PlaceType:
+    """The fields of `place` named in a field mask, `places.` prefixed for the searches"""
+    fields = {field.strip() for field in field_mask.split(",")}
+    if f"{prefix}*" in fields:
+        return place
+    return {key: value for key, value in place.items() if f"{prefix}{key}" in fields}
+
+
+def to_legacy(place: PlaceType) -> PlaceType:
+    """A place in the legacy Maps Places format"""
+    return {
+        "place_id": place["id"],
+        "name": place.get("displayName", {}).get("text", ""),
+        "formatted_address": place.get("formattedAddress", ""),
+        "geometry": {
+            "location": {
+                "lat": place["location"]["latitude"],
+                "lng": place["location"]["longitude"],
+            }
+        },
+        "rating": place.get("rating", 0.0),
+        "user_ratings_total": place.get("userRatingCount", 0),
+        "types": place.get("types", []),
+        "business_status": place.get("businessStatus", "OPERATIONAL"),
+    }
+
+
+class StubState:
+    def __init__(
+        self,
+        places: T.List[PlaceType],
+        latencies: T.Dict[str, Latency],
+        error_rates: T.Dict[str, float],
+        error_status: int = 500,
+        seed: int = 0,
+        tokens_per_second: float = 0.0,
+    ) -> None:
+        self.places = places
+        self.by_id = {place["id"]: place for place in places}
+        self.by_name = {
+            place.get("displayName", {}).get("text", "").lower(): place for place in places
+        }
+        self.latencies = latencies
+        self.error_rates = error_rates
+        self.error_status = error_status
+        self.rng = random.Random(seed)
+        self.tokens_per_second = tokens_per_second
+        self.calls: T.Counter[str] = collections.Counter()
+        self.errors: T.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def before_response(self, endpoint: str) -> bool:
+        """Count the call, wait out its latency and return False if it should fail"""
+        with self._lock:
+            self.calls[endpoint] += 1
+            latency = self.latencies.get(endpoint, self.latencies.get(ALL_ENDPOINTS))
+            delay = latency.sample(self.rng) if latency else 0.0
+            error_rate = self.error_rates.get(endpoint, self.error_rates.get(ALL_ENDPOINTS, 0.0))
+            failed = self.rng.random() < error_rate
+            if failed:
+                self.errors[endpoint] += 1
+        time.sleep(delay)
+        return not failed
+
+    def generation_seconds(self, text: str) -> float:
+        """Time the model takes to write `text`, none if `tokens_per_second` is unlimited"""
+        if self.tokens_per_second <= 0.0:
+            return 0.0
+        return len(text) / CHARACTERS_PER_TOKEN / self.tokens_per_second
+
+    def stats(self) -> T.Dict[str, T.Dict[str, int]]:
+        with self._lock:
+            return {"calls": dict(self.calls), "errors": dict(self.errors)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.errors.clear()
+
+    def find(self, query: str) -> T.Optional[PlaceType]:
+        """The place named at the start of the query, otherwise one picked by the query's hash"""
+        name = query.lower().split(" in ")[0].split(" at ")[-1].strip()
+        if name in self.by_name:
+            return self.by_name[name]
+        if not self.places:
+            return None
+        digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        return self.places[int(digest, 16) % len(self.places)]
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        included_types: T.Optional[T.List[str]] = None,
+        max_results: int = 20,
+        min_rating: float = 0.0,
+    ) -> T.List[PlaceType]:
+        scale = math.cos(math.radians(latitude))
+        matches = []
+        for place in self.places:
+            if included_types and not set(place.get("types", [])) & set(included_types):
+                continue
+            if place.get("rating", 0.0) < min_rating:
+                continue
+            delta_latitude = (place["location"]["latitude"] - latitude) * METERS_PER_DEGREE
+            delta_longitude = (
+                (place["location"]["longitude"] - longitude) * METERS_PER_DEGREE * scale
+            )
+            if math.hypot(delta_latitude, delta_longitude) <= radius_meters:
+                matches.append(place)
+        matches.sort(key=lambda place: -place.get("userRatingCount", 0))
+        return matches[:max_results]
+
+    def itinerary(self, prompt: str, function_name: str) -> T.Dict[str, T.Any]:
+        match = re.search(r"Duration \(Days\):\s*(\d+)", prompt)
+        days = int(match.group(1)) if match else 1
+        rng = random.Random(prompt)
+        activities = [
+            {
+                "day": str(day + 1),
+                "activity_type": activity_type,
+                "location": rng.choice(self.places)["displayName"]["text"],
+                "description": f"{activity_type} spot",
+            }
+            for day in range(days)
+            for activity_type in ACTIVITY_TYPES
+        ]
+        if function_name == "StreamingItinerary":
+            return {
+                "activities": [
+                    [activity[column] for column in ITINERARY_COLUMNS] for activity in activities
+                ]
+            }
+        return {
+            column: [activity[column] for activity in activities] for column in ITINERARY_COLUMNS
+        }
+
+
+def event_stream(events: T.Iterable[T.Any]) -> T.Iterator[bytes]:
+    """Server-sent events, one `data:` line per event and then `[DONE]`, as HTTP chunks"""
+    for event in itertools.chain((serialization.dumps(event) for event in events), [b"[DONE]"]):
+        data = b"data: " + event + b"\n\n"
+        yield f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n"
+    yield b"0\r\n\r\n"
+
+
+def make_handler(  # pylint: disable=too-many-statements
+    state: StubState,
+) -> T.Type[http.server.BaseHTTPRequestHandler]:
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, body: T.Any, status: int = 200) -> None:
+            payload = serialization.dumps(body)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def send_events(self, events: T.Iterable[T.Any]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in event_stream(events):
+                self.wfile.write(chunk)
+                self.wfile.flush()
+
+        def read_json(self) -> T.Dict[str, T.Any]:
+            length = int(self.headers.get("Content-Length", 0))
+            return serialization.loads(self.rfile.read(length) or b"{}") if length else {}
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            url = urllib.parse.urlsplit(self.path)
+            if url.path == "/stats":
+                self.send_json(state.stats())
+                return
+
+            endpoint = endpoint_name(url.path)
+            if not state.before_response(endpoint):
+                self.send_json({"error": {"code": state.error_status}}, state.error_status)
+                return
+
+            query = dict(urllib.parse.parse_qsl(url.query))
+            if endpoint == "placeDetails":
+                place = state.by_id.get(url.path.rsplit("/", 1)[-1])
+                if place is None:
+                    self.send_json({"error": {"code": 404, "status": "NOT_FOUND"}}, 404)
+                else:
+                    self.send_json(project(place, self.headers.get("X-Goog-FieldMask", "*")))
+            elif endpoint in LEGACY_ENDPOINTS:
+                self.send_json(legacy_response(state, endpoint, query))
+            else:
+                self.send_json({"error": {"code": 404}}, 404)
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            path = urllib.parse.urlsplit(self.path).path
+            body = self.read_json()
+            if path == "/stats/reset":
+                state.reset()
+                self.send_json({})
+                return
+
+            endpoint = (
+                CHAT_COMPLETIONS if path.endswith("/chat/completions") else endpoint_name(path)
+            )
+            if not state.before_response(endpoint):
+                self.send_json({"error": {"code": state.error_status}}, state.error_status)
+                return
+
+            field_mask = self.headers.get("X-Goog-FieldMask", "places.*")
+            if endpoint in LEGACY_ENDPOINTS:
+                # The legacy endpoints are called with query parameters whatever the method
+                query = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query))
+                self.send_json(legacy_response(state, endpoint, query))
+            elif endpoint in ("searchText", "searchNearby"):
+                self.send_json(search_response(state, endpoint, body, field_mask))
+            elif endpoint == CHAT_COMPLETIONS and body.get("stream"):
+                self.send_events(chat_completion_chunks(state, body))
+            elif endpoint == CHAT_COMPLETIONS:
+                self.send_json(chat_completion(state, body))
+            else:
+                self.send_json({"error": {"code": 404}}, 404)
+
+        def log_message(self, *args: T.Any) -> None:  # pylint: disable=arguments-differ
+            pass
+
+    return Handler
+
+
+def search_response(
+    state: StubState, endpoint: str, body: T.Dict[str, T.Any], field_mask: str
+) -> T.Dict[str, T.Any]:
+    if endpoint == "searchText":
+        found = state.find(body.get("textQuery", ""))
+        places = [found] if found else []
+    else:
+        circle = body["locationRestriction"]["circle"]
+        places = state.nearby(
+            circle["center"]["latitude"],
+            circle["center"]["longitude"],
+            circle["radius"],
+            body.get("includedTypes"),
+            body.get("maxResultCount", 20),
+            body.get("minRating", 0.0),
+        )
+    # Like the real API, no results is an empty body
+    return {"places": [project(place, field_mask, "places.") for place in places]} if places else {}
+
+
+def legacy_response(state: StubState, endpoint: str, query: T.Dict[str, str]) -> T.Dict[str, T.Any]:
+    if endpoint == "findplacefromtext":
+        found = state.find(query.get("input", ""))
+        candidates = [to_legacy(found)] if found else []
+        return {"candidates": candidates, "status": "OK" if candidates else "ZERO_RESULTS"}
+
+    if endpoint == "nearbysearch":
+        latitude, longitude = (float(value) for value in query["location"].split(","))
+        types = [query["type"]] if query.get("type") else None
+        places = state.nearby(latitude, longitude, float(query.get("radius", 1500)), types)
+        results = [to_legacy(place) for place in places]
+        return {"results": results, "status": "OK" if results else "ZERO_RESULTS"}
+
+    place = state.by_id.get(query.get("place_id", ""))
+    if place is None:
+        return {"status": "NOT_FOUND"}
+    return {"result": to_legacy(place), "status": "OK"}
+
+
+def function_call(state: StubState, body: T.Dict[str, T.Any]) -> T.Tuple[str, str, str]:
+    """(function name, arguments, prompt) of the itinerary the model is asked for"""
+    functions = body.get("functions") or [tool["function"] for tool in body.get("tools", [])]
+    function_name = functions[0]["name"] if functions else "Itinerary"
+    prompt = "\n".join(str(message.get("content") or "") for message in body.get("messages", []))
+    return function_name, serialization.dumps_str(state.itinerary(prompt, function_name)), prompt
+
+
+def chat_completion(state: StubState, body: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+    function_name, arguments, prompt = function_call(state, body)
+    time.sleep(state.generation_seconds(arguments))
+    prompt_tokens = len(prompt) // CHARACTERS_PER_TOKEN
+    completion_tokens = len(arguments) // CHARACTERS_PER_TOKEN
+    return {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "function_call": {"name": function_name, "arguments": arguments},
+                },
+                "finish_reason": "function_call",
+            }
+        ],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def chat_completion_chunks(
+    state: StubState, body: T.Dict[str, T.Any]
+) -> T.Iterator[T.Dict[str, T.Any]]:
+    """The `chat.completion.chunk`s of a streamed completion, each once it is written"""
+    function_name, arguments, _ = function_call(state, body)
+    created = int(time.time())
+
+    def chunk(delta: T.Dict[str, T.Any], finish_reason: T.Optional[str] = None) -> T.Dict:
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    yield chunk(
+        {
+            "role": "assistant",
+            "content": None,
+            "function_call": {"name": function_name, "arguments": ""},
+        }
+    )
+    for start in range(0, len(arguments), STREAM_CHUNK_CHARACTERS):
+        piece = arguments[start : start + STREAM_CHUNK_CHARACTERS]
+        time.sleep(state.generation_seconds(piece))
+        yield chunk({"function_call": {"arguments": piece}})
+    yield chunk({}, "function_call")
+
+
+def start_stub_server(
+    state: StubState, host: str = "127.0.0.1", port: int = 0
+) -> http.server.ThreadingHTTPServer:
+    """Serve on a daemon thread, call `shutdown()` on the result to stop it"""
+    server = http.server.ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port")
+    parser.add_argument("--center", type=str, default="25.7826,-80.1341")
+    parser.add_argument("--places", type=int, default=2000, help="Size of the synthetic pool")
+    parser.add_argument("--radius-meters", type=float, default=5000.0)
+    parser.add_argument("--fixtures", type=str, default=None)
+    parser.add_argument("--latency", action="append", default=[], help="[ENDPOINT=]SPEC")
+    parser.add_argument("--error-rate", action="append", default=[], help="[ENDPOINT=]RATE")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=0.0, help="LLM output rate, 0 is unlimited"
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    latitude, longitude = (float(value) for value in args.center.split(","))
+    places = (
+        load_fixtures(args.fixtures)
+        if args.fixtures
+        else make_place_pool(args.places, latitude, longitude, args.radius_meters, args.seed)
+    )
+    state = StubState(
+        places,
+        parse_per_endpoint(args.latency, Latency.parse),
+        parse_per_endpoint(args.error_rate, float),
+        args.error_status,
+        args.seed,
+        args.tokens_per_second,
+    )
+    server = start_stub_server(state, args.host, args.port)
+    # Read by the benchmark harness to find the port
+    print(f"Listening on http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Generic two tier (in-process + SQLite) TTL/LRU cache
+
+Values must be JSON serializable. Values returned from the in-process tier are
+the cached objects themselves, so callers should treat them as read-only.
+"""
+
+import asyncio
+import collections
+import os
+import sqlite3
+import threading
+import time
+import typing as T
+
+import serialization
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+DEFAULT_MEMORY_MAX_ENTRIES = 2048
+DEFAULT_DISK_MAX_ENTRIES = 100000
+# How many writes happen between trims of the on-disk table
+DISK_TRIM_INTERVAL = 256
+
+
+class LruCache:
+    """Thread-safe in-memory cache with a per-entry TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MEMORY_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: T.OrderedDict[str, T.Tuple[float, T.Any]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> T.Optional[T.Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: T.Any, ttl_seconds: T.Optional[float] = None) -> None:
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+
+        with self._lock:
+            self._entries[key] = (time.time() + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCache:
+    """
+    Persistent cache table in a SQLite file.
+
+    Entries expire after the TTL and, once the table grows past `max_entries`,
+    the least recently read entries are deleted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        table: str = "cache",
+        max_entries: int = DEFAULT_DISK_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    ) -> None:
+        assert table.isidentifier(), f"Invalid table name {table}"
+
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_accessed_at ON {table} (accessed_at)"
+            )
+
+    def get(self, key: str) -> T.Optional[T.Any]:
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key: str) -> T.Optional[T.Tuple[T.Any, float]]:
+        """Return the cached value and the time it expires at"""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at < now:
+                self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+
+            self._connection.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+
+        return serialization.loads(value), expires_at
+
+    def put(self, key: str, value: T.Any, ttl_seconds: T.Optional[float] = None) -> None:
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        now = time.time()
+        serialized = serialization.dumps_str(value)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, serialized, now + ttl_seconds, now),
+            )
+            self._writes += 1
+            if self._writes % DISK_TRIM_INTERVAL == 0:
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        self._connection.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        self._connection.execute(
+            f"DELETE FROM {self.table} WHERE key IN ("
+            f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def items(self) -> T.List[T.Tuple[str, T.Any]]:
+        """All unexpired (key, value) pairs, least recently read first"""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT key, value FROM {self.table} WHERE expires_at >= ? "
+                "ORDER BY accessed_at",
+                (time.time(),),
+            ).fetchall()
+        return [(key, serialization.loads(value)) for key, value in rows]
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(f"DELETE FROM {self.table}")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._connection.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0])
+
+
+class TieredCache:
+    """
+    In-process LRU in front of an optional SQLite table.
+
+    Disk hits are promoted into memory. Hit and miss counters are kept per tier.
+    Subclasses can keep a more compact form of the values in memory by
+    overriding `to_memory` and `from_memory`.
+    """
+
+    def __init__(self, memory: LruCache, disk: T.Optional[SqliteCache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def to_memory(self, value: T.Any) -> T.Any:
+        return value
+
+    def from_memory(self, value: T.Any) -> T.Any:
+        return value
+
+    def get(self, key: str) -> T.Optional[T.Any]:
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        return self._promote(key, self.disk.get_entry(key) if self.disk is not None else None)
+
+    def put(self, key: str, value: T.Any, ttl_seconds: T.Optional[float] = None) -> None:
+        self.memory.put(key, self.to_memory(value), ttl_seconds)
+        if self.disk is not None:
+            self.disk.put(key, value, ttl_seconds)
+
+    async def get_async(self, key: str) -> T.Optional[T.Any]:
+        """`get` that reads the SQLite tier in a worker thread, off the event loop"""
+        value = self._get_memory(key)
+        if value is not None:
+            return value
+        entry = await asyncio.to_thread(self.disk.get_entry, key) if self.disk is not None else None
+        return self._promote(key, entry)
+
+    async def put_async(
+        self, key: str, value: T.Any, ttl_seconds: T.Optional[float] = None
+    ) -> None:
+        """`put` that writes the SQLite tier in a worker thread, off the event loop"""
+        self.memory.put(key, self.to_memory(value), ttl_seconds)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, value, ttl_seconds)
+
+    def _get_memory(self, key: str) -> T.Optional[T.Any]:
+        value = self.memory.get(key)
+        if value is None:
+            return None
+        self._count("memory_hits")
+        return self.from_memory(value)
+
+    def _promote(self, key: str, entry: T.Optional[T.Tuple[T.Any, float]]) -> T.Optional[T.Any]:
+        """Move a disk hit (if any) into memory"""
+        if entry is None:
+            self._count("misses")
+            return None
+        value, expires_at = entry
+        self.memory.put(key, self.to_memory(value), ttl_seconds=expires_at - time.time())
+        self._count("disk_hits")
+        return value
+
+    @property
+    def hits(self) -> int:
+        return self.stats["memory_hits"] + self.stats["disk_hits"]
+
+    @property
+    def misses(self) -> int:
+        return self.stats["misses"]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
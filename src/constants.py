@@ -1,3 +1,7 @@
+# Default API endpoints, overridable per client (e.g. with a local stub server for benchmarks)
+GOOGLE_PLACES_API_BASE_URL = "https://places.googleapis.com/v1"
+GOOGLE_MAPS_API_BASE_URL = "https://maps.googleapis.com/maps/api"
+
 # Fields to be returned by detailed search
 DEFAULT_FIELDS = [
     "places.id",
@@ -15,6 +19,120 @@ DEFAULT_FIELDS = [
     "places.editorialSummary",
     "places.goodForChildren",
 ]
+# Cheap tier for nearby searches: only what filtering and ranking need, which keeps them off the
+# Atmosphere SKU (editorialSummary, goodForChildren) and drops most of the payload
+NEARBY_FILTER_FIELDS = [
+    "places.id",
+    "places.location",
+    "places.rating",
+    "places.businessStatus",
+    "places.userRatingCount",
+    "places.primaryType",
+    "places.types",
+]
+# Place Details fields fetched for the nearby places that are kept when `max_nearby_places` caps
+# them, see SearchPlaces.hydrate_place_details. Only what is displayed, and no Atmosphere fields
+PLACE_DETAILS_FIELDS = [
+    "id",
+    "displayName",
+    "formattedAddress",
+    "googleMapsUri",
+    "websiteUri",
+    "priceLevel",
+]
 
 MIN_RATING = 3.5
 MIN_RATING_COUNT = 100
+
+# Score terms used to rank nearby alternatives, see google.ranking.score
+NEARBY_RANKING_WEIGHTS = {
+    "type_match": 1.0,
+    "distance": 1.0,
+    "rating": 0.5,
+    "rating_count": 0.25,
+}
+# Distance that costs one `distance` weight
+NEARBY_RANKING_DISTANCE_SCALE_METERS = 1500.0
+# Rating count that earns the full `rating_count` weight (log scaled)
+NEARBY_RANKING_RATING_COUNT_SCALE = 5000
+
+# Places response cache
+PLACES_CACHE_TTL_SECONDS = 24 * 60 * 60
+PLACES_CACHE_MEMORY_MAX_ENTRIES = 4096
+PLACES_CACHE_DISK_MAX_ENTRIES = 200000
+# 4 decimal places is roughly 11 meters
+PLACES_CACHE_COORDINATE_DECIMALS = 4
+
+# Result cap of a single searchNearby request
+NEARBY_MAX_RESULTS = 20
+# Largest circle overlapping nearby searches of one itinerary are merged into
+NEARBY_MERGE_MAX_RADIUS_METERS = 2500.0
+# Only merge when earlier responses around the requests predict at most this many results
+NEARBY_MERGE_MAX_EXPECTED_RESULTS = 0.5 * NEARBY_MAX_RESULTS
+# Grid cell of the place densities seen by searchNearby responses
+NEARBY_DENSITY_CELL_METERS = 1000.0
+# Hedged text searches: start the fallback query if the first one has not returned by then
+TEXT_SEARCH_HEDGE_DELAY_SECONDS = 0.5
+TEXT_SEARCH_HEDGE_MAX_WORKERS = 32
+# Local spatial index of received places, 7 character geohash cells are about 150 m wide
+SPATIAL_INDEX_GEOHASH_PRECISION = 7
+SPATIAL_INDEX_TTL_SECONDS = PLACES_CACHE_TTL_SECONDS
+
+# City geocoding cache
+GEOCODE_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Cities that could not be geocoded are retried after this long
+GEOCODE_NEGATIVE_TTL_SECONDS = 60 * 60
+GEOCODE_CACHE_MEMORY_MAX_ENTRIES = 1024
+# https://operations.osmfoundation.org/policies/nominatim/
+NOMINATIM_REQUESTS_PER_SECOND = 1.0
+
+# Client side throttling of Google API calls, requests per second per endpoint
+GOOGLE_API_REQUESTS_PER_SECOND = {
+    "searchText": 10.0,
+    "searchNearby": 10.0,
+    "findplacefromtext": 10.0,
+    "details": 10.0,
+    "placeDetails": 10.0,
+}
+GOOGLE_API_DEFAULT_REQUESTS_PER_SECOND = 10.0
+GOOGLE_API_MIN_REQUESTS_PER_SECOND = 1.0
+
+# Retries of throttled (429) and failed (5xx) Google API calls
+GOOGLE_API_MAX_RETRIES = 4
+GOOGLE_API_RETRY_BASE_DELAY_SECONDS = 0.5
+GOOGLE_API_RETRY_MAX_DELAY_SECONDS = 16.0
+# Total retries allowed across all calls made by one itinerary search
+SEARCH_RETRY_BUDGET = 20
+
+# LLM response cache
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+LLM_CACHE_MEMORY_MAX_ENTRIES = 1024
+LLM_CACHE_DISK_MAX_ENTRIES = 50000
+# Suggested cosine similarity of the trip descriptions needed to reuse a cached itinerary, the
+# similarity tier is off unless a threshold is given (run_trip_tap --llm-cache-similarity)
+LLM_CACHE_SIMILARITY_THRESHOLD = 0.8
+# Size of the hashed TF-IDF vectors used for the similarity tier
+LLM_CACHE_EMBEDDING_DIMENSIONS = 1024
+# Cached descriptions compared against per (location, dates, group...) bucket
+LLM_CACHE_MAX_ENTRIES_PER_BUCKET = 256
+
+# Per-stage latency metrics, histogram bucket upper bounds and samples kept per span for percentiles
+METRICS_LATENCY_BUCKETS_SECONDS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+METRICS_MAX_SAMPLES = 2048
+
+# Logging, see log.configure
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
@@ -1,16 +1,55 @@
+"""
+Batch itinerary generation
+
+Reads trip requests (the `ITINERARY_PROMPT_TEMPLATE` inputs, one per JSONL
+line or CSV row, with an optional `id` column), generates an itinerary for
+each with the LLM and resolves its places with `SearchPlaces`. Requests run
+`--concurrency` at a time and each result is appended to the JSONL output
+file as soon as it is done, so neither the input nor the results are held in
+memory. The output file is also the checkpoint: requests whose id is already
+in it are skipped when a run is restarted. With `--retry-failed` the failed
+ones run again, and the error lines they supersede are removed at the end.
+
+PYTHONPATH=src python -m executables.run_trip_tap trips.jsonl results.jsonl
+"""
+
 import argparse
+import concurrent.futures
+import csv
 import os
+import time
 import typing as T
 
 import dotenv
+from pydantic.v1.types import SecretStr
+
+import log
+import metrics
+import serialization
+from constants import LLM_CACHE_SIMILARITY_THRESHOLD
+from google import ranking
+from google.hedging import HedgedTextSearch
+from google.places_cache import PlacesCache
+from google.search import SearchPlaces
+from google.spatial_index import SpatialIndex
+from llm.cache import LlmResponseCache
+from llm.defs import ITINERARY_PROMPT_TEMPLATE, Itinerary
+from llm.search import OpenAiSearch
 
 dotenv.load_dotenv()
 
+# Requests read ahead of the workers, per worker
+READ_AHEAD_PER_WORKER = 2
+
+logger = log.get_logger(__name__)
+
+TripRequest = T.Tuple[str, T.Dict[str, str]]
+
 
 def get_secrets() -> T.Dict[str, str]:
     secrets = {
-        "google_api_key": os.getenv("GOOGLE_API_KEY", ""),
-        "openai_api_key": os.getenv("OPENAI_API_KEY", ""),
+        "google_api_key": os.getenv("GOOGLE_PLACES_API_KEY", os.getenv("GOOGLE_API_KEY", "")),
+        "openai_api_key": os.getenv("OPEN_AI_API_KEY", os.getenv("OPENAI_API_KEY", "")),
     }
     return secrets
 
@@ -20,20 +59,324 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "itinerary_file",
         type=str,
-        help="The name of the itinerary file to be processed",
+        help="The JSONL or CSV file of trip requests to be processed",
     )
     parser.add_argument(
         "output_file",
         type=str,
-        help="The name of the output file to write the processed data",
+        help="The JSONL file to append the results to, also used to resume an interrupted run",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="Trip requests processed at once"
+    )
+    parser.add_argument("--radius-meters", type=int, default=1500)
+    parser.add_argument(
+        "--max-nearby-places",
+        type=int,
+        default=None,
+        help="Nearby places kept per itinerary place, all acceptable ones if not set",
+    )
+    parser.add_argument(
+        "--weighted-ranking",
+        action="store_true",
+        help="Rank nearby places by distance, rating, rating count and type match instead of "
+        "keeping the order of the search response",
+    )
+    parser.add_argument(
+        "--no-spatial-index",
+        action="store_true",
+        help="Do not answer nearby searches from places already received in this run",
+    )
+    parser.add_argument("--places-cache", type=str, default=None, help="SQLite Places cache")
+    parser.add_argument("--llm-cache", type=str, default=None, help="SQLite LLM response cache")
+    parser.add_argument(
+        "--llm-cache-similarity",
+        type=float,
+        nargs="?",
+        const=LLM_CACHE_SIMILARITY_THRESHOLD,
+        default=None,
+        help="Also reuse cached itineraries of trips whose description is at least this similar "
+        f"(default {LLM_CACHE_SIMILARITY_THRESHOLD} if given without a value), exact matches only "
+        "if not set",
+    )
+    parser.add_argument(
+        "--hedge-delay-seconds",
+        type=float,
+        default=None,
+        help="Start the fallback text search after this long, sequential if not set",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Run requests again that failed in a previous run, dropping their old error lines",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Write a JSON snapshot of the stage latencies",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve the stage latencies for Prometheus on this port while running",
+    )
+    parser.add_argument("--log-level", type=str, default="INFO")
+    parser.add_argument(
+        "--log-levels",
+        type=log.parse_levels,
+        default={},
+        help="Per module levels, e.g. google.places_api=DEBUG,llm=WARNING",
+    )
+    parser.add_argument("--log-json", action="store_true", help="Log one JSON object per line")
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log at DEBUG level, including why nearby places were rejected",
     )
     return parser.parse_args()
 
 
+def read_requests(path: str) -> T.Iterator[TripRequest]:
+    """(request id, prompt inputs) for each request, the id defaults to the line or row number"""
+    with open(path, "r", encoding="utf-8", newline="") as infile:
+        if path.lower().endswith(".csv"):
+            rows: T.Iterable[T.Dict[str, T.Any]] = csv.DictReader(infile)
+        else:
+            rows = (serialization.loads(line) for line in infile if line.strip())
+
+        for index, row in enumerate(rows):
+            request_id = str(row.pop("id", "") or index)
+            yield request_id, {key: str(value) for key, value in row.items()}
+
+
+def load_checkpoint(path: str, retry_failed: bool = False) -> T.Set[str]:
+    """
+    Ids of the requests already written to the output file. A line cut off
+    by an interrupted run is truncated so new results start on a fresh line.
+    With `retry_failed` an id only counts as done if one of its lines is not
+    an error, the last line of an id is its current result.
+    """
+    if not os.path.exists(path):
+        return set()
+
+    done: T.Set[str] = set()
+    valid_bytes = 0
+    with open(path, "rb") as outfile:
+        for line in outfile:
+            if not line.endswith(b"\n"):
+                break
+            valid_bytes += len(line)
+            try:
+                result = serialization.loads(line)
+            except serialization.JSONDecodeError:
+                continue
+            if retry_failed and "error" in result:
+                continue
+            done.add(str(result["id"]))
+
+    if valid_bytes < os.path.getsize(path):
+        logger.warning("Truncating the incomplete last line of {}", path)
+        with open(path, "r+b") as outfile:
+            outfile.truncate(valid_bytes)
+
+    return done
+
+
+def drop_superseded_errors(path: str) -> int:
+    """
+    Rewrite the output file without the error lines of requests that have a
+    later line, e.g. a successful retry, so every id keeps only its last
+    result. Returns the number of lines dropped.
+    """
+    last_lines: T.Dict[str, int] = {}
+    error_lines: T.List[T.Tuple[str, int]] = []
+    with open(path, "rb") as outfile:
+        for number, line in enumerate(outfile):
+            try:
+                result = serialization.loads(line)
+            except serialization.JSONDecodeError:
+                continue
+            request_id = str(result["id"])
+            last_lines[request_id] = number
+            if "error" in result:
+                error_lines.append((request_id, number))
+
+    dropped = {number for request_id, number in error_lines if number < last_lines[request_id]}
+    if not dropped:
+        return 0
+
+    temporary_path = f"{path}.tmp"
+    with open(path, "rb") as infile, open(temporary_path, "wb") as outfile:
+        for number, line in enumerate(infile):
+            if number not in dropped:
+                outfile.write(line)
+    os.replace(temporary_path, path)
+    return len(dropped)
+
+
+def make_spatial_index(max_nearby_places: T.Optional[int]) -> T.Optional[SpatialIndex]:
+    """An index only pays off if it can record the nearby responses of the field tier in use"""
+    spatial_index = SpatialIndex()
+    missing = spatial_index.missing_fields(SearchPlaces.nearby_fields_for(max_nearby_places))
+    if missing:
+        logger.warning("Running without a spatial index, nearby searches lack {}", sorted(missing))
+        return None
+    return spatial_index
+
+
+def run_request(
+    llm: OpenAiSearch,
+    search: SearchPlaces,
+    request: TripRequest,
+    radius_meters: int,
+) -> T.Dict[str, T.Any]:
+    request_id, inputs = request
+    start = time.time()
+
+    itinerary = llm.search(inputs, ITINERARY_PROMPT_TEMPLATE, Itinerary)
+    # search_many keeps nothing on the instance, so one SearchPlaces can serve every worker
+    result = search.search_many([(inputs["location"], itinerary)], radius_meters=radius_meters)[0]
+    if result.city_coordinates is None:
+        # search_many skips ungeocodable cities instead of raising, fail so --retry-failed retries
+        raise ValueError(f"Unable to get coordinates for city: {inputs['location']}")
+
+    return {
+        "id": request_id,
+        "inputs": inputs,
+        "itinerary": itinerary,
+        "itinerary_place_details": result.itinerary_place_details,
+        "nearby_place_details": result.nearby_place_details,
+        "city_coordinates": result.city_coordinates,
+        "total_api_calls": result.total_api_calls,
+        "seconds": time.time() - start,
+    }
+
+
+def run_batch(
+    llm: OpenAiSearch,
+    search: SearchPlaces,
+    requests: T.Iterable[TripRequest],
+    output_file: str,
+    concurrency: int,
+    radius_meters: int,
+    retry_failed: bool = False,
+) -> T.Dict[str, int]:
+    """
+    Process `requests` and append one JSON line per request to `output_file`,
+    flushed as each one finishes. Failed requests are written with an `error`,
+    and with `retry_failed` the error lines superseded by a retry are removed
+    once all requests are done.
+    """
+    done = load_checkpoint(output_file, retry_failed)
+    if done:
+        logger.info("Resuming, skipping {} requests already in {}", len(done), output_file)
+
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0}
+    max_pending = max(1, concurrency * READ_AHEAD_PER_WORKER)
+
+    with (
+        open(output_file, "ab") as outfile,
+        concurrent.futures.ThreadPoolExecutor(concurrency) as executor,
+    ):
+        pending: T.Dict[concurrent.futures.Future, TripRequest] = {}
+
+        def write_finished() -> None:
+            finished, _ = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in finished:
+                request_id, inputs = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as exception:  # pylint: disable=broad-except
+                    logger.exception(
+                        "Request {} failed", request_id, extra={"request_id": request_id}
+                    )
+                    result = {"id": request_id, "inputs": inputs, "error": repr(exception)}
+                    counts["failed"] += 1
+                else:
+                    counts["succeeded"] += 1
+                serialization.dump_line(result, outfile)
+                outfile.flush()
+                logger.info(
+                    "Finished request {}: {}", request_id, counts, extra={"request_id": request_id}
+                )
+
+        for request in requests:
+            if request[0] in done:
+                counts["skipped"] += 1
+                continue
+            if len(pending) >= max_pending:
+                write_finished()
+            pending[executor.submit(run_request, llm, search, request, radius_meters)] = request
+
+        while pending:
+            write_finished()
+
+    if retry_failed:
+        dropped = drop_superseded_errors(output_file)
+        if dropped:
+            logger.info("Removed {} superseded error lines from {}", dropped, output_file)
+
+    return counts
+
+
 def main() -> None:
     args = parse_args()
+    log.configure("DEBUG" if args.verbose else args.log_level, args.log_levels, args.log_json)
     secrets = get_secrets()
 
+    llm = OpenAiSearch(
+        SecretStr(secrets["openai_api_key"]),
+        verbose=args.verbose,
+        cache=(
+            LlmResponseCache(args.llm_cache, similarity_threshold=args.llm_cache_similarity)
+            if args.llm_cache or args.llm_cache_similarity is not None
+            else None
+        ),
+    )
+    hedge = (
+        HedgedTextSearch(args.hedge_delay_seconds) if args.hedge_delay_seconds is not None else None
+    )
+    search = SearchPlaces(
+        secrets["google_api_key"],
+        verbose=args.verbose,
+        cache=PlacesCache(args.places_cache),
+        spatial_index=None if args.no_spatial_index else make_spatial_index(args.max_nearby_places),
+        ranking_weights=ranking.RankingWeights() if args.weighted_ranking else None,
+        max_nearby_places=args.max_nearby_places,
+        text_search_hedge=hedge,
+    )
+
+    if args.metrics_port is not None:
+        metrics.serve_prometheus(args.metrics_port)
+
+    start = time.time()
+    try:
+        counts = run_batch(
+            llm,
+            search,
+            read_requests(args.itinerary_file),
+            args.output_file,
+            args.concurrency,
+            args.radius_meters,
+            args.retry_failed,
+        )
+    finally:
+        llm.close()
+        if hedge is not None:
+            logger.info("Text search hedging: {}", hedge.stats)
+            hedge.close()
+        if args.metrics_file:
+            with open(args.metrics_file, "wb") as outfile:
+                serialization.dump(metrics.METRICS.snapshot(), outfile, pretty=True)
+
+    logger.info(
+        "Processed {} in {:.2f} seconds: {}", args.itinerary_file, time.time() - start, counts
+    )
+
 
-if __file__ == "__main__":
+if __name__ == "__main__":
     main()
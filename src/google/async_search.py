@@ -0,0 +1,348 @@
+import asyncio
+import typing as T
+
+import log
+from constants import DEFAULT_FIELDS, GOOGLE_PLACES_API_BASE_URL, MIN_RATING, SEARCH_RETRY_BUDGET
+from google import nearby_planner, ranking
+from google.geocode import get_city_center_coordinates
+from google.hedging import HedgedTextSearch
+from google.places_api import GooglePlacesAPI
+from google.places_cache import PlacesCache
+from google.search import (
+    ItineraryPlaceDetailsType,
+    NearbyPlaceDetailsType,
+    PlaceDetails,
+    SearchPlaces,
+)
+from google.spatial_index import SpatialIndex
+from google.transport import AsyncHttpTransport
+from google.utils import Coordinates
+from rate_limit import RetryBudget
+
+# Maximum number of Google requests in flight at once per semaphore
+DEFAULT_MAX_CONCURRENCY = 64
+
+logger = log.get_logger(__name__)
+
+
+class AsyncSearchPlaces:
+    """
+    asyncio counterpart of `SearchPlaces`.
+
+    Every Places request made through an instance acquires the same semaphore,
+    so one instance (or one semaphore passed to several instances) bounds the
+    total number of in-flight Google requests no matter how many itineraries
+    are searched concurrently on the event loop. Results are returned from
+    `search` rather than stored on the instance.
+
+    Like `SearchPlaces`, `search` merges the overlapping nearby searches of an
+    itinerary (see `nearby_planner`) while `iter_search` searches each entry
+    on its own, and both rank nearby places with `ranking_weights` (the
+    baseline order when None, see `SearchPlaces.filter_nearby_places`).
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        api_key: str,
+        verbose: bool = False,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        semaphore: T.Optional[asyncio.Semaphore] = None,
+        transport: T.Optional[AsyncHttpTransport] = None,
+        cache: T.Optional[PlacesCache] = None,
+        spatial_index: T.Optional[SpatialIndex] = None,
+        text_search_hedge: T.Optional[HedgedTextSearch] = None,
+        ranking_weights: T.Optional[ranking.RankingWeights] = None,
+        max_nearby_places: T.Optional[int] = None,
+        base_url: str = GOOGLE_PLACES_API_BASE_URL,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.verbose = verbose
+        self.semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+        self.transport = transport or AsyncHttpTransport()
+        self.cache = cache
+        self.spatial_index = spatial_index
+        self.text_search_hedge = text_search_hedge
+        self.ranking_weights = ranking_weights
+        # Same field tiers as `SearchPlaces.max_nearby_places`
+        self.max_nearby_places = max_nearby_places
+        self.nearby_fields = SearchPlaces.nearby_fields_for(max_nearby_places)
+        SearchPlaces.check_spatial_index(spatial_index, self.nearby_fields)
+
+    async def close(self) -> None:
+        await self.transport.close()
+
+    async def __aenter__(self) -> "AsyncSearchPlaces":
+        return self
+
+    async def __aexit__(self, *args: T.Any) -> None:
+        await self.close()
+
+    def _places_api(self) -> GooglePlacesAPI:
+        """One API wrapper per search so its counters and retry budget only cover that search"""
+        return GooglePlacesAPI(
+            self.api_key,
+            verbose=False,
+            cache=self.cache,
+            spatial_index=self.spatial_index,
+            async_transport=self.transport,
+            retry_budget=RetryBudget(SEARCH_RETRY_BUDGET),
+            base_url=self.base_url,
+        )
+
+    async def _text_search(self, gplaces: GooglePlacesAPI, query: str) -> T.Dict[T.Any, T.Any]:
+        async with self.semaphore:
+            return await gplaces.text_search_async(
+                query=query,
+                fields=DEFAULT_FIELDS,
+                data={
+                    "minRating": MIN_RATING,
+                },
+            )
+
+    async def _nearby_places(
+        self,
+        gplaces: GooglePlacesAPI,
+        place_result: T.Dict[str, T.Any],
+        activity_type: str,
+        radius_meters: int,
+    ) -> T.Dict[T.Any, T.Any]:
+        async with self.semaphore:
+            return await gplaces.nearby_places_async(
+                latitude=place_result["location"]["latitude"],
+                longitude=place_result["location"]["longitude"],
+                radius_meters=radius_meters,
+                fields=self.nearby_fields,
+                data=SearchPlaces.nearby_search_data(place_result, activity_type),
+            )
+
+    async def _planned_nearby_places(
+        self,
+        gplaces: GooglePlacesAPI,
+        request: T.Union[nearby_planner.NearbyRequest, nearby_planner.NearbyQuery],
+    ) -> T.List[T.Dict[str, T.Any]]:
+        async with self.semaphore:
+            response = await gplaces.nearby_places_async(
+                latitude=request.latitude,
+                longitude=request.longitude,
+                radius_meters=request.radius_meters,
+                fields=self.nearby_fields,
+                data=SearchPlaces.planned_search_data(request),
+            )
+        return T.cast(T.List[T.Dict[str, T.Any]], (response or {}).get("places", []))
+
+    async def _hydrate(
+        self,
+        gplaces: GooglePlacesAPI,
+        nearby_list: T.List[T.Dict[str, T.Any]],
+        fetches: T.Optional[T.Dict[str, asyncio.Future]] = None,
+    ) -> T.List[T.Dict[str, T.Any]]:
+        """
+        Async counterpart of `SearchPlaces.hydrate_place_details` for one entry,
+        entries sharing `fetches` fetch each place id once. Only hydrates when
+        `max_nearby_places` is set, see there for the call and SKU trade-off
+        """
+        if self.max_nearby_places is None:
+            return nearby_list
+        fetches = {} if fetches is None else fetches
+
+        async def fetch(place_id: str) -> T.Dict[T.Any, T.Any]:
+            async with self.semaphore:
+                return await gplaces.place_details_async(place_id)
+
+        async def hydrate(place: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+            if "displayName" in place or "id" not in place:
+                return place
+            if place["id"] not in fetches:
+                fetches[place["id"]] = asyncio.ensure_future(fetch(place["id"]))
+            details = await fetches[place["id"]]
+            if not details or "error" in details:
+                return place
+            return {**place, **details}
+
+        return list(await asyncio.gather(*[hydrate(place) for place in nearby_list]))
+
+    async def _find_place(
+        self,
+        gplaces: GooglePlacesAPI,
+        itinerary_info: T.Tuple[str, str, str],
+        city_name: str,
+    ) -> T.Optional[T.Dict[str, T.Any]]:
+        """Async counterpart of `SearchPlaces._find_place`"""
+
+        async def search(query: str) -> T.Optional[T.Dict[str, T.Any]]:
+            result = await self._text_search(gplaces, query)
+            if result and len(result.get("places", [])) > 0:
+                return T.cast(T.Dict[str, T.Any], result["places"][0])
+            return None
+
+        queries = SearchPlaces.text_search_queries(itinerary_info, city_name)
+        place_result: T.Optional[T.Dict[str, T.Any]] = None
+        if self.text_search_hedge is not None:
+            place_result = await self.text_search_hedge.find_async(search, queries)
+        else:
+            for query in queries:
+                place_result = await search(query)
+                if place_result is not None:
+                    break
+
+        if place_result is None:
+            logger.info("No places found for {}", itinerary_info[0])
+        return place_result
+
+    async def _get_place_details(
+        self,
+        gplaces: GooglePlacesAPI,
+        itinerary_info: T.Tuple[str, str, str],
+        city_name: str,
+        radius_meters: int,
+    ) -> PlaceDetails:
+        """Counters live on the per-search `gplaces`, so `call_counts` is left empty"""
+        location_name = itinerary_info[0]
+
+        place_result = await self._find_place(gplaces, itinerary_info, city_name)
+        if place_result is None:
+            return PlaceDetails(location_name, None, None, {})
+
+        nearby_places = await self._nearby_places(
+            gplaces, place_result, itinerary_info[2], radius_meters
+        )
+
+        if not nearby_places or len(nearby_places.get("places", [])) == 0:
+            logger.info("Unable to get nearby places for {}", location_name)
+            return PlaceDetails(location_name, place_result, None, {})
+
+        nearby_list = SearchPlaces.filter_nearby_places(
+            place_result,
+            nearby_places["places"],
+            verbose=self.verbose,
+            weights=self.ranking_weights,
+            max_places=self.max_nearby_places,
+        )
+        nearby_list = await self._hydrate(gplaces, nearby_list)
+
+        logger.debug("Found {} nearby places for {}", len(nearby_list), location_name)
+
+        return PlaceDetails(location_name, place_result, nearby_list, {})
+
+    async def _plan_place_details(
+        self,
+        gplaces: GooglePlacesAPI,
+        entries: T.Sequence[T.Tuple[str, str, str]],
+        city_name: str,
+        radius_meters: int,
+    ) -> T.List[PlaceDetails]:
+        """Async counterpart of `SearchPlaces._plan_place_details`, with filtering and hydration"""
+        places = await asyncio.gather(
+            *[self._find_place(gplaces, itinerary_info, city_name) for itinerary_info in entries]
+        )
+
+        found, requests = SearchPlaces.nearby_requests(entries, places, radius_meters)
+        queries = nearby_planner.plan_nearby_queries(requests, density=nearby_planner.AREA_DENSITY)
+        logger.debug(
+            "Planned {} nearby searches for {} itinerary entries", len(queries), len(requests)
+        )
+
+        nearby, fallback = nearby_planner.assign_results(
+            queries,
+            await asyncio.gather(
+                *[self._planned_nearby_places(gplaces, query) for query in queries]
+            ),
+            requests,
+            nearby_planner.AREA_DENSITY,
+        )
+        fallback_places = await asyncio.gather(
+            *[self._planned_nearby_places(gplaces, requests[member]) for member in fallback]
+        )
+        for member, member_places in zip(fallback, fallback_places):
+            nearby_planner.AREA_DENSITY.record(requests[member], len(member_places))
+            nearby[member] = member_places
+
+        place_details = SearchPlaces.filter_place_details(
+            SearchPlaces.planned_place_details(entries, places, found, nearby),
+            self.verbose,
+            self.ranking_weights,
+            self.max_nearby_places,
+        )
+
+        fetches: T.Dict[str, asyncio.Future] = {}
+
+        async def hydrate(details: PlaceDetails) -> PlaceDetails:
+            if not details.nearby_places:
+                return details
+            return details._replace(
+                nearby_places=await self._hydrate(gplaces, details.nearby_places, fetches)
+            )
+
+        return list(await asyncio.gather(*[hydrate(details) for details in place_details]))
+
+    async def iter_search(
+        self,
+        city: str,
+        itinerary: T.Dict[str, T.List[str]],
+        radius_meters: int = 1500,
+    ) -> T.AsyncIterator[T.Tuple[int, PlaceDetails]]:
+        """
+        Async counterpart of `SearchPlaces.iter_search`, yields
+        (index of the itinerary entry, PlaceDetails) in completion order
+        """
+        city_coordinates = await asyncio.to_thread(get_city_center_coordinates, city)
+
+        if not city_coordinates:
+            raise ValueError(f"Unable to get coordinates for city: {city}")
+
+        logger.debug("{} coordinates: {}", city, city_coordinates)
+
+        gplaces = self._places_api()
+
+        async def get_place_details(
+            index: int, itinerary_info: T.Tuple[str, str, str]
+        ) -> T.Tuple[int, PlaceDetails]:
+            return index, await self._get_place_details(
+                gplaces, itinerary_info, city, radius_meters
+            )
+
+        tasks = [
+            asyncio.ensure_future(get_place_details(index, itinerary_info))
+            for index, itinerary_info in enumerate(SearchPlaces.itinerary_entries(itinerary))
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def search(
+        self,
+        city: str,
+        itinerary: T.Dict[str, T.List[str]],
+        radius_meters: int = 1500,
+    ) -> T.Tuple[
+        ItineraryPlaceDetailsType,
+        NearbyPlaceDetailsType,
+        Coordinates,
+        int,
+    ]:
+        city_coordinates = await asyncio.to_thread(get_city_center_coordinates, city)
+
+        if not city_coordinates:
+            raise ValueError(f"Unable to get coordinates for city: {city}")
+
+        logger.debug("{} coordinates: {}", city, city_coordinates)
+
+        gplaces = self._places_api()
+        place_details = await self._plan_place_details(
+            gplaces, SearchPlaces.itinerary_entries(itinerary), city, radius_meters
+        )
+
+        itinerary_place_details, nearby_place_details = SearchPlaces.collect_place_details(
+            place_details
+        )
+
+        return (
+            itinerary_place_details,
+            nearby_place_details,
+            city_coordinates,
+            gplaces.stats["api_calls"],
+        )
@@ -0,0 +1,107 @@
+"""
+Cached, rate limited city geocoding
+
+Traffic is concentrated on a few hundred destinations, so city centers are
+kept in an in-process LRU backed by an optional SQLite table, and Nominatim
+is only called on a miss and never more than once per second.
+"""
+
+import threading
+import typing as T
+
+import metrics
+from cache import LruCache, SqliteCache, TieredCache
+from constants import (
+    GEOCODE_CACHE_MEMORY_MAX_ENTRIES,
+    GEOCODE_CACHE_TTL_SECONDS,
+    GEOCODE_NEGATIVE_TTL_SECONDS,
+    NOMINATIM_REQUESTS_PER_SECOND,
+)
+from google import utils
+from google.utils import Coordinates
+from rate_limit import TokenBucket
+from text import clean_text
+
+
+def normalize_city(city_name: str) -> str:
+    return " ".join(clean_text(city_name).split())
+
+
+class Geocoder:
+    def __init__(
+        self,
+        path: T.Optional[str] = None,
+        ttl_seconds: float = GEOCODE_CACHE_TTL_SECONDS,
+        negative_ttl_seconds: float = GEOCODE_NEGATIVE_TTL_SECONDS,
+        memory_max_entries: int = GEOCODE_CACHE_MEMORY_MAX_ENTRIES,
+        requests_per_second: float = NOMINATIM_REQUESTS_PER_SECOND,
+        lookup: T.Callable[[str], T.Optional[Coordinates]] = utils.get_city_center_coordinates,
+    ) -> None:
+        memory = LruCache(max_entries=memory_max_entries, ttl_seconds=ttl_seconds)
+        disk = SqliteCache(path, table="geocode", ttl_seconds=ttl_seconds) if path else None
+        self.cache = TieredCache(memory, disk)
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.rate_limiter = TokenBucket(rate=requests_per_second, capacity=1.0)
+        self.lookup = lookup
+        self._lookup_lock = threading.Lock()
+
+    @metrics.METRICS.timed("geocode")
+    def get_city_center_coordinates(self, city_name: str) -> T.Optional[Coordinates]:
+        key = normalize_city(city_name)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.set_outcome("cache_hit")
+            # An empty entry records a city Nominatim could not find
+            return Coordinates(lat=cached["lat"], lng=cached["lng"]) if cached else None
+
+        # Serialize misses so that threads waiting on the same city reuse the
+        # first lookup instead of spending the rate limit on duplicates
+        with self._lookup_lock:
+            cached = self.cache.memory.get(key)
+            if cached is not None:
+                metrics.set_outcome("cache_hit")
+                return Coordinates(lat=cached["lat"], lng=cached["lng"]) if cached else None
+
+            self.rate_limiter.acquire()
+            coordinates = self.lookup(city_name)
+
+            if coordinates is None:
+                self.cache.put(key, {}, ttl_seconds=self.negative_ttl_seconds)
+            else:
+                self.cache.put(key, dict(coordinates))
+
+        return coordinates
+
+    def warm(self, city_names: T.Iterable[str]) -> T.Dict[str, T.Optional[Coordinates]]:
+        """Preload a list of cities, e.g. the most popular destinations at startup"""
+        return {city_name: self.get_city_center_coordinates(city_name) for city_name in city_names}
+
+
+_DEFAULT_GEOCODER: T.Optional[Geocoder] = None
+_DEFAULT_GEOCODER_LOCK = threading.Lock()
+
+
+def get_default_geocoder() -> Geocoder:
+    global _DEFAULT_GEOCODER  # pylint: disable=global-statement
+
+    with _DEFAULT_GEOCODER_LOCK:
+        if _DEFAULT_GEOCODER is None:
+            _DEFAULT_GEOCODER = Geocoder()
+        return _DEFAULT_GEOCODER
+
+
+def set_default_geocoder(geocoder: Geocoder) -> None:
+    """Replace the process-wide geocoder, e.g. with one backed by a SQLite file"""
+    global _DEFAULT_GEOCODER  # pylint: disable=global-statement
+
+    with _DEFAULT_GEOCODER_LOCK:
+        _DEFAULT_GEOCODER = geocoder
+
+
+def get_city_center_coordinates(city_name: str) -> T.Optional[Coordinates]:
+    return get_default_geocoder().get_city_center_coordinates(city_name)
+
+
+def warm(city_names: T.Iterable[str]) -> T.Dict[str, T.Optional[Coordinates]]:
+    return get_default_geocoder().warm(city_names)
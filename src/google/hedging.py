@@ -0,0 +1,192 @@
+"""
+Hedged text searches
+
+An itinerary entry is looked up with a list of text search queries tried in
+order, so an entry the first query misses costs two round trips back to back.
+`HedgedTextSearch` sends the first query and starts the next one when the
+first misses or when it is still in flight after `hedge_delay_seconds`. The
+first query to return a place wins and the others are cancelled: queued
+thread pool calls never start and asyncio tasks are cancelled, while a
+blocking HTTP call that already started runs to completion (its response
+still fills the cache) and is only abandoned.
+
+`stats` counts how often each path won and how many extra calls hedging
+started, to tune the delay between tail latency and extra calls.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+import typing as T
+
+from constants import TEXT_SEARCH_HEDGE_DELAY_SECONDS, TEXT_SEARCH_HEDGE_MAX_WORKERS
+
+PlaceType = T.Dict[str, T.Any]
+
+
+class HedgedTextSearch:
+    """
+    Thread-safe, one instance can serve every search of a process. Sync
+    queries run on a private pool of `max_workers` threads so a caller that
+    is itself running on a pool cannot deadlock it.
+    """
+
+    def __init__(
+        self,
+        hedge_delay_seconds: float = TEXT_SEARCH_HEDGE_DELAY_SECONDS,
+        max_workers: int = TEXT_SEARCH_HEDGE_MAX_WORKERS,
+    ) -> None:
+        assert hedge_delay_seconds >= 0.0, "Hedge delay must not be negative"
+
+        self.hedge_delay_seconds = hedge_delay_seconds
+        self.max_workers = max_workers
+        self.stats = {
+            # The first query found the place
+            "primary_wins": 0,
+            # A later query found the place
+            "fallback_wins": 0,
+            # No query found a place
+            "misses": 0,
+            # Later queries started because the previous one was still in flight at the deadline
+            "hedges": 0,
+            # Later queries started because the previous one returned no place
+            "fallbacks_on_miss": 0,
+            # Losing queries that were stopped before or while being sent
+            "cancelled": 0,
+            # Losing queries that were already running and had to finish on their own
+            "abandoned": 0,
+        }
+        self._stats_lock = threading.Lock()
+        self._executor: T.Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += value
+
+    def _count_win(self, query_index: T.Optional[int]) -> None:
+        if query_index is None:
+            self._count("misses")
+        else:
+            self._count("primary_wins" if query_index == 0 else "fallback_wins")
+
+    def win_rates(self) -> T.Dict[str, float]:
+        """Share of lookups won by each path"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        total = stats["primary_wins"] + stats["fallback_wins"] + stats["misses"]
+        return {
+            key: stats[key] / total if total else 0.0
+            for key in ("primary_wins", "fallback_wins", "misses")
+        }
+
+    def _get_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.max_workers, thread_name_prefix="hedged-search"
+                )
+            return self._executor
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def find(
+        self, search: T.Callable[[str], T.Optional[PlaceType]], queries: T.Sequence[str]
+    ) -> T.Optional[PlaceType]:
+        """
+        The place returned by the first of `queries` to find one, or None.
+        `search` returns the first place of a query or None on a miss.
+        """
+        if not queries:
+            return None
+
+        executor = self._get_executor()
+        pending: T.Dict[concurrent.futures.Future[T.Optional[PlaceType]], int] = {}
+        next_query = 0
+
+        def start_next(reason: str) -> None:
+            nonlocal next_query
+            if next_query > 0:
+                self._count(reason)
+            pending[executor.submit(search, queries[next_query])] = next_query
+            next_query += 1
+
+        start_next("hedges")
+        try:
+            while pending:
+                timeout = self.hedge_delay_seconds if next_query < len(queries) else None
+                done, _ = concurrent.futures.wait(
+                    pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    start_next("hedges")
+                    continue
+
+                # Prefer the earlier query when several finished together
+                for future in sorted(done, key=pending.__getitem__):
+                    query_index = pending.pop(future)
+                    place = future.result()
+                    if place is not None:
+                        self._count_win(query_index)
+                        return place
+
+                if not pending and next_query < len(queries):
+                    start_next("fallbacks_on_miss")
+        finally:
+            for future in pending:
+                self._count("cancelled" if future.cancel() else "abandoned")
+
+        self._count_win(None)
+        return None
+
+    async def find_async(
+        self,
+        search: T.Callable[[str], T.Awaitable[T.Optional[PlaceType]]],
+        queries: T.Sequence[str],
+    ) -> T.Optional[PlaceType]:
+        """asyncio counterpart of `find`, losing queries are always cancelled"""
+        if not queries:
+            return None
+
+        pending: T.Dict[asyncio.Task[T.Optional[PlaceType]], int] = {}
+        next_query = 0
+
+        def start_next(reason: str) -> None:
+            nonlocal next_query
+            if next_query > 0:
+                self._count(reason)
+            pending[asyncio.ensure_future(search(queries[next_query]))] = next_query
+            next_query += 1
+
+        start_next("hedges")
+        try:
+            while pending:
+                timeout = self.hedge_delay_seconds if next_query < len(queries) else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    start_next("hedges")
+                    continue
+
+                # Prefer the earlier query when several finished together
+                for task in sorted(done, key=pending.__getitem__):
+                    query_index = pending.pop(task)
+                    place = task.result()
+                    if place is not None:
+                        self._count_win(query_index)
+                        return place
+
+                if not pending and next_query < len(queries):
+                    start_next("fallbacks_on_miss")
+        finally:
+            for task in pending:
+                task.cancel()
+            self._count("cancelled", len(pending))
+
+        self._count_win(None)
+        return None
@@ -0,0 +1,242 @@
+"""
+Planning of searchNearby calls for one itinerary
+
+Entries of a day are often a few hundred meters apart, so their search
+circles overlap. Overlapping circles with the same `includedTypes` are merged
+into one larger enclosing circle (up to a maximum radius) and the results of
+the merged query are split back to each entry by distance. A merged response
+that hits the result cap may be missing places of some entry, so callers
+should fall back to the entry's own query (see `is_truncated`).
+
+A truncated merged query costs one call more than searching its entries on
+their own. With an `AreaDensity` of earlier responses, requests are only
+merged when the density seen around them predicts the merged circle stays
+well under the result cap (`NEARBY_MERGE_MAX_EXPECTED_RESULTS`); areas
+without any are searched entry by entry, and a truncated response makes its
+area dense so it is not merged again.
+"""
+
+import math
+import threading
+import typing as T
+
+import numpy as np
+
+from constants import (
+    NEARBY_DENSITY_CELL_METERS,
+    NEARBY_MAX_RESULTS,
+    NEARBY_MERGE_MAX_EXPECTED_RESULTS,
+    NEARBY_MERGE_MAX_RADIUS_METERS,
+)
+from google.ranking import distance_meters, haversine_meters
+
+METERS_PER_DEGREE_LATITUDE = 111320.0
+
+
+class NearbyRequest(T.NamedTuple):
+    latitude: float
+    longitude: float
+    radius_meters: float
+    # Sorted includedTypes, empty for any type
+    included_types: T.Tuple[str, ...]
+
+
+class NearbyQuery(T.NamedTuple):
+    latitude: float
+    longitude: float
+    radius_meters: float
+    included_types: T.Tuple[str, ...]
+    # Indices of the requests answered by this query
+    members: T.List[int]
+
+
+class AreaDensity:
+    """
+    Places per square meter seen by searchNearby responses, by includedTypes
+    and grid cell. A truncated response makes its cell dense (infinite).
+    """
+
+    def __init__(self, cell_meters: float = NEARBY_DENSITY_CELL_METERS) -> None:
+        self.cell_meters = cell_meters
+        self._densities: T.Dict[T.Tuple[T.Tuple[str, ...], int, int], float] = {}
+        self._lock = threading.Lock()
+
+    def _key(
+        self, latitude: float, longitude: float, included_types: T.Tuple[str, ...]
+    ) -> T.Tuple[T.Tuple[str, ...], int, int]:
+        east_meters = longitude * METERS_PER_DEGREE_LATITUDE * math.cos(math.radians(latitude))
+        return (
+            included_types,
+            math.floor(latitude * METERS_PER_DEGREE_LATITUDE / self.cell_meters),
+            math.floor(east_meters / self.cell_meters),
+        )
+
+    def record(
+        self,
+        request: T.Union[NearbyRequest, NearbyQuery],
+        result_count: int,
+        max_results: int = NEARBY_MAX_RESULTS,
+    ) -> None:
+        """Keeps the highest density seen in the cell of the request's center"""
+        density = (
+            math.inf
+            if result_count >= max_results
+            else result_count / (math.pi * request.radius_meters**2)
+        )
+        key = self._key(request.latitude, request.longitude, request.included_types)
+        with self._lock:
+            self._densities[key] = max(density, self._densities.get(key, 0.0))
+
+    def expected_results(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        requests: T.Sequence[NearbyRequest],
+    ) -> T.Optional[float]:
+        """
+        Results a search of the circle for the includedTypes of `requests`
+        should return at the highest density seen in the cells of its center
+        and of theirs, None if none was seen
+        """
+        included_types = requests[0].included_types if requests else ()
+        centers = [(request.latitude, request.longitude) for request in requests]
+        keys = [self._key(*center, included_types) for center in centers + [(latitude, longitude)]]
+        with self._lock:
+            densities = [self._densities[key] for key in keys if key in self._densities]
+        if not densities:
+            return None
+        return max(densities) * math.pi * radius_meters**2
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._densities)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._densities.clear()
+
+
+# Shared by the search engines, like the rate limiter
+AREA_DENSITY = AreaDensity()
+
+
+def _enclosing_circle(requests: T.Sequence[NearbyRequest]) -> T.Tuple[float, float, float]:
+    """A circle containing every request circle, centered on their mean center"""
+    latitudes = np.array([request.latitude for request in requests])
+    longitudes = np.array([request.longitude for request in requests])
+    radii = np.array([request.radius_meters for request in requests])
+    latitude, longitude = float(latitudes.mean()), float(longitudes.mean())
+
+    distances = haversine_meters(
+        np.full(len(requests), latitude), np.full(len(requests), longitude), latitudes, longitudes
+    )
+    return latitude, longitude, float((distances + radii).max())
+
+
+def _overlaps(request: NearbyRequest, other: NearbyRequest) -> bool:
+    distance = distance_meters(request.latitude, request.longitude, other.latitude, other.longitude)
+    return distance < request.radius_meters + other.radius_meters
+
+
+def plan_nearby_queries(
+    requests: T.Sequence[NearbyRequest],
+    max_radius_meters: float = NEARBY_MERGE_MAX_RADIUS_METERS,
+    density: T.Optional[AreaDensity] = None,
+    max_expected_results: float = NEARBY_MERGE_MAX_EXPECTED_RESULTS,
+) -> T.List[NearbyQuery]:
+    """
+    Greedily add each request, in order, to the first query with the same
+    types that has a member circle overlapping it and whose enclosing circle
+    stays within `max_radius_meters` and, given a `density`, is expected to
+    return at most `max_expected_results` places
+    """
+    queries: T.List[NearbyQuery] = []
+    for index, request in enumerate(requests):
+        for position, query in enumerate(queries):
+            if query.included_types != request.included_types or not any(
+                _overlaps(requests[member], request) for member in query.members
+            ):
+                continue
+            members = query.members + [index]
+            member_requests = [requests[i] for i in members]
+            latitude, longitude, radius = _enclosing_circle(member_requests)
+            if radius > max_radius_meters:
+                continue
+            if density is not None:
+                expected = density.expected_results(latitude, longitude, radius, member_requests)
+                if expected is None or expected > max_expected_results:
+                    continue
+            queries[position] = NearbyQuery(
+                latitude, longitude, radius, request.included_types, members
+            )
+            break
+        else:
+            queries.append(
+                NearbyQuery(
+                    request.latitude,
+                    request.longitude,
+                    request.radius_meters,
+                    request.included_types,
+                    [index],
+                )
+            )
+    return queries
+
+
+def is_truncated(places: T.Sequence[T.Any], max_results: int = NEARBY_MAX_RESULTS) -> bool:
+    return len(places) >= max_results
+
+
+def split_results(
+    query: NearbyQuery,
+    places: T.Sequence[T.Dict[str, T.Any]],
+    requests: T.Sequence[NearbyRequest],
+) -> T.Dict[int, T.List[T.Dict[str, T.Any]]]:
+    """The places of a merged response inside each member's circle, in response order"""
+    located = [place for place in places if "location" in place]
+    if not located:
+        return {member: [] for member in query.members}
+
+    latitudes = np.array([place["location"]["latitude"] for place in located], dtype=np.float64)
+    longitudes = np.array([place["location"]["longitude"] for place in located], dtype=np.float64)
+
+    results = {}
+    for member in query.members:
+        request = requests[member]
+        distances = haversine_meters(
+            np.full(len(located), request.latitude),
+            np.full(len(located), request.longitude),
+            latitudes,
+            longitudes,
+        )
+        results[member] = [
+            place for place, inside in zip(located, distances <= request.radius_meters) if inside
+        ]
+    return results
+
+
+def assign_results(
+    queries: T.Sequence[NearbyQuery],
+    query_places: T.Sequence[T.List[T.Dict[str, T.Any]]],
+    requests: T.Sequence[NearbyRequest],
+    density: T.Optional[AreaDensity] = None,
+) -> T.Tuple[T.Dict[int, T.List[T.Dict[str, T.Any]]], T.List[int]]:
+    """
+    (places of each request, requests whose merged query came back truncated
+    and should be searched on their own) from the places of every query,
+    which are recorded in `density`
+    """
+    nearby: T.Dict[int, T.List[T.Dict[str, T.Any]]] = {}
+    fallback = []
+    for query, places in zip(queries, query_places):
+        if density is not None:
+            density.record(query, len(places))
+        if len(query.members) > 1 and is_truncated(places):
+            fallback.extend(query.members)
+            continue
+        if len(query.members) == 1:
+            nearby[query.members[0]] = places
+        else:
+            nearby.update(split_results(query, places, requests))
+    return nearby, fallback
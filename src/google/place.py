@@ -0,0 +1,208 @@
+"""
+Compact Places API records
+
+A parsed place is a slotted dataclass instead of a nested dict: type strings
+and language codes are interned, businessStatus and priceLevel are enums, and
+the displayName/location/editorialSummary wrappers are flattened. Anything not
+requested by `DEFAULT_FIELDS` is kept in `extras`, so `to_json` reproduces
+the original response exactly.
+"""
+
+import dataclasses
+import enum
+import sys
+import typing as T
+
+
+class PriceLevel(enum.Enum):
+    PRICE_LEVEL_UNSPECIFIED = "PRICE_LEVEL_UNSPECIFIED"
+    PRICE_LEVEL_FREE = "PRICE_LEVEL_FREE"
+    PRICE_LEVEL_INEXPENSIVE = "PRICE_LEVEL_INEXPENSIVE"
+    PRICE_LEVEL_MODERATE = "PRICE_LEVEL_MODERATE"
+    PRICE_LEVEL_EXPENSIVE = "PRICE_LEVEL_EXPENSIVE"
+    PRICE_LEVEL_VERY_EXPENSIVE = "PRICE_LEVEL_VERY_EXPENSIVE"
+
+
+class BusinessStatus(enum.Enum):
+    BUSINESS_STATUS_UNSPECIFIED = "BUSINESS_STATUS_UNSPECIFIED"
+    OPERATIONAL = "OPERATIONAL"
+    CLOSED_TEMPORARILY = "CLOSED_TEMPORARILY"
+    CLOSED_PERMANENTLY = "CLOSED_PERMANENTLY"
+
+
+_PRICE_LEVELS = {level.value: level for level in PriceLevel}
+_BUSINESS_STATUSES = {status.value: status for status in BusinessStatus}
+
+# Keys parsed into `Place` attributes, everything else goes to `extras`
+_SCALAR_FIELDS = {
+    "id": "id",
+    "formattedAddress": "formatted_address",
+    "rating": "rating",
+    "googleMapsUri": "google_maps_uri",
+    "websiteUri": "website_uri",
+    "userRatingCount": "user_rating_count",
+    "goodForChildren": "good_for_children",
+}
+_PARSED_KEYS = set(_SCALAR_FIELDS) | {
+    "displayName",
+    "location",
+    "editorialSummary",
+    "businessStatus",
+    "priceLevel",
+    "primaryType",
+    "types",
+}
+
+
+def _intern(value: T.Optional[str]) -> T.Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+def _localized_text(
+    value: T.Any,
+) -> T.Tuple[T.Optional[str], T.Optional[str], T.Optional[T.Dict[str, T.Any]]]:
+    """(text, languageCode, original) where original is only kept if it has unexpected keys"""
+    if not isinstance(value, dict) or not set(value) <= {"text", "languageCode"}:
+        return None, None, value
+    return value.get("text"), _intern(value.get("languageCode")), None
+
+
+def _to_localized_text(text: T.Optional[str], language: T.Optional[str]) -> T.Dict[str, str]:
+    value = {}
+    if text is not None:
+        value["text"] = text
+    if language is not None:
+        value["languageCode"] = language
+    return value
+
+
+@dataclasses.dataclass(slots=True)
+class Place:  # pylint: disable=too-many-instance-attributes
+    id: T.Optional[str] = None
+    formatted_address: T.Optional[str] = None
+    display_name: T.Optional[str] = None
+    display_name_language: T.Optional[str] = None
+    latitude: T.Optional[float] = None
+    longitude: T.Optional[float] = None
+    rating: T.Optional[float] = None
+    google_maps_uri: T.Optional[str] = None
+    website_uri: T.Optional[str] = None
+    business_status: T.Optional[BusinessStatus] = None
+    price_level: T.Optional[PriceLevel] = None
+    user_rating_count: T.Optional[int] = None
+    primary_type: T.Optional[str] = None
+    types: T.Optional[T.Tuple[str, ...]] = None
+    editorial_summary: T.Optional[str] = None
+    editorial_summary_language: T.Optional[str] = None
+    good_for_children: T.Optional[bool] = None
+    # Flags for wrapper objects that were present but empty, e.g. "displayName": {}
+    empty_keys: T.Optional[T.Tuple[str, ...]] = None
+    # Unparsed keys (or values in an unexpected shape), returned as is by `to_json`
+    extras: T.Optional[T.Dict[str, T.Any]] = None
+
+    @classmethod
+    def from_json(cls, data: T.Dict[str, T.Any]) -> "Place":  # pylint: disable=too-many-branches
+        place = cls()
+        extras: T.Dict[str, T.Any] = {}
+        empty_keys: T.List[str] = []
+
+        for key, value in data.items():
+            if key not in _PARSED_KEYS or value is None:
+                extras[key] = value
+            elif key in _SCALAR_FIELDS:
+                setattr(place, _SCALAR_FIELDS[key], value)
+            elif key == "types":
+                if isinstance(value, list):
+                    place.types = tuple(sys.intern(item) for item in value)
+                else:
+                    extras[key] = value
+            elif key == "primaryType":
+                place.primary_type = _intern(value)
+            elif key == "businessStatus":
+                if value in _BUSINESS_STATUSES:
+                    place.business_status = _BUSINESS_STATUSES[value]
+                else:
+                    extras[key] = value
+            elif key == "priceLevel":
+                if value in _PRICE_LEVELS:
+                    place.price_level = _PRICE_LEVELS[value]
+                else:
+                    extras[key] = value
+            elif key == "location":
+                if isinstance(value, dict) and set(value) == {"latitude", "longitude"}:
+                    place.latitude = value["latitude"]
+                    place.longitude = value["longitude"]
+                else:
+                    extras[key] = value
+            else:
+                text, language, original = _localized_text(value)
+                if original is not None:
+                    extras[key] = original
+                elif text is None and language is None:
+                    empty_keys.append(key)
+                elif key == "displayName":
+                    place.display_name, place.display_name_language = text, language
+                else:
+                    place.editorial_summary, place.editorial_summary_language = text, language
+
+        place.extras = extras or None
+        place.empty_keys = tuple(empty_keys) or None
+        return place
+
+    def to_json(self) -> T.Dict[str, T.Any]:
+        data: T.Dict[str, T.Any] = {}
+
+        for key, attribute in _SCALAR_FIELDS.items():
+            value = getattr(self, attribute)
+            if value is not None:
+                data[key] = value
+
+        if self.display_name is not None or self.display_name_language is not None:
+            data["displayName"] = _to_localized_text(self.display_name, self.display_name_language)
+        if self.latitude is not None and self.longitude is not None:
+            data["location"] = {"latitude": self.latitude, "longitude": self.longitude}
+        if self.business_status is not None:
+            data["businessStatus"] = self.business_status.value
+        if self.price_level is not None:
+            data["priceLevel"] = self.price_level.value
+        if self.primary_type is not None:
+            data["primaryType"] = self.primary_type
+        if self.types is not None:
+            data["types"] = list(self.types)
+        if self.editorial_summary is not None or self.editorial_summary_language is not None:
+            data["editorialSummary"] = _to_localized_text(
+                self.editorial_summary, self.editorial_summary_language
+            )
+        for key in self.empty_keys or ():
+            data[key] = {}
+        if self.extras:
+            data.update(self.extras)
+
+        return data
+
+
+@dataclasses.dataclass(slots=True)
+class PlacesResponse:
+    """A searchText/searchNearby response body with its places parsed into `Place` records"""
+
+    places: T.Optional[T.Tuple[Place, ...]] = None
+    extras: T.Optional[T.Dict[str, T.Any]] = None
+
+    @classmethod
+    def from_json(cls, data: T.Dict[str, T.Any]) -> "PlacesResponse":
+        extras = {key: value for key, value in data.items() if key != "places"}
+        places = data.get("places")
+        if places is not None and not isinstance(places, list):
+            extras["places"] = places
+            places = None
+        if places is None:
+            return cls(places=None, extras=extras or None)
+        return cls(places=tuple(Place.from_json(place) for place in places), extras=extras or None)
+
+    def to_json(self) -> T.Dict[str, T.Any]:
+        data: T.Dict[str, T.Any] = {}
+        if self.places is not None:
+            data["places"] = [place.to_json() for place in self.places]
+        if self.extras:
+            data.update(self.extras)
+        return data
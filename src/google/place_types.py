@@ -0,0 +1,361 @@
+"""
+Places type taxonomy
+
+Table A of https://developers.google.com/maps/documentation/places/web-service/place-types
+lists the types accepted in `includedTypes`. Every type gets a small integer
+id (Table A first, in table order, then any other type the first time it is
+seen), so a set of types can be held as an int bitmask and checked against
+another set with a single `&`. The `activity_type` values of generated
+itineraries are mapped to `includedTypes` once, at import.
+"""
+
+import functools
+import re
+import threading
+import typing as T
+
+# Types of the legacy Nearby Search `type` parameter
+TYPES = (
+    "restaurant",  # default
+    "bakery",
+    "sandwich_shop",
+    "coffee_shop",
+    "cafe",
+    "fast_food_restaurant",
+    "store",
+    "food",
+    "point_of_interest",
+    "establishment",
+)
+
+DEFAULT_TYPE = TYPES[0]
+
+TABLE_A_TYPES = (
+    # Automotive
+    "car_dealer",
+    "car_rental",
+    "car_repair",
+    "car_wash",
+    "electric_vehicle_charging_station",
+    "gas_station",
+    "parking",
+    "rest_stop",
+    # Business
+    "farm",
+    # Culture
+    "art_gallery",
+    "museum",
+    "performing_arts_theater",
+    # Education
+    "library",
+    "preschool",
+    "primary_school",
+    "school",
+    "secondary_school",
+    "university",
+    # Entertainment and recreation
+    "amusement_center",
+    "amusement_park",
+    "aquarium",
+    "banquet_hall",
+    "bowling_alley",
+    "casino",
+    "community_center",
+    "convention_center",
+    "cultural_center",
+    "dog_park",
+    "event_venue",
+    "hiking_area",
+    "historical_landmark",
+    "marina",
+    "movie_rental",
+    "movie_theater",
+    "national_park",
+    "night_club",
+    "park",
+    "tourist_attraction",
+    "visitor_center",
+    "wedding_venue",
+    "zoo",
+    # Finance
+    "accounting",
+    "atm",
+    "bank",
+    # Food and drink
+    "american_restaurant",
+    "bakery",
+    "bar",
+    "barbecue_restaurant",
+    "brazilian_restaurant",
+    "breakfast_restaurant",
+    "brunch_restaurant",
+    "cafe",
+    "chinese_restaurant",
+    "coffee_shop",
+    "fast_food_restaurant",
+    "french_restaurant",
+    "greek_restaurant",
+    "hamburger_restaurant",
+    "ice_cream_shop",
+    "indian_restaurant",
+    "indonesian_restaurant",
+    "italian_restaurant",
+    "japanese_restaurant",
+    "korean_restaurant",
+    "lebanese_restaurant",
+    "meal_delivery",
+    "meal_takeaway",
+    "mediterranean_restaurant",
+    "mexican_restaurant",
+    "middle_eastern_restaurant",
+    "pizza_restaurant",
+    "ramen_restaurant",
+    "restaurant",
+    "sandwich_shop",
+    "seafood_restaurant",
+    "spanish_restaurant",
+    "steak_house",
+    "sushi_restaurant",
+    "thai_restaurant",
+    "turkish_restaurant",
+    "vegan_restaurant",
+    "vegetarian_restaurant",
+    "vietnamese_restaurant",
+    # Geographical areas
+    "administrative_area_level_1",
+    "administrative_area_level_2",
+    "country",
+    "locality",
+    "postal_code",
+    "school_district",
+    # Government
+    "city_hall",
+    "courthouse",
+    "embassy",
+    "fire_station",
+    "local_government_office",
+    "police",
+    "post_office",
+    # Health and wellness
+    "dental_clinic",
+    "dentist",
+    "doctor",
+    "drugstore",
+    "hospital",
+    "medical_lab",
+    "pharmacy",
+    "physiotherapist",
+    "spa",
+    # Lodging
+    "bed_and_breakfast",
+    "campground",
+    "camping_cabin",
+    "cottage",
+    "extended_stay_hotel",
+    "farmstay",
+    "guest_house",
+    "hostel",
+    "hotel",
+    "lodging",
+    "motel",
+    "private_guest_room",
+    "resort_hotel",
+    "rv_park",
+    # Places of worship
+    "church",
+    "hindu_temple",
+    "mosque",
+    "synagogue",
+    # Services
+    "barber_shop",
+    "beauty_salon",
+    "cemetery",
+    "child_care_agency",
+    "consultant",
+    "courier_service",
+    "electrician",
+    "florist",
+    "funeral_home",
+    "hair_care",
+    "hair_salon",
+    "insurance_agency",
+    "laundry",
+    "lawyer",
+    "locksmith",
+    "moving_company",
+    "painter",
+    "plumber",
+    "real_estate_agency",
+    "roofing_contractor",
+    "storage",
+    "tailor",
+    "telecommunications_service_provider",
+    "travel_agency",
+    "veterinary_care",
+    # Shopping
+    "auto_parts_store",
+    "bicycle_store",
+    "book_store",
+    "cell_phone_store",
+    "clothing_store",
+    "convenience_store",
+    "department_store",
+    "discount_store",
+    "electronics_store",
+    "furniture_store",
+    "gift_shop",
+    "grocery_store",
+    "hardware_store",
+    "home_goods_store",
+    "home_improvement_store",
+    "jewelry_store",
+    "liquor_store",
+    "market",
+    "pet_store",
+    "shoe_store",
+    "shopping_mall",
+    "sporting_goods_store",
+    "store",
+    "supermarket",
+    "wholesaler",
+    # Sports
+    "athletic_field",
+    "fitness_center",
+    "golf_course",
+    "gym",
+    "playground",
+    "ski_resort",
+    "sports_club",
+    "sports_complex",
+    "stadium",
+    "swimming_pool",
+    # Transportation
+    "airport",
+    "bus_station",
+    "bus_stop",
+    "ferry_terminal",
+    "heliport",
+    "light_rail_station",
+    "park_and_ride",
+    "subway_station",
+    "taxi_stand",
+    "train_station",
+    "transit_depot",
+    "transit_station",
+    "truck_stop",
+)
+
+TABLE_A_TYPE_SET = frozenset(TABLE_A_TYPES)
+
+_FOOD_ACTIVITY = ("restaurant",)
+_DAY_ACTIVITY = (
+    "tourist_attraction",
+    "museum",
+    "art_gallery",
+    "park",
+    "aquarium",
+    "zoo",
+    "amusement_park",
+    "hiking_area",
+    "marina",
+    "shopping_mall",
+)
+_EVENING_ACTIVITY = ("bar", "night_club", "casino", "performing_arts_theater")
+
+# includedTypes by normalized activity type, see `normalize_activity`. Activities
+# that are not listed are matched by their words, e.g. "late dinner" by "dinner".
+ACTIVITY_INCLUDED_TYPES: T.Dict[str, T.Tuple[str, ...]] = {
+    "breakfast": ("breakfast_restaurant", "brunch_restaurant", "cafe", "coffee_shop", "bakery"),
+    "brunch": ("brunch_restaurant", "breakfast_restaurant", "cafe"),
+    "coffee": ("coffee_shop", "cafe", "bakery"),
+    "cafe": ("cafe", "coffee_shop", "bakery"),
+    "lunch": _FOOD_ACTIVITY,
+    "dinner": _FOOD_ACTIVITY,
+    "restaurant": _FOOD_ACTIVITY,
+    "dessert": ("ice_cream_shop", "bakery", "cafe"),
+    "activity": _DAY_ACTIVITY,
+    "morning activity": _DAY_ACTIVITY,
+    "afternoon activity": _DAY_ACTIVITY,
+    "sightseeing": ("tourist_attraction", "historical_landmark", "museum", "park"),
+    "museum": ("museum", "art_gallery", "cultural_center"),
+    "shopping": ("shopping_mall", "clothing_store", "department_store", "gift_shop", "market"),
+    "spa": ("spa",),
+    "evening activity": _EVENING_ACTIVITY,
+    "evening": _EVENING_ACTIVITY,
+    "night activity": _EVENING_ACTIVITY,
+    "nightlife": ("night_club", "bar"),
+    "bar": ("bar",),
+    "drinks": ("bar",),
+    "club": ("night_club",),
+    "nightclub": ("night_club",),
+    "show": ("performing_arts_theater", "movie_theater"),
+    "hotel": ("hotel", "resort_hotel", "bed_and_breakfast", "lodging"),
+    "accommodation": ("hotel", "resort_hotel", "bed_and_breakfast", "lodging"),
+    "lodging": ("hotel", "resort_hotel", "bed_and_breakfast", "lodging"),
+}
+
+_SEPARATORS = re.compile(r"[\s_\-/]+")
+
+# Type -> single bit mask, grows with types outside Table A as they are seen
+_TYPE_BITS: T.Dict[str, int] = {
+    place_type: 1 << type_id for type_id, place_type in enumerate(TABLE_A_TYPES)
+}
+_TYPE_BITS_LOCK = threading.Lock()
+
+assert all(
+    TABLE_A_TYPE_SET.issuperset(types) for types in ACTIVITY_INCLUDED_TYPES.values()
+), "Activity types must map to Table A types"
+
+
+def _type_bit(place_type: str) -> int:
+    bit = _TYPE_BITS.get(place_type)
+    if bit is None:
+        with _TYPE_BITS_LOCK:
+            bit = _TYPE_BITS.setdefault(place_type, 1 << len(_TYPE_BITS))
+    return bit
+
+
+def type_id(place_type: str) -> int:
+    """Stable for the life of the process, Table A types come first in table order"""
+    return _type_bit(place_type).bit_length() - 1
+
+
+def type_mask(types: T.Iterable[str]) -> int:
+    mask = 0
+    for place_type in types:
+        mask |= _type_bit(place_type)
+    return mask
+
+
+def mask_types(mask: int) -> T.List[str]:
+    """Types of `mask` in id order"""
+    return [place_type for place_type, bit in list(_TYPE_BITS.items()) if mask & bit]
+
+
+def is_compatible(types_mask: int, included_mask: int) -> bool:
+    """Whether a place with `types_mask` matches `includedTypes`, any type if none are given"""
+    return not included_mask or bool(types_mask & included_mask)
+
+
+def table_a_types(types: T.Iterable[str]) -> T.List[str]:
+    """The types usable in `includedTypes`, in order"""
+    return [place_type for place_type in types if place_type in TABLE_A_TYPE_SET]
+
+
+def normalize_activity(activity_type: str) -> str:
+    return _SEPARATORS.sub(" ", activity_type.strip().lower())
+
+
+@functools.lru_cache(maxsize=1024)
+def activity_included_types(activity_type: str) -> T.Tuple[str, ...]:
+    """
+    includedTypes for an itinerary `activity_type`: an exact match, else the
+    first word with a mapping, else none (any type)
+    """
+    activity = normalize_activity(activity_type)
+    if activity in ACTIVITY_INCLUDED_TYPES:
+        return ACTIVITY_INCLUDED_TYPES[activity]
+    for word in activity.split(" "):
+        if word in ACTIVITY_INCLUDED_TYPES:
+            return ACTIVITY_INCLUDED_TYPES[word]
+    return ()
@@ -6,15 +6,108 @@ https://developers.google.com/maps/documentation/places/web-service/text-search
 https://developers.google.com/maps/documentation/places/web-service/search
 """
 
+import asyncio
+import concurrent.futures
 import copy
-import json
 import os
+import threading
+import time
 import typing as T
 
+import aiohttp
 import requests
 
-from constants import DEFAULT_FIELDS
-from google.utils import TYPES, Coordinates
+import log
+import metrics
+import serialization
+from constants import (
+    DEFAULT_FIELDS,
+    GOOGLE_API_DEFAULT_REQUESTS_PER_SECOND,
+    GOOGLE_API_MAX_RETRIES,
+    GOOGLE_API_MIN_REQUESTS_PER_SECOND,
+    GOOGLE_API_REQUESTS_PER_SECOND,
+    GOOGLE_API_RETRY_BASE_DELAY_SECONDS,
+    GOOGLE_API_RETRY_MAX_DELAY_SECONDS,
+    GOOGLE_MAPS_API_BASE_URL,
+    GOOGLE_PLACES_API_BASE_URL,
+    PLACE_DETAILS_FIELDS,
+)
+from google.place_types import TYPES
+from google.places_cache import PlacesCache, make_places_cache_key
+from google.spatial_index import ALL_TYPES, SpatialIndex
+from google.transport import AsyncHttpTransport, HttpTransport, get_default_transport
+from google.utils import Coordinates
+from rate_limit import AdaptiveRateLimiter, RetryBudget, backoff_delay, parse_retry_after
+
+logger = log.get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLED_STATUS_CODE = 429
+
+# Shared by every call in the process so the per-endpoint quota is respected
+# no matter how many threads or searches are running
+RATE_LIMITER = AdaptiveRateLimiter(
+    GOOGLE_API_REQUESTS_PER_SECOND,
+    default_rate=GOOGLE_API_DEFAULT_REQUESTS_PER_SECOND,
+    min_rate=GOOGLE_API_MIN_REQUESTS_PER_SECOND,
+)
+
+
+def endpoint_name(url: str) -> str:
+    """
+    Rate limit bucket for a url, e.g. `searchText` for `.../v1/places:searchText`,
+    `placeDetails` for `.../v1/places/<place id>` and `details` for
+    `.../maps/api/place/details/json`
+    """
+    parts = url.split("?")[0].rstrip("/").split("/")
+    if ":" in parts[-1]:
+        return parts[-1].split(":", 1)[1]
+    if len(parts) > 1 and parts[-2] == "places":
+        return "placeDetails"
+    if parts[-1] == "json" and len(parts) > 1:
+        return parts[-2]
+    return parts[-1]
+
+
+def _retry_delay(
+    endpoint: str,
+    attempt: int,
+    status_code: T.Optional[int],
+    retry_after: T.Optional[str],
+    retry_budget: T.Optional[RetryBudget],
+) -> T.Optional[float]:
+    """
+    Update the rate limiter with the outcome of a request and return how long
+    to wait before retrying it, or None if it should not be retried.
+    A `status_code` of None means the request failed to connect or timed out.
+    """
+    if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+        RATE_LIMITER.on_success(endpoint)
+        return None
+
+    if status_code == THROTTLED_STATUS_CODE:
+        RATE_LIMITER.on_throttled(endpoint)
+
+    if attempt >= GOOGLE_API_MAX_RETRIES:
+        return None
+
+    if retry_budget is not None and not retry_budget.try_spend():
+        return None
+
+    return backoff_delay(
+        attempt,
+        GOOGLE_API_RETRY_BASE_DELAY_SECONDS,
+        GOOGLE_API_RETRY_MAX_DELAY_SECONDS,
+        parse_retry_after(retry_after),
+    )
+
+
+def _parse_response(url: str, response: T.Any) -> T.Dict[T.Any, T.Any]:
+    if not isinstance(response, dict):
+        logger.warning("Failed results from {}: {}", url, response)
+        return {}
+
+    return response
 
 
 def call_api(
@@ -23,32 +116,225 @@ def call_api(
     params: T.Optional[T.Dict[str, T.Any]] = None,
     json_data: T.Optional[T.Dict[str, T.Any]] = None,
     timeout: float = 10.0,
+    transport: T.Optional[HttpTransport] = None,
+    retry_budget: T.Optional[RetryBudget] = None,
+    method: str = "POST",
 ) -> T.Dict[T.Any, T.Any]:
     headers = headers or {}
     json_data = json_data or {}
     params = params or {}
+    transport = transport or get_default_transport()
+    endpoint = endpoint_name(url)
 
     try:
-        response = requests.post(
-            url, headers=headers, params=params, json=json_data, timeout=timeout
-        ).json()
-        if not isinstance(response, dict):
-            print(f"Failed results from {url}")
-            print(response)
-            return {}
-
-        return response
+        attempt = 0
+        while True:
+            RATE_LIMITER.acquire(endpoint)
+            try:
+                if method == "GET":
+                    response = transport.get(url, headers=headers, params=params, timeout=timeout)
+                else:
+                    response = transport.post(
+                        url, headers=headers, params=params, json_data=json_data, timeout=timeout
+                    )
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                delay = _retry_delay(endpoint, attempt, None, None, retry_budget)
+                if delay is None:
+                    raise
+                metrics.add_retry()
+                logger.info("Retrying {} in {:.2f}s after {}", url, delay, exception)
+            else:
+                delay = _retry_delay(
+                    endpoint,
+                    attempt,
+                    response.status_code,
+                    response.headers.get("Retry-After"),
+                    retry_budget,
+                )
+                if delay is None:
+                    break
+                metrics.add_retry()
+                logger.info(
+                    "Retrying {} in {:.2f}s after status {}", url, delay, response.status_code
+                )
+
+            time.sleep(delay)
+            attempt += 1
+
+        metrics.add_bytes_received(len(response.content))
+        return _parse_response(url, serialization.loads(response.content))
     except Exception as exception:  # pylint: disable=broad-except
-        print(f"Failed results for {url}")
-        print(exception)
+        logger.warning("Failed results for {}: {}", url, exception)
         raise exception
 
 
+async def call_api_async(
+    url: str,
+    transport: AsyncHttpTransport,
+    headers: T.Optional[T.Dict[str, T.Any]] = None,
+    params: T.Optional[T.Dict[str, T.Any]] = None,
+    json_data: T.Optional[T.Dict[str, T.Any]] = None,
+    timeout: float = 10.0,
+    retry_budget: T.Optional[RetryBudget] = None,
+    method: str = "POST",
+) -> T.Dict[T.Any, T.Any]:
+    headers = headers or {}
+    json_data = json_data or {}
+    params = params or {}
+    endpoint = endpoint_name(url)
+
+    try:
+        attempt = 0
+        while True:
+            await RATE_LIMITER.acquire_async(endpoint)
+            try:
+                if method == "GET":
+                    response = await transport.get(
+                        url, headers=headers, params=params, timeout=timeout
+                    )
+                else:
+                    response = await transport.post(
+                        url, headers=headers, params=params, json_data=json_data, timeout=timeout
+                    )
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exception:
+                delay = _retry_delay(endpoint, attempt, None, None, retry_budget)
+                if delay is None:
+                    raise
+                metrics.add_retry()
+                logger.info("Retrying {} in {:.2f}s after {}", url, delay, exception)
+            else:
+                delay = _retry_delay(
+                    endpoint,
+                    attempt,
+                    response.status_code,
+                    response.headers.get("Retry-After"),
+                    retry_budget,
+                )
+                if delay is None:
+                    break
+                metrics.add_retry()
+                logger.info(
+                    "Retrying {} in {:.2f}s after status {}", url, delay, response.status_code
+                )
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        metrics.add_bytes_received(len(response.content))
+        return _parse_response(url, serialization.loads(response.content))
+    except Exception as exception:  # pylint: disable=broad-except
+        logger.warning("Failed results for {}: {}", url, exception)
+        raise exception
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests.
+
+    The first caller for a key runs the request, callers arriving with the
+    same key while it is in flight wait for and share its result (or its
+    exception) instead of sending their own.
+    """
+
+    def __init__(self) -> None:
+        self.coalesced_calls = 0
+        self._in_flight: T.Dict[str, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url: str, json_data: T.Dict[str, T.Any], field_mask: str) -> str:
+        return serialization.dumps_str([url, json_data, field_mask], sort_keys=True)
+
+    def do(self, key: str, func: T.Callable[[], T.Any]) -> T.Tuple[T.Any, bool]:
+        """Return the result of `func` and whether it was shared with another caller"""
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if future is None:
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced_calls += 1
+
+        if not is_leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as exception:
+            future.set_exception(exception)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+        return result, False
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of `SingleFlight`, keyed the same way.
+
+    Followers await the leader's future through `asyncio.shield`, so a
+    cancelled follower does not cancel the request the others are waiting for.
+    Futures belong to one event loop, so in-flight requests are only shared
+    within the loop they were started on.
+    """
+
+    def __init__(self) -> None:
+        self.coalesced_calls = 0
+        self._in_flight: T.Dict[T.Tuple[int, str], asyncio.Future] = {}
+
+    async def do(self, key: str, func: T.Callable[[], T.Awaitable[T.Any]]) -> T.Tuple[T.Any, bool]:
+        """Return the result of `func` and whether it was shared with another caller"""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        future = self._in_flight.get(loop_key)
+        if future is not None:
+            self.coalesced_calls += 1
+            return await asyncio.shield(future), True
+
+        future = loop.create_future()
+        self._in_flight[loop_key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exception:
+            future.set_exception(exception)
+            # Nobody may be waiting, do not log it as never retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._in_flight[loop_key]
+
+        return result, False
+
+
+# Shared by every GooglePlacesAPI instance in the process
+IN_FLIGHT = SingleFlight()
+ASYNC_IN_FLIGHT = AsyncSingleFlight()
+
+
 class GoogleMapsAPI:
-    def __init__(self, api_key: str, verbose: bool = False) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        verbose: bool = False,
+        transport: T.Optional[HttpTransport] = None,
+        retry_budget: T.Optional[RetryBudget] = None,
+        base_url: str = GOOGLE_MAPS_API_BASE_URL,
+    ) -> None:
         self.api_key = api_key
-        self.base_url = "https://maps.googleapis.com/maps/api"
+        self.base_url = base_url
         self.verbose = verbose
+        self.transport = transport or get_default_transport()
+        self.retry_budget = retry_budget
 
     def find_place_from_location(self, place: str, location: Coordinates) -> T.Dict[T.Any, T.Any]:
         location_string = f"{location['lat']},{location['lng']}"
@@ -62,16 +348,17 @@ class GoogleMapsAPI:
 
         url = os.path.join(self.base_url, "place", "findplacefromtext", "json")
 
-        if self.verbose:
-            print(f"Searching for {place} at {location_string}")
+        logger.debug("Searching for {} at {}", place, location_string)
 
-        return call_api(url, params=params)
+        return call_api(
+            url, params=params, transport=self.transport, retry_budget=self.retry_budget
+        )
 
     def nearby_search(
         self,
         location: Coordinates,
         radius_meters: int,
-        location_type: T.List[str],
+        location_type: str,
         keyword: str,
     ) -> T.Dict[T.Any, T.Any]:
         location_string = f"{location['lat']},{location['lng']}"
@@ -87,10 +374,11 @@ class GoogleMapsAPI:
 
         url = os.path.join(self.base_url, "place", "nearbysearch", "json")
 
-        if self.verbose:
-            print(f"Searching for {keyword} at {location_string}")
+        logger.debug("Searching for {} at {}", keyword, location_string)
 
-        return call_api(url, params=params)
+        return call_api(
+            url, params=params, transport=self.transport, retry_budget=self.retry_budget
+        )
 
     def details_from_place_id(
         self, place_id: str, fields: T.Optional[T.List[str]] = None
@@ -105,10 +393,11 @@ class GoogleMapsAPI:
 
         url = os.path.join(self.base_url, "place", "details", "json")
 
-        if self.verbose:
-            print(f"Getting details for {place_id}")
+        logger.debug("Getting details for {}", place_id)
 
-        return call_api(url, params=params)
+        return call_api(
+            url, params=params, transport=self.transport, retry_budget=self.retry_budget
+        )
 
 
 class GooglePlacesAPI:
@@ -122,18 +411,175 @@ class GooglePlacesAPI:
     MAX_VIEWPOINT_WIDTH_METERS = 700.0
     VIEWPOINT_WIDTH_STEP_METERS = 50.0
 
-    def __init__(self, api_key: str, verbose: bool = False) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        verbose: bool = False,
+        transport: T.Optional[HttpTransport] = None,
+        cache: T.Optional[PlacesCache] = None,
+        async_transport: T.Optional[AsyncHttpTransport] = None,
+        retry_budget: T.Optional[RetryBudget] = None,
+        spatial_index: T.Optional[SpatialIndex] = None,
+        base_url: str = GOOGLE_PLACES_API_BASE_URL,
+    ) -> None:
         self.api_key = api_key
         self.HEADERS["X-Goog-Api-Key"] = api_key
-        self.base_url = "https://places.googleapis.com/v1"
+        self.base_url = base_url
         self.verbose = verbose
+        self.transport = transport or get_default_transport()
+        self.async_transport = async_transport
+        self.retry_budget = retry_budget
+        self.cache = cache
+        self.spatial_index = spatial_index
+        # Per-instance counters, the cache keeps its own process-wide totals
+        self.stats = {
+            "api_calls": 0,
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "coalesced_calls": 0,
+            "index_hits": 0,
+            "index_partial_hits": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _cache_lookup(
+        self, url: str, headers: T.Dict[str, T.Any], json_data: T.Dict[str, T.Any]
+    ) -> T.Tuple[T.Optional[str], T.Optional[T.Dict[T.Any, T.Any]]]:
+        if self.cache is None:
+            return None, None
+
+        cache_key = make_places_cache_key(url, json_data, headers["X-Goog-FieldMask"])
+        return cache_key, self._cache_result(self.cache.get(cache_key))
+
+    async def _cache_lookup_async(
+        self, url: str, headers: T.Dict[str, T.Any], json_data: T.Dict[str, T.Any]
+    ) -> T.Tuple[T.Optional[str], T.Optional[T.Dict[T.Any, T.Any]]]:
+        """`_cache_lookup` with the SQLite tier read off the event loop"""
+        if self.cache is None:
+            return None, None
+
+        cache_key = make_places_cache_key(url, json_data, headers["X-Goog-FieldMask"])
+        return cache_key, self._cache_result(await self.cache.get_async(cache_key))
+
+    def _cache_result(self, cached: T.Optional[T.Any]) -> T.Optional[T.Dict[T.Any, T.Any]]:
+        if cached is None:
+            self._count("cache_misses")
+            return None
+
+        self._count("cache_hits")
+        metrics.set_outcome("cache_hit")
+        return T.cast(T.Dict[T.Any, T.Any], cached)
+
+    def _cache_store(self, cache_key: T.Optional[str], response: T.Dict[T.Any, T.Any]) -> None:
+        if self.cache is not None and cache_key is not None and "error" not in response:
+            self.cache.put(cache_key, response)
+
+    async def _cache_store_async(
+        self, cache_key: T.Optional[str], response: T.Dict[T.Any, T.Any]
+    ) -> None:
+        """`_cache_store` with the SQLite tier written off the event loop"""
+        if self.cache is not None and cache_key is not None and "error" not in response:
+            await self.cache.put_async(cache_key, response)
+
+    def _request(
+        self,
+        url: str,
+        headers: T.Dict[str, T.Any],
+        json_data: T.Dict[str, T.Any],
+        method: str = "POST",
+    ) -> T.Dict[T.Any, T.Any]:
+        cache_key, cached = self._cache_lookup(url, headers, json_data)
+        if cached is not None:
+            return cached
+
+        def fetch() -> T.Dict[T.Any, T.Any]:
+            response = call_api(
+                url,
+                headers,
+                json_data=json_data,
+                transport=self.transport,
+                retry_budget=self.retry_budget,
+                method=method,
+            )
+            self._cache_store(cache_key, response)
+            return response
+
+        response, shared = IN_FLIGHT.do(
+            SingleFlight.make_key(url, json_data, headers["X-Goog-FieldMask"]), fetch
+        )
+        self._count("coalesced_calls" if shared else "api_calls")
+        if shared:
+            metrics.set_outcome("coalesced")
+        elif "error" in response:
+            metrics.set_outcome(metrics.ERROR)
+
+        return T.cast(T.Dict[T.Any, T.Any], response)
+
+    async def _request_async(
+        self,
+        url: str,
+        headers: T.Dict[str, T.Any],
+        json_data: T.Dict[str, T.Any],
+        method: str = "POST",
+    ) -> T.Dict[T.Any, T.Any]:
+        assert self.async_transport is not None, "An async transport is required for async calls"
+
+        cache_key, cached = await self._cache_lookup_async(url, headers, json_data)
+        if cached is not None:
+            return cached
+
+        async def fetch() -> T.Dict[T.Any, T.Any]:
+            assert self.async_transport is not None
+            response = await call_api_async(
+                url,
+                self.async_transport,
+                headers=headers,
+                json_data=json_data,
+                retry_budget=self.retry_budget,
+                method=method,
+            )
+            await self._cache_store_async(cache_key, response)
+            return response
+
+        response, shared = await ASYNC_IN_FLIGHT.do(
+            SingleFlight.make_key(url, json_data, headers["X-Goog-FieldMask"]), fetch
+        )
+        self._count("coalesced_calls" if shared else "api_calls")
+        if shared:
+            metrics.set_outcome("coalesced")
+        elif "error" in response:
+            metrics.set_outcome(metrics.ERROR)
+
+        return T.cast(T.Dict[T.Any, T.Any], response)
 
+    @metrics.METRICS.timed("places.text_search")
     def text_search(
         self,
         query: str,
         fields: T.Optional[T.List[str]] = None,
         data: T.Optional[T.Dict[str, T.Any]] = None,
     ) -> T.Dict[T.Any, T.Any]:
+        return self._request(*self._text_search_request(query, fields, data))
+
+    @metrics.METRICS.timed("places.text_search")
+    async def text_search_async(
+        self,
+        query: str,
+        fields: T.Optional[T.List[str]] = None,
+        data: T.Optional[T.Dict[str, T.Any]] = None,
+    ) -> T.Dict[T.Any, T.Any]:
+        return await self._request_async(*self._text_search_request(query, fields, data))
+
+    def _text_search_request(
+        self,
+        query: str,
+        fields: T.Optional[T.List[str]] = None,
+        data: T.Optional[T.Dict[str, T.Any]] = None,
+    ) -> T.Tuple[str, T.Dict[str, T.Any], T.Dict[str, T.Any]]:
         json_data = {
             "textQuery": query,
         }
@@ -141,9 +587,7 @@ class GooglePlacesAPI:
         if data:
             json_data.update(data)
 
-        if self.verbose:
-            print(f"Searching for {query}")
-            print(f"Data: {json.dumps(json_data, indent=2)}")
+        logger.debug("Searching for {} with {}", query, json_data)
 
         headers = copy.deepcopy(self.HEADERS)
 
@@ -151,8 +595,9 @@ class GooglePlacesAPI:
 
         url = os.path.join(self.base_url, "places:searchText")
 
-        return call_api(url, headers, json_data)
+        return url, headers, json_data
 
+    @metrics.METRICS.timed("places.nearby_search")
     def nearby_places(
         self,
         latitude: float,
@@ -161,6 +606,132 @@ class GooglePlacesAPI:
         fields: T.Optional[T.List[str]] = None,
         data: T.Optional[T.Dict[str, T.Any]] = None,
     ) -> T.Dict[T.Any, T.Any]:
+        url, headers, json_data = self._nearby_places_request(
+            latitude, longitude, radius_meters, fields, data
+        )
+        if not self._records_to_spatial_index(headers):
+            return self._request(url, headers, json_data)
+
+        missing_types = self._index_missing_types(headers, json_data)
+        if not missing_types:
+            self._count("index_hits")
+            metrics.set_outcome("index_hit")
+            return self._index_answer(headers, json_data)
+
+        response = self._request(url, headers, self._with_types(json_data, missing_types))
+        return self._index_merge(headers, json_data, missing_types, response)
+
+    @metrics.METRICS.timed("places.nearby_search")
+    async def nearby_places_async(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        fields: T.Optional[T.List[str]] = None,
+        data: T.Optional[T.Dict[str, T.Any]] = None,
+    ) -> T.Dict[T.Any, T.Any]:
+        url, headers, json_data = self._nearby_places_request(
+            latitude, longitude, radius_meters, fields, data
+        )
+        if not self._records_to_spatial_index(headers):
+            return await self._request_async(url, headers, json_data)
+
+        missing_types = self._index_missing_types(headers, json_data)
+        if not missing_types:
+            self._count("index_hits")
+            metrics.set_outcome("index_hit")
+            return self._index_answer(headers, json_data)
+
+        response = await self._request_async(
+            url, headers, self._with_types(json_data, missing_types)
+        )
+        return self._index_merge(headers, json_data, missing_types, response)
+
+    def _records_to_spatial_index(self, headers: T.Dict[str, T.Any]) -> bool:
+        return self.spatial_index is not None and self.spatial_index.can_record(
+            headers["X-Goog-FieldMask"]
+        )
+
+    @staticmethod
+    def _nearby_query(json_data: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+        """Keyword arguments of the spatial index methods for a searchNearby body"""
+        circle = json_data["locationRestriction"]["circle"]
+        return {
+            "latitude": circle["center"]["latitude"],
+            "longitude": circle["center"]["longitude"],
+            "radius_meters": circle["radius"],
+            "min_rating": float(json_data.get("minRating", 0.0)),
+        }
+
+    def _index_missing_types(
+        self, headers: T.Dict[str, T.Any], json_data: T.Dict[str, T.Any]
+    ) -> T.List[str]:
+        assert self.spatial_index is not None
+        return self.spatial_index.missing_types(
+            included_types=json_data.get("includedTypes", []),
+            field_mask=headers["X-Goog-FieldMask"],
+            **self._nearby_query(json_data),
+        )
+
+    def _index_answer(
+        self, headers: T.Dict[str, T.Any], json_data: T.Dict[str, T.Any]
+    ) -> T.Dict[T.Any, T.Any]:
+        """A searchNearby response built from the spatial index, empty like Google's if no places"""
+        assert self.spatial_index is not None
+        places = self.spatial_index.query(
+            included_types=json_data.get("includedTypes", []),
+            max_results=json_data.get("maxResultCount"),
+            field_mask=headers["X-Goog-FieldMask"],
+            **self._nearby_query(json_data),
+        )
+        return {"places": places} if places else {}
+
+    @staticmethod
+    def _with_types(json_data: T.Dict[str, T.Any], types: T.List[str]) -> T.Dict[str, T.Any]:
+        if types == [ALL_TYPES] or types == json_data.get("includedTypes"):
+            return json_data
+        return {**json_data, "includedTypes": types}
+
+    def _index_merge(
+        self,
+        headers: T.Dict[str, T.Any],
+        json_data: T.Dict[str, T.Any],
+        missing_types: T.List[str],
+        response: T.Dict[T.Any, T.Any],
+    ) -> T.Dict[T.Any, T.Any]:
+        """
+        Index a fetched response. If only some of the types were fetched, answer
+        the whole query from the index, which now holds the fetched places too.
+        """
+        assert self.spatial_index is not None
+        if "error" in response:
+            return response
+
+        places = response.get("places", [])
+        max_results = json_data.get("maxResultCount", self.spatial_index.max_results)
+        self.spatial_index.record_fetch(
+            types=missing_types,
+            places=places,
+            complete=len(places) < max_results,
+            field_mask=headers["X-Goog-FieldMask"],
+            **self._nearby_query(json_data),
+        )
+
+        if missing_types == (json_data.get("includedTypes") or [ALL_TYPES]):
+            return response
+
+        self._count("index_partial_hits")
+        metrics.set_outcome("index_partial_hit")
+        return self._index_answer(headers, json_data)
+
+    def _nearby_places_request(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        fields: T.Optional[T.List[str]] = None,
+        data: T.Optional[T.Dict[str, T.Any]] = None,
+    ) -> T.Tuple[str, T.Dict[str, T.Any], T.Dict[str, T.Any]]:
         radius_meters = min(radius_meters, 50000.0)
 
         if fields is None:
@@ -184,15 +755,43 @@ class GooglePlacesAPI:
 
         url = os.path.join(self.base_url, "places:searchNearby")
 
-        if self.verbose:
-            print(
-                f"Searching for nearby places to {latitude}, {longitude} "
-                f"within {radius_meters} meters"
-            )
-        if self.verbose:
-            print(f"{json.dumps(json_data, indent=2)}")
+        logger.debug(
+            "Searching for nearby places to {}, {} within {} meters with {}",
+            latitude,
+            longitude,
+            radius_meters,
+            json_data,
+        )
+
+        return url, headers, json_data
+
+    @metrics.METRICS.timed("places.place_details")
+    def place_details(
+        self, place_id: str, fields: T.Optional[T.List[str]] = None
+    ) -> T.Dict[T.Any, T.Any]:
+        """A single place by id, `fields` without the `places.` prefix of the search masks"""
+        return self._request(*self._place_details_request(place_id, fields), method="GET")
+
+    @metrics.METRICS.timed("places.place_details")
+    async def place_details_async(
+        self, place_id: str, fields: T.Optional[T.List[str]] = None
+    ) -> T.Dict[T.Any, T.Any]:
+        return await self._request_async(
+            *self._place_details_request(place_id, fields), method="GET"
+        )
+
+    def _place_details_request(
+        self, place_id: str, fields: T.Optional[T.List[str]] = None
+    ) -> T.Tuple[str, T.Dict[str, T.Any], T.Dict[str, T.Any]]:
+        headers = copy.deepcopy(self.HEADERS)
+
+        headers["X-Goog-FieldMask"] = ",".join(fields or PLACE_DETAILS_FIELDS)
+
+        url = os.path.join(self.base_url, "places", place_id)
+
+        logger.debug("Getting details for {}", place_id)
 
-        return call_api(url, json_data=json_data, headers=headers)
+        return url, headers, {}
 
     def search_location_radius(
         self,
@@ -206,8 +805,9 @@ class GooglePlacesAPI:
     ) -> T.Dict[T.Any, T.Any]:
         radius_meters = min(radius_meters, 50000.0)
 
-        if self.verbose:
-            print(f"Searching for {query} within {radius_meters} meters of {latitude}, {longitude}")
+        logger.debug(
+            "Searching for {} within {} meters of {}, {}", query, radius_meters, latitude, longitude
+        )
         json_data: T.Dict[str, T.Any] = {
             "locationBias": {
                 "circle": {
@@ -223,6 +823,4 @@ class GooglePlacesAPI:
         if included_type is not None:
             json_data["includedType"] = included_type
 
-        if self.verbose:
-            print(f"{json.dumps(json_data, indent=2)}")
         return self.text_search(query=query, fields=fields, data=json_data)
@@ -0,0 +1,99 @@
+"""
+Cache for Places API responses
+
+Requests are keyed on the endpoint, the normalized query text, the rounded
+search circle, the rating/type filters and the field mask, so the same
+"X in South Beach Miami, FL" lookup is only billed once per TTL.
+"""
+
+import copy
+import hashlib
+import json
+import typing as T
+
+from cache import LruCache, SqliteCache, TieredCache
+from constants import (
+    PLACES_CACHE_COORDINATE_DECIMALS,
+    PLACES_CACHE_DISK_MAX_ENTRIES,
+    PLACES_CACHE_MEMORY_MAX_ENTRIES,
+    PLACES_CACHE_TTL_SECONDS,
+)
+from google.place import Place, PlacesResponse
+from text import clean_text
+
+CIRCLE_KEYS = ["locationBias", "locationRestriction"]
+
+
+def _normalize_circle(area: T.Dict[str, T.Any]) -> T.Dict[str, T.Any]:
+    circle = area.get("circle")
+    if not circle:
+        return area
+
+    center = circle.get("center", {})
+    return {
+        "circle": {
+            "center": {
+                "latitude": round(
+                    float(center.get("latitude", 0.0)), PLACES_CACHE_COORDINATE_DECIMALS
+                ),
+                "longitude": round(
+                    float(center.get("longitude", 0.0)), PLACES_CACHE_COORDINATE_DECIMALS
+                ),
+            },
+            "radius": round(float(circle.get("radius", 0.0))),
+        }
+    }
+
+
+def make_places_cache_key(url: str, json_data: T.Dict[str, T.Any], field_mask: str) -> str:
+    body = copy.deepcopy(json_data)
+
+    if "textQuery" in body:
+        body["textQuery"] = " ".join(clean_text(body["textQuery"]).split())
+
+    for circle_key in CIRCLE_KEYS:
+        if circle_key in body:
+            body[circle_key] = _normalize_circle(body[circle_key])
+
+    if "minRating" in body:
+        body["minRating"] = float(body["minRating"])
+
+    if "includedTypes" in body:
+        body["includedTypes"] = sorted(set(body["includedTypes"]))
+
+    fields = sorted(field.strip() for field in field_mask.split(",") if field.strip())
+
+    serialized = json.dumps([url, body, fields], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class PlacesCache(TieredCache):
+    """
+    Places response cache with an in-process LRU tier and, when `path`
+    is given, a persistent SQLite tier. The memory tier holds compact
+    `PlacesResponse` records (`Place` records for Place Details responses)
+    and hands out fresh dicts on every hit.
+    """
+
+    def __init__(
+        self,
+        path: T.Optional[str] = None,
+        ttl_seconds: float = PLACES_CACHE_TTL_SECONDS,
+        memory_max_entries: int = PLACES_CACHE_MEMORY_MAX_ENTRIES,
+        disk_max_entries: int = PLACES_CACHE_DISK_MAX_ENTRIES,
+    ) -> None:
+        memory = LruCache(max_entries=memory_max_entries, ttl_seconds=ttl_seconds)
+        disk = (
+            SqliteCache(path, table="places", max_entries=disk_max_entries, ttl_seconds=ttl_seconds)
+            if path
+            else None
+        )
+        super().__init__(memory, disk)
+
+    def to_memory(self, value: T.Any) -> T.Any:
+        if "places" not in value and "id" in value:
+            return Place.from_json(value)
+        return PlacesResponse.from_json(value)
+
+    def from_memory(self, value: T.Any) -> T.Any:
+        return value.to_json()
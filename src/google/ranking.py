@@ -0,0 +1,315 @@
+"""
+Batch filtering and ranking of nearby place candidates
+
+Candidates for any number of itinerary entries are flattened into NumPy
+arrays once, then the acceptance rules of `SearchPlaces.is_acceptable_location`
+and the ranking are applied to the whole batch in a few vectorized passes.
+Candidates are scored on distance to the original place, rating, rating
+count and type match, and only the top k of each group are fully sorted.
+"""
+
+import typing as T
+
+import numpy as np
+
+from constants import (
+    MIN_RATING,
+    MIN_RATING_COUNT,
+    NEARBY_RANKING_DISTANCE_SCALE_METERS,
+    NEARBY_RANKING_RATING_COUNT_SCALE,
+    NEARBY_RANKING_WEIGHTS,
+)
+
+PlaceType = T.Dict[str, T.Any]
+# (original place, its nearby candidates)
+CandidateGroup = T.Tuple[PlaceType, T.Sequence[PlaceType]]
+
+OPERATIONAL = "OPERATIONAL"
+# Padding for the original types matrix, never equal to a real type id
+PADDING_ID = -1
+EARTH_RADIUS_METERS = 6371008.8
+MAX_RATING = 5.0
+
+
+class RankingWeights(T.NamedTuple):
+    """Weight of each score term, every term is roughly in [0, 1] at its scale"""
+
+    type_match: float = NEARBY_RANKING_WEIGHTS["type_match"]
+    distance: float = NEARBY_RANKING_WEIGHTS["distance"]
+    rating: float = NEARBY_RANKING_WEIGHTS["rating"]
+    rating_count: float = NEARBY_RANKING_WEIGHTS["rating_count"]
+
+
+def _coordinates(places: T.Sequence[PlaceType], key: str) -> np.ndarray:
+    return np.array(
+        [place.get("location", {}).get(key, np.nan) for place in places], dtype=np.float64
+    )
+
+
+class NearbyCandidates(T.NamedTuple):
+    """Column arrays with one row per candidate, grouped by the original place they belong to"""
+
+    # Index of the group (original place) and of the candidate within that group
+    group: np.ndarray
+    position: np.ndarray
+    rating: np.ndarray
+    rating_count: np.ndarray
+    operational: np.ndarray
+    place_id: np.ndarray
+    primary_type: np.ndarray
+    # NaN when the place has no location
+    latitude: np.ndarray
+    longitude: np.ndarray
+    # Per group: id, primary type and location of the original place, and its types padded
+    # with PADDING_ID
+    original_id: np.ndarray
+    original_primary_type: np.ndarray
+    original_types: np.ndarray
+    original_latitude: np.ndarray
+    original_longitude: np.ndarray
+
+    @classmethod
+    def from_groups(cls, groups: T.Sequence[CandidateGroup]) -> "NearbyCandidates":
+        """
+        Flatten the candidates of every group. Types are mapped to integer ids
+        shared by the whole batch and place ids are compared as objects; a
+        missing value compares like `None` does in `is_acceptable_location`.
+        """
+        sizes = np.array([len(nearby) for _, nearby in groups], dtype=np.int64)
+        group = np.repeat(np.arange(len(groups), dtype=np.int64), sizes)
+        starts = np.cumsum(sizes) - sizes
+        position = np.arange(len(group), dtype=np.int64) - np.repeat(starts, sizes)
+
+        candidates = [candidate for _, nearby in groups for candidate in nearby]
+        originals = [original for original, _ in groups]
+
+        primary_types = [c.get("primaryType") for c in candidates]
+        original_primary_types = [o.get("primaryType") for o in originals]
+        original_type_lists = [o.get("types", []) for o in originals]
+
+        vocabulary = set(primary_types).union(original_primary_types, *original_type_lists)
+        type_ids = {value: index for index, value in enumerate(vocabulary)}
+
+        max_types = max(map(len, original_type_lists), default=0)
+        original_types = np.full((len(groups), max(1, max_types)), PADDING_ID, dtype=np.int64)
+        for index, values in enumerate(original_type_lists):
+            original_types[index, : len(values)] = [type_ids[value] for value in values]
+
+        return cls(
+            group=group,
+            position=position,
+            rating=np.array([c.get("rating", 0.0) for c in candidates], dtype=np.float64),
+            rating_count=np.array(
+                [c.get("userRatingCount", 0) for c in candidates], dtype=np.int64
+            ),
+            operational=np.array(
+                [c.get("businessStatus") == OPERATIONAL for c in candidates], dtype=np.bool_
+            ),
+            place_id=np.array([c.get("id") for c in candidates], dtype=object),
+            primary_type=np.array([type_ids[value] for value in primary_types], dtype=np.int64),
+            original_id=np.array([o.get("id") for o in originals], dtype=object),
+            original_primary_type=np.array(
+                [type_ids[value] for value in original_primary_types], dtype=np.int64
+            ),
+            original_types=original_types,
+            latitude=_coordinates(candidates, "latitude"),
+            longitude=_coordinates(candidates, "longitude"),
+            original_latitude=_coordinates(originals, "latitude"),
+            original_longitude=_coordinates(originals, "longitude"),
+        )
+
+    def __len__(self) -> int:
+        return len(self.group)
+
+
+def acceptable_mask(
+    candidates: NearbyCandidates,
+    compare_types: bool = False,
+    min_rating: float = MIN_RATING,
+    min_rating_count: int = MIN_RATING_COUNT,
+) -> np.ndarray:
+    """Vectorized `SearchPlaces.is_acceptable_location` over every candidate"""
+    mask = candidates.rating >= min_rating
+    mask &= candidates.rating_count >= min_rating_count
+    mask &= candidates.operational
+
+    mask &= candidates.place_id != candidates.original_id[candidates.group]
+
+    if compare_types:
+        mask &= (
+            candidates.original_types[candidates.group] == candidates.primary_type[:, None]
+        ).any(axis=1)
+
+    return mask
+
+
+def rank(candidates: NearbyCandidates, mask: np.ndarray) -> np.ndarray:
+    """
+    Indices of the accepted candidates ordered by group, then with the ones
+    sharing the original place's primary type first, then in response order
+    """
+    accepted = np.flatnonzero(mask)
+    type_mismatch = (
+        candidates.primary_type[accepted]
+        != candidates.original_primary_type[candidates.group[accepted]]
+    )
+    order = np.lexsort((candidates.position[accepted], type_mismatch, candidates.group[accepted]))
+    ranked: np.ndarray = accepted[order]
+    return ranked
+
+
+def haversine_meters(
+    latitude: np.ndarray,
+    longitude: np.ndarray,
+    other_latitude: np.ndarray,
+    other_longitude: np.ndarray,
+) -> np.ndarray:
+    """Element-wise great circle distance between two arrays of coordinates in degrees"""
+    latitude, longitude, other_latitude, other_longitude = (
+        np.radians(values) for values in (latitude, longitude, other_latitude, other_longitude)
+    )
+    half_chord = (
+        np.sin((other_latitude - latitude) / 2.0) ** 2
+        + np.cos(latitude)
+        * np.cos(other_latitude)
+        * np.sin((other_longitude - longitude) / 2.0) ** 2
+    )
+    distance: np.ndarray = (
+        2.0 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(half_chord, 0.0, 1.0)))
+    )
+    return distance
+
+
+def distance_meters(
+    latitude: float, longitude: float, other_latitude: float, other_longitude: float
+) -> float:
+    """Scalar version of `haversine_meters`"""
+    return float(
+        haversine_meters(
+            np.array([latitude]),
+            np.array([longitude]),
+            np.array([other_latitude]),
+            np.array([other_longitude]),
+        )[0]
+    )
+
+
+def distances(candidates: NearbyCandidates) -> np.ndarray:
+    """Meters from each candidate to its original place, NaN if either has no location"""
+    return haversine_meters(
+        candidates.original_latitude[candidates.group],
+        candidates.original_longitude[candidates.group],
+        candidates.latitude,
+        candidates.longitude,
+    )
+
+
+def score(
+    candidates: NearbyCandidates,
+    weights: T.Optional[RankingWeights] = None,
+    distance_scale_meters: float = NEARBY_RANKING_DISTANCE_SCALE_METERS,
+    rating_count_scale: float = NEARBY_RANKING_RATING_COUNT_SCALE,
+) -> np.ndarray:
+    """
+    Higher is better. Distance counts against a candidate in units of
+    `distance_scale_meters`, a candidate without a location is treated as
+    one unit away. Rating counts are log scaled. `weights` defaults to
+    `RankingWeights()`.
+    """
+    weights = RankingWeights() if weights is None else weights
+    type_match = candidates.primary_type == candidates.original_primary_type[candidates.group]
+    distance = np.nan_to_num(distances(candidates) / distance_scale_meters, nan=1.0)
+    rating = candidates.rating / MAX_RATING
+    rating_count = np.log1p(np.maximum(candidates.rating_count, 0)) / np.log1p(rating_count_scale)
+
+    scores: np.ndarray = (
+        weights.type_match * type_match
+        - weights.distance * distance
+        + weights.rating * rating
+        + weights.rating_count * rating_count
+    )
+    return scores
+
+
+def top_k(
+    candidates: NearbyCandidates,
+    scores: np.ndarray,
+    mask: np.ndarray,
+    groups: int,
+    k: T.Optional[int] = None,
+) -> T.List[T.List[int]]:
+    """
+    Positions of the `k` best scoring accepted candidates of each group, best
+    first, ties in response order. Scores are scattered into a
+    (groups, largest group) matrix so one argpartition selects the top k of
+    every group and only those k are sorted.
+    """
+    accepted = np.flatnonzero(mask)
+    group = candidates.group[accepted]
+    counts = np.bincount(group, minlength=groups)
+    width = int(counts.max()) if groups else 0
+    if width == 0:
+        return [[] for _ in range(groups)]
+
+    # Accepted indices are sorted, so they are grouped and in response order within a group
+    column = np.arange(len(accepted)) - np.repeat(np.cumsum(counts) - counts, counts)
+    matrix = np.full((groups, width), -np.inf)
+    matrix[group, column] = scores[accepted]
+    positions = np.full((groups, width), -1, dtype=np.int64)
+    positions[group, column] = candidates.position[accepted]
+
+    k = width if k is None else min(k, width)
+    if k < width:
+        selected = np.argpartition(-matrix, k - 1, axis=1)[:, :k]
+    else:
+        selected = np.broadcast_to(np.arange(width), (groups, width))
+
+    selected_scores = np.take_along_axis(matrix, selected, axis=1)
+    order = np.lexsort((selected, -selected_scores), axis=1)
+    selected = np.take_along_axis(selected, order, axis=1)
+    selected_positions = np.take_along_axis(positions, selected, axis=1).tolist()
+
+    return [row[: min(k, count)] for row, count in zip(selected_positions, counts.tolist())]
+
+
+def split_by_group(
+    candidates: NearbyCandidates, indices: np.ndarray, groups: int
+) -> T.List[T.List[int]]:
+    """Positions within their group of `indices` (sorted by group), as one list per group"""
+    boundaries = [0] + np.searchsorted(candidates.group[indices], np.arange(1, groups)).tolist()
+    boundaries.append(len(indices))
+    positions = candidates.position[indices].tolist()
+    return [positions[start:end] for start, end in zip(boundaries, boundaries[1:])]
+
+
+def filter_and_rank(
+    groups: T.Sequence[CandidateGroup],
+    compare_types: bool = False,
+    weights: T.Optional[RankingWeights] = None,
+    k: T.Optional[int] = None,
+) -> T.Tuple[T.List[T.List[PlaceType]], T.List[T.List[PlaceType]]]:
+    """
+    Filter and rank the candidates of every group in one pass.
+    Returns (up to `k` accepted candidates in rank order, rejected candidates)
+    per group. By default (`weights` None) candidates keep the baseline
+    order, only moved forward by primary type match, see `rank`; with
+    `weights` they are ordered by `score`.
+    """
+    candidates = NearbyCandidates.from_groups(groups)
+    mask = acceptable_mask(candidates, compare_types=compare_types)
+    if weights is None:
+        ranked = split_by_group(candidates, rank(candidates, mask), len(groups))
+        ranked = [positions[:k] for positions in ranked]
+    else:
+        ranked = top_k(candidates, score(candidates, weights), mask, len(groups), k)
+    rejected = split_by_group(candidates, np.flatnonzero(~mask), len(groups))
+
+    accepted_places = [
+        [nearby[position] for position in positions]
+        for (_, nearby), positions in zip(groups, ranked)
+    ]
+    rejected_places = [
+        [nearby[position] for position in positions]
+        for (_, nearby), positions in zip(groups, rejected)
+    ]
+    return accepted_places, rejected_places
@@ -1,38 +1,131 @@
 import concurrent.futures
+import functools
+import itertools
+import logging
+import queue
 import threading
 import typing as T
-from threading import Lock
 
 import googlemaps
 
-from constants import DEFAULT_FIELDS, MIN_RATING, MIN_RATING_COUNT
-from google.places_api import GooglePlacesAPI
-from google.utils import (
-    DEFAULT_TYPE,
-    TABLE_A_TYPES,
-    TYPES,
-    Coordinates,
-    get_city_center_coordinates,
+import log
+import metrics
+from constants import (
+    DEFAULT_FIELDS,
+    GOOGLE_PLACES_API_BASE_URL,
+    MIN_RATING,
+    MIN_RATING_COUNT,
+    NEARBY_FILTER_FIELDS,
+    SEARCH_RETRY_BUDGET,
 )
+from google import nearby_planner, place_types, ranking
+from google.geocode import get_city_center_coordinates
+from google.hedging import HedgedTextSearch
+from google.places_api import GooglePlacesAPI
+from google.places_cache import PlacesCache
+from google.spatial_index import SpatialIndex
+from google.transport import HttpTransport, get_default_transport
+from google.utils import Coordinates
 from llm.defs import ACTIVITY_TYPE_COLUMN, DESCRIPTION_COLUMN, LOCATION_COLUMN
+from rate_limit import RetryBudget
 
 ItineraryPlaceDetailsType = T.List[T.Tuple[str, T.Dict[str, T.List[T.Any]]]]
 NearbyPlaceDetailsType = T.Dict[str, T.List[T.Dict[str, T.Any]]]
+# (city, itinerary) as passed to `SearchPlaces.search`
+SearchJob = T.Tuple[str, T.Dict[str, T.List[str]]]
+
+logger = log.get_logger(__name__)
+
+
+class PlaceDetails(T.NamedTuple):
+    location_name: str
+    place: T.Optional[T.Dict[str, T.Any]]
+    nearby_places: T.Optional[T.List[T.Dict[str, T.Any]]]
+    call_counts: T.Dict[str, int]
+
+
+class SearchResult(T.NamedTuple):
+    itinerary_place_details: ItineraryPlaceDetailsType
+    nearby_place_details: NearbyPlaceDetailsType
+    city_coordinates: T.Optional[Coordinates]
+    total_api_calls: int
 
 
 class SearchPlaces:
 
-    def __init__(self, api_key: str, verbose: bool = False):
+    def __init__(
+        self,
+        api_key: str,
+        verbose: bool = False,
+        transport: T.Optional[HttpTransport] = None,
+        cache: T.Optional[PlacesCache] = None,
+        spatial_index: T.Optional[SpatialIndex] = None,
+        ranking_weights: T.Optional[ranking.RankingWeights] = None,
+        max_nearby_places: T.Optional[int] = None,
+        text_search_hedge: T.Optional[HedgedTextSearch] = None,
+        base_url: str = GOOGLE_PLACES_API_BASE_URL,
+    ):
         self.api_key = api_key
+        self.base_url = base_url
         self.verbose = verbose
+        self.transport = transport or get_default_transport()
+        self.cache = cache
+        self.spatial_index = spatial_index
+        # None keeps the baseline order of nearby places, see filter_nearby_places
+        self.ranking_weights = ranking_weights
+        # When set, nearby searches only request NEARBY_FILTER_FIELDS and the kept places are
+        # hydrated with their details afterwards
+        self.max_nearby_places = max_nearby_places
+        self.check_spatial_index(spatial_index, self.nearby_fields)
+        # None tries the text search queries one after the other
+        self.text_search_hedge = text_search_hedge
         self.itinerary_place_details: ItineraryPlaceDetailsType = []
         self.nearby_place_details: NearbyPlaceDetailsType = {}
         self.total_api_calls = {
             "places": 0,
             "maps": 0,
         }
+        self.cache_stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "coalesced_calls": 0,
+            "index_hits": 0,
+            "index_partial_hits": 0,
+        }
+        self.retries = 0
+
+    @property
+    def nearby_fields(self) -> T.List[str]:
+        return self.nearby_fields_for(self.max_nearby_places)
 
-        self.lock = Lock()
+    @staticmethod
+    def nearby_fields_for(max_nearby_places: T.Optional[int]) -> T.List[str]:
+        return DEFAULT_FIELDS if max_nearby_places is None else NEARBY_FILTER_FIELDS
+
+    @staticmethod
+    def check_spatial_index(
+        spatial_index: T.Optional[SpatialIndex], nearby_fields: T.Sequence[str]
+    ) -> None:
+        """An index that cannot record the nearby responses would never answer one"""
+        if spatial_index is None:
+            return
+        missing = spatial_index.missing_fields(nearby_fields)
+        if missing:
+            raise ValueError(
+                f"Nearby searches request {nearby_fields}, "
+                f"the spatial index also needs {sorted(missing)}"
+            )
+
+    def _places_api(self, retry_budget: T.Optional[RetryBudget] = None) -> GooglePlacesAPI:
+        return GooglePlacesAPI(
+            self.api_key,
+            verbose=False,
+            transport=self.transport,
+            cache=self.cache,
+            retry_budget=retry_budget,
+            spatial_index=self.spatial_index,
+            base_url=self.base_url,
+        )
 
     @staticmethod
     def is_acceptable_location(
@@ -44,31 +137,34 @@ class SearchPlaces:
         rating = proposed.get("rating", 0.0)
         if float(rating) < MIN_RATING:
             if verbose:
-                print(f"Rating is too low: {rating}")
+                logger.debug("Rating is too low: {}", rating)
             return False
 
         rating_count = proposed.get("userRatingCount", 0)
         if int(rating_count) < MIN_RATING_COUNT:
             if verbose:
-                print(f"Rating count is too low: {rating_count}")
+                logger.debug("Rating count is too low: {}", rating_count)
             return False
 
         if proposed.get("businessStatus") != "OPERATIONAL":
             if verbose:
-                print(f"Business status is not operational: {proposed.get('businessStatus')}")
+                logger.debug(
+                    "Business status is not operational: {}", proposed.get("businessStatus")
+                )
             return False
 
         if compare_types and proposed.get("primaryType") not in original.get("types", []):
             if verbose:
-                print(
-                    f"Primary type {proposed.get('primaryType')} "
-                    f"is not in original types {original.get('types', [])}"
+                logger.debug(
+                    "Primary type {} is not in original types {}",
+                    proposed.get("primaryType"),
+                    original.get("types", []),
                 )
             return False
 
         if proposed.get("id") == original.get("id"):
             if verbose:
-                print(f"ID is the same: {proposed.get('id')}")
+                logger.debug("ID is the same: {}", proposed.get("id"))
             return False
 
         return True
@@ -76,44 +172,256 @@ class SearchPlaces:
     @staticmethod
     def call_api(gmap_func: T.Callable, *args: T.Any, **kwargs: T.Any) -> T.Any:
         try:
-            print(f"Calling Google Maps API {gmap_func} with {args} and {kwargs}")
+            logger.debug("Calling Google Maps API {}", getattr(gmap_func, "__name__", gmap_func))
             result = gmap_func(*args, **kwargs)
         except Exception as exc:  # pylint: disable=broad-except
-            print(f"Error calling Google Maps API: {exc}")
+            logger.warning("Error calling Google Maps API: {}", exc)
             return None
 
         if not result or result.get("status") != "OK" or not result.get("results"):
-            if not result:
-                print(f"Unable to {gmap_func} to get api info")
-            else:
-                print(f"Unable to {gmap_func} to get api info status: {result.get('status')}")
+            logger.warning(
+                "Unable to {} to get api info status: {}",
+                getattr(gmap_func, "__name__", gmap_func),
+                result.get("status") if result else None,
+            )
             return None
 
         return result
 
     @staticmethod
-    def _get_place_details(
-        api_key: str,
-        itinerary_info: T.Tuple[str, str, str],
-        city_name: str,
-        radius_meters: int,
-        itinerary_place_details: ItineraryPlaceDetailsType,
-        nearby_place_details: NearbyPlaceDetailsType,
-        lock: threading.Lock,
+    def text_search_queries(itinerary_info: T.Tuple[str, str, str], city_name: str) -> T.List[str]:
+        """Queries to try, in order, to find the place for an itinerary entry"""
+        location_name, description, activity_type = itinerary_info
+        return [
+            f"{location_name} in {city_name}",
+            f"{activity_type} at {description} in {city_name}",
+        ]
+
+    @staticmethod
+    def nearby_search_data(
+        place_result: T.Dict[str, T.Any], activity_type: T.Optional[str] = None
+    ) -> T.Dict[str, T.Any]:
+        """
+        The place's own Table A types, or the ones mapped from the itinerary
+        `activity_type` if it has none
+        """
+        store_types = place_types.table_a_types(
+            place_result.get("types", [place_types.DEFAULT_TYPE])
+        )
+        if not store_types and activity_type:
+            store_types = list(place_types.activity_included_types(activity_type))
+
+        data: T.Dict[str, T.Any] = {
+            "minRating": MIN_RATING,
+        }
+
+        if store_types:
+            data["includedTypes"] = store_types
+
+        return data
+
+    @staticmethod
+    def filter_nearby_places(
+        place_result: T.Dict[str, T.Any],
+        nearby_places: T.List[T.Dict[str, T.Any]],
         verbose: bool = False,
-    ) -> T.Dict[str, int]:
-        total_api_calls = {
+        weights: T.Optional[ranking.RankingWeights] = None,
+        max_places: T.Optional[int] = None,
+    ) -> T.List[T.Dict[str, T.Any]]:
+        """
+        Drop unacceptable nearby places and keep the first `max_places` of the
+        rest. By default (`weights` None) they keep the baseline order, with
+        the ones sharing the original place's primary type moved to the front.
+        With `weights` they are ranked by `ranking.score` (distance, rating,
+        rating count and type match) instead.
+        """
+        return SearchPlaces.filter_nearby_groups(
+            [(place_result, nearby_places)], verbose, weights, max_places
+        )[0]
+
+    @staticmethod
+    @metrics.METRICS.timed("search.filter")
+    def filter_nearby_groups(
+        groups: T.Sequence[ranking.CandidateGroup],
+        verbose: bool = False,
+        weights: T.Optional[ranking.RankingWeights] = None,
+        max_places: T.Optional[int] = None,
+    ) -> T.List[T.List[T.Dict[str, T.Any]]]:
+        """`filter_nearby_places` for many (place, nearby places) groups in one vectorized pass"""
+        accepted, rejected = ranking.filter_and_rank(groups, weights=weights, k=max_places)
+
+        if not logger.isEnabledFor(logging.DEBUG):
+            return accepted
+
+        for (place_result, _), rejected_places in zip(groups, rejected):
+            for nearby_result in rejected_places:
+                if verbose:
+                    # Only used to log why the place was rejected
+                    SearchPlaces.is_acceptable_location(place_result, nearby_result, verbose=True)
+                name = nearby_result.get("displayName", {}).get("text", nearby_result.get("id"))
+                logger.debug("Skipping {} as it is not acceptable", name)
+
+        return accepted
+
+    @staticmethod
+    def filter_place_details(
+        place_details: T.Sequence[PlaceDetails],
+        verbose: bool = False,
+        weights: T.Optional[ranking.RankingWeights] = None,
+        max_places: T.Optional[int] = None,
+    ) -> T.List[PlaceDetails]:
+        """Filter the unfiltered nearby places of a batch of `PlaceDetails` in one pass"""
+        with_nearby = [
+            index for index, details in enumerate(place_details) if details.nearby_places
+        ]
+        filtered = SearchPlaces.filter_nearby_groups(
+            [
+                (place_details[index].place or {}, place_details[index].nearby_places or [])
+                for index in with_nearby
+            ],
+            verbose,
+            weights,
+            max_places,
+        )
+
+        results = list(place_details)
+        for index, nearby_list in zip(with_nearby, filtered):
+            logger.debug(
+                "Found {} nearby places for {}", len(nearby_list), results[index].location_name
+            )
+            results[index] = results[index]._replace(nearby_places=nearby_list)
+        return results
+
+    @staticmethod
+    def hydrate_place_details(
+        place_details: T.Sequence[PlaceDetails],
+        make_places_api: T.Callable[[], GooglePlacesAPI],
+        map_func: T.Callable[..., T.Iterable[T.Any]] = map,
+    ) -> T.List[PlaceDetails]:
+        """
+        Fetch the Place Details of nearby places that were searched with
+        NEARBY_FILTER_FIELDS and merge them in. Each place id is fetched once
+        per batch (and is cached like any other Places response); its call is
+        added to the `call_counts` of the first entry that keeps it. A place
+        whose details cannot be fetched is kept as it is.
+
+        This trades one extra Place Details call per kept place, at most
+        `max_nearby_places` per entry, for nearby searches without the display
+        and Atmosphere fields on every result. PLACE_DETAILS_FIELDS only asks
+        for the displayed fields, so the extra calls stay off the Atmosphere
+        SKU. Callers only hydrate when `max_nearby_places` is set; without a
+        cap the nearby searches request DEFAULT_FIELDS and no call is added.
+        """
+        owners: T.Dict[str, int] = {}
+        for index, details in enumerate(place_details):
+            for place in details.nearby_places or []:
+                if "displayName" not in place and "id" in place:
+                    owners.setdefault(place["id"], index)
+        if not owners:
+            return list(place_details)
+
+        places_apis = {index: make_places_api() for index in set(owners.values())}
+
+        def fetch(place_id: str) -> T.Dict[T.Any, T.Any]:
+            return places_apis[owners[place_id]].place_details(place_id)
+
+        hydrated = {
+            place_id: response
+            for place_id, response in zip(owners, map_func(fetch, owners))
+            if response and "error" not in response
+        }
+
+        results = []
+        for index, details in enumerate(place_details):
+            call_counts = details.call_counts
+            if index in places_apis:
+                added = SearchPlaces._call_counts(places_apis[index])
+                call_counts = {
+                    key: call_counts.get(key, 0) + added.get(key, 0)
+                    for key in {**call_counts, **added}
+                }
+            nearby_places = details.nearby_places
+            if nearby_places is not None:
+                nearby_places = [
+                    {**place, **hydrated[place["id"]]} if place.get("id") in hydrated else place
+                    for place in nearby_places
+                ]
+            results.append(details._replace(nearby_places=nearby_places, call_counts=call_counts))
+        return results
+
+    @staticmethod
+    def _call_counts(gplaces: GooglePlacesAPI) -> T.Dict[str, int]:
+        return {
+            "places": gplaces.stats["api_calls"],
+            "maps": 0,
+            "cache_hits": gplaces.stats["cache_hits"],
+            "cache_misses": gplaces.stats["cache_misses"],
+            "coalesced_calls": gplaces.stats["coalesced_calls"],
+            "index_hits": gplaces.stats["index_hits"],
+            "index_partial_hits": gplaces.stats["index_partial_hits"],
+        }
+
+    def _reset_counters(self) -> None:
+        self.total_api_calls = {
             "places": 0,
             "maps": 0,
         }
+        self.cache_stats = {
+            "cache_hits": 0,
+            "cache_misses": 0,
+            "coalesced_calls": 0,
+            "index_hits": 0,
+            "index_partial_hits": 0,
+        }
+        self.retries = 0
 
-        location_name, description, activity_type = itinerary_info
+    def _add_call_counts(self, call_counts: T.Dict[str, int]) -> None:
+        for key, value in call_counts.items():
+            if key in self.total_api_calls:
+                self.total_api_calls[key] += value
+            else:
+                self.cache_stats[key] += value
 
-        for query in [
-            f"{location_name} in {city_name}",
-            f"{activity_type} at {description} in {city_name}",
-        ]:
-            gplaces = GooglePlacesAPI(api_key, verbose=False)
+    @staticmethod
+    def itinerary_entries(itinerary: T.Dict[str, T.List[str]]) -> T.List[T.Tuple[str, str, str]]:
+        """(location, description, activity type) for each itinerary entry"""
+        return list(
+            zip(
+                itinerary[LOCATION_COLUMN],
+                itinerary[DESCRIPTION_COLUMN],
+                itinerary[ACTIVITY_TYPE_COLUMN],
+            )
+        )
+
+    @staticmethod
+    def collect_place_details(
+        place_details: T.Iterable[PlaceDetails],
+    ) -> T.Tuple[ItineraryPlaceDetailsType, NearbyPlaceDetailsType]:
+        itinerary_place_details: ItineraryPlaceDetailsType = []
+        nearby_place_details: NearbyPlaceDetailsType = {}
+
+        for details in place_details:
+            if details.place is None:
+                continue
+            itinerary_place_details.append((details.location_name, details.place))
+            if details.nearby_places is not None:
+                nearby_place_details[details.location_name] = details.nearby_places
+
+        return itinerary_place_details, nearby_place_details
+
+    @staticmethod
+    def _find_place(
+        gplaces: GooglePlacesAPI,
+        itinerary_info: T.Tuple[str, str, str],
+        city_name: str,
+        text_search_hedge: T.Optional[HedgedTextSearch] = None,
+    ) -> T.Optional[T.Dict[str, T.Any]]:
+        """
+        The first place found by the text search queries of an itinerary entry,
+        tried in order or hedged by `text_search_hedge`
+        """
+
+        def search(query: str) -> T.Optional[T.Dict[str, T.Any]]:
             result = gplaces.text_search(
                 query=query,
                 fields=DEFAULT_FIELDS,
@@ -122,76 +430,242 @@ class SearchPlaces:
                 },
             )
 
-            total_api_calls["places"] += 1
-
             if result and len(result.get("places", [])) > 0:
-                break
-
-        if not result or len(result.get("places", [])) == 0:
-            print(f"No places found for {location_name}")
+                return T.cast(T.Dict[str, T.Any], result["places"][0])
+            return None
 
-        place_result = result["places"][0]
+        queries = SearchPlaces.text_search_queries(itinerary_info, city_name)
+        if text_search_hedge is not None:
+            place = text_search_hedge.find(search, queries)
+        else:
+            place = None
+            for query in queries:
+                place = search(query)
+                if place is not None:
+                    break
 
-        with lock:
-            itinerary_place_details.append((location_name, place_result))
+        if place is None:
+            logger.info("No places found for {}", itinerary_info[0])
+        return place
 
-        store_types = [t for t in place_result.get("types", [DEFAULT_TYPE]) if t in TABLE_A_TYPES]
+    @staticmethod
+    def _get_place_details(  # pylint: disable=too-many-arguments
+        api_key: str,
+        itinerary_info: T.Tuple[str, str, str],
+        city_name: str,
+        radius_meters: int,
+        verbose: bool = False,
+        transport: T.Optional[HttpTransport] = None,
+        cache: T.Optional[PlacesCache] = None,
+        retry_budget: T.Optional[RetryBudget] = None,
+        filter_nearby: bool = True,
+        spatial_index: T.Optional[SpatialIndex] = None,
+        text_search_hedge: T.Optional[HedgedTextSearch] = None,
+        nearby_fields: T.Optional[T.List[str]] = None,
+        base_url: str = GOOGLE_PLACES_API_BASE_URL,
+    ) -> PlaceDetails:
+        """
+        With `filter_nearby` False the nearby places are returned as received,
+        for callers that filter a whole batch with `filter_place_details`
+        """
+        location_name = itinerary_info[0]
+
+        gplaces = GooglePlacesAPI(
+            api_key,
+            verbose=False,
+            transport=transport,
+            cache=cache,
+            retry_budget=retry_budget,
+            spatial_index=spatial_index,
+            base_url=base_url,
+        )
 
-        print(
-            f"Getting nearby places for {location_name} at "
-            f"{place_result['location']} with types {store_types}"
+        place_result = SearchPlaces._find_place(
+            gplaces, itinerary_info, city_name, text_search_hedge
         )
+        if place_result is None:
+            return PlaceDetails(location_name, None, None, SearchPlaces._call_counts(gplaces))
 
-        data = {
-            "minRating": MIN_RATING,
-        }
+        data = SearchPlaces.nearby_search_data(place_result, itinerary_info[2])
 
-        if store_types:
-            data["includedTypes"] = store_types
+        logger.debug(
+            "Getting nearby places for {} at {} with types {}",
+            location_name,
+            place_result["location"],
+            data.get("includedTypes", []),
+        )
 
         nearby_places = gplaces.nearby_places(
             latitude=place_result["location"]["latitude"],
             longitude=place_result["location"]["longitude"],
             radius_meters=radius_meters,
-            fields=DEFAULT_FIELDS,
+            fields=nearby_fields or DEFAULT_FIELDS,
             data=data,
         )
-        total_api_calls["places"] += 1
 
         if not nearby_places or len(nearby_places.get("places", [])) == 0:
-            print(f"Unable to get nearby places for {location_name}")
-            return total_api_calls
-
-        nearby_place_details[location_name] = []
-        for nearby_result in nearby_places["places"]:
-            if not SearchPlaces.is_acceptable_location(
-                place_result, nearby_result, verbose=verbose
-            ):
-                print(f"Skipping {nearby_result['displayName']['text']} as it is not acceptable")
-                continue
+            logger.info("Unable to get nearby places for {}", location_name)
+            return PlaceDetails(
+                location_name, place_result, None, SearchPlaces._call_counts(gplaces)
+            )
 
-            with lock:
-                nearby_place_details[location_name].append(nearby_result)
+        if not filter_nearby:
+            return PlaceDetails(
+                location_name,
+                place_result,
+                nearby_places["places"],
+                SearchPlaces._call_counts(gplaces),
+            )
 
-        nearby_list = nearby_place_details[location_name]
+        sorted_nearby_list = SearchPlaces.filter_nearby_places(
+            place_result, nearby_places["places"], verbose=verbose
+        )
 
-        primary_type = place_result.get("primaryType")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Found {} nearby places for {}: {}",
+                len(sorted_nearby_list),
+                location_name,
+                [
+                    (place.get("displayName", {}).get("text"), place.get("primaryType"))
+                    for place in sorted_nearby_list
+                ],
+            )
 
-        sorted_nearby_list = [
-            item for item in nearby_list if item.get("primaryType") == primary_type
-        ] + [item for item in nearby_list if item.get("primaryType") != primary_type]
+        return PlaceDetails(
+            location_name, place_result, sorted_nearby_list, SearchPlaces._call_counts(gplaces)
+        )
 
-        nearby_place_details[location_name] = sorted_nearby_list
+    @staticmethod
+    def _plan_place_details(
+        gplaces: GooglePlacesAPI,
+        entries: T.Sequence[T.Tuple[str, str, str]],
+        city_name: str,
+        radius_meters: int,
+        map_func: T.Callable[..., T.Iterable[T.Any]],
+        text_search_hedge: T.Optional[HedgedTextSearch] = None,
+        nearby_fields: T.Optional[T.List[str]] = None,
+    ) -> T.List[PlaceDetails]:
+        """
+        Look up every entry's place first, then merge the overlapping nearby
+        searches of entries with the same includedTypes where the densities of
+        earlier responses say the merged search stays under the result cap
+        (see `nearby_planner`), and split the results back. Entries of a merged
+        search that came back truncated are searched on their own. `map_func`
+        runs the calls, e.g. `executor.map`. Nearby places are returned
+        unfiltered.
+        """
+        places = list(
+            map_func(
+                functools.partial(
+                    SearchPlaces._find_place,
+                    gplaces,
+                    city_name=city_name,
+                    text_search_hedge=text_search_hedge,
+                ),
+                entries,
+            )
+        )
+        return SearchPlaces._plan_nearby_places(
+            gplaces, entries, places, radius_meters, map_func, nearby_fields
+        )
 
-        print(
-            (i["description"]["text"], i["primaryType"])
-            for i in nearby_place_details[location_name]
+    @staticmethod
+    def _plan_nearby_places(  # pylint: disable=too-many-arguments
+        gplaces: GooglePlacesAPI,
+        entries: T.Sequence[T.Tuple[str, str, str]],
+        places: T.Sequence[T.Optional[T.Dict[str, T.Any]]],
+        radius_meters: int,
+        map_func: T.Callable[..., T.Iterable[T.Any]],
+        nearby_fields: T.Optional[T.List[str]] = None,
+    ) -> T.List[PlaceDetails]:
+        """The planned nearby searches of `_plan_place_details` for already found places"""
+        found, requests = SearchPlaces.nearby_requests(entries, places, radius_meters)
+        queries = nearby_planner.plan_nearby_queries(requests, density=nearby_planner.AREA_DENSITY)
+        logger.debug(
+            "Planned {} nearby searches for {} itinerary entries", len(queries), len(requests)
         )
 
-        print(f"Found {len(nearby_place_details[location_name])} nearby places for {location_name}")
+        def nearby_search(
+            request: T.Union[nearby_planner.NearbyRequest, nearby_planner.NearbyQuery]
+        ) -> T.List[T.Dict[str, T.Any]]:
+            response = gplaces.nearby_places(
+                latitude=request.latitude,
+                longitude=request.longitude,
+                radius_meters=request.radius_meters,
+                fields=nearby_fields or DEFAULT_FIELDS,
+                data=SearchPlaces.planned_search_data(request),
+            )
+            return T.cast(T.List[T.Dict[str, T.Any]], (response or {}).get("places", []))
+
+        nearby, fallback = nearby_planner.assign_results(
+            queries,
+            list(map_func(nearby_search, queries)),
+            requests,
+            nearby_planner.AREA_DENSITY,
+        )
+        for member, member_places in zip(
+            fallback, map_func(nearby_search, [requests[member] for member in fallback])
+        ):
+            nearby_planner.AREA_DENSITY.record(requests[member], len(member_places))
+            nearby[member] = member_places
 
-        return total_api_calls
+        return SearchPlaces.planned_place_details(entries, places, found, nearby)
 
+    @staticmethod
+    def nearby_requests(
+        entries: T.Sequence[T.Tuple[str, str, str]],
+        places: T.Sequence[T.Optional[T.Dict[str, T.Any]]],
+        radius_meters: int,
+    ) -> T.Tuple[T.List[int], T.List[nearby_planner.NearbyRequest]]:
+        """(indices of the entries whose place was found, their nearby requests)"""
+        found = [index for index, place in enumerate(places) if place is not None]
+        requests = []
+        for index in found:
+            place_result = T.cast(T.Dict[str, T.Any], places[index])
+            requests.append(
+                nearby_planner.NearbyRequest(
+                    place_result["location"]["latitude"],
+                    place_result["location"]["longitude"],
+                    radius_meters,
+                    tuple(
+                        sorted(
+                            SearchPlaces.nearby_search_data(place_result, entries[index][2]).get(
+                                "includedTypes", []
+                            )
+                        )
+                    ),
+                )
+            )
+        return found, requests
+
+    @staticmethod
+    def planned_search_data(
+        request: T.Union[nearby_planner.NearbyRequest, nearby_planner.NearbyQuery]
+    ) -> T.Dict[str, T.Any]:
+        data: T.Dict[str, T.Any] = {"minRating": MIN_RATING}
+        if request.included_types:
+            data["includedTypes"] = list(request.included_types)
+        return data
+
+    @staticmethod
+    def planned_place_details(
+        entries: T.Sequence[T.Tuple[str, str, str]],
+        places: T.Sequence[T.Optional[T.Dict[str, T.Any]]],
+        found: T.Sequence[int],
+        nearby: T.Dict[int, T.List[T.Dict[str, T.Any]]],
+    ) -> T.List[PlaceDetails]:
+        place_details = [PlaceDetails(entry[0], None, None, {}) for entry in entries]
+        for member, index in enumerate(found):
+            location_name = entries[index][0]
+            if not nearby.get(member):
+                logger.info("Unable to get nearby places for {}", location_name)
+            place_details[index] = PlaceDetails(
+                location_name, places[index], nearby.get(member) or None, {}
+            )
+        return place_details
+
+    @metrics.METRICS.timed("search.search")
     def search(
         self,
         city: str,
@@ -209,56 +683,47 @@ class SearchPlaces:
         if not city_coordinates:
             raise ValueError(f"Unable to get coordinates for city: {city}")
 
-        print(f"{city} coordinates: {city_coordinates}")
+        logger.debug("{} coordinates: {}", city, city_coordinates)
 
-        self.total_api_calls = {
-            "places": 0,
-            "maps": 0,
-        }
+        self._reset_counters()
+        retry_budget = RetryBudget(SEARCH_RETRY_BUDGET)
+        gplaces = self._places_api(retry_budget)
+
+        entries = self.itinerary_entries(itinerary)
+
+        def resolve(map_func: T.Callable[..., T.Iterable[T.Any]]) -> T.List[PlaceDetails]:
+            place_details = self._plan_place_details(
+                gplaces,
+                entries,
+                city,
+                radius_meters,
+                map_func,
+                self.text_search_hedge,
+                self.nearby_fields,
+            )
+            place_details = self.filter_place_details(
+                place_details, self.verbose, self.ranking_weights, self.max_nearby_places
+            )
+            if self.max_nearby_places is None:
+                return place_details
+            return self.hydrate_place_details(
+                place_details, functools.partial(self._places_api, retry_budget), map_func
+            )
 
         if single_thread:
-            for index in range(len(itinerary[LOCATION_COLUMN])):
-                itinerary_info = (
-                    itinerary[LOCATION_COLUMN][index],
-                    itinerary[DESCRIPTION_COLUMN][index],
-                    itinerary[ACTIVITY_TYPE_COLUMN][index],
-                )
-                api_calls = self._get_place_details(
-                    self.api_key,
-                    itinerary_info,
-                    city,
-                    radius_meters,
-                    self.itinerary_place_details,
-                    self.nearby_place_details,
-                    self.lock,
-                    verbose=self.verbose,
-                )
-                for key, value in api_calls.items():
-                    self.total_api_calls[key] += value
+            place_details = resolve(map)
         else:
             with concurrent.futures.ThreadPoolExecutor() as executor:
-                futures = [
-                    executor.submit(
-                        self._get_place_details,
-                        self.api_key,
-                        (
-                            itinerary[LOCATION_COLUMN][index],
-                            itinerary[DESCRIPTION_COLUMN][index],
-                            itinerary[ACTIVITY_TYPE_COLUMN][index],
-                        ),
-                        city,
-                        radius_meters,
-                        self.itinerary_place_details,
-                        self.nearby_place_details,
-                        self.lock,
-                    )
-                    for index in range(len(itinerary[LOCATION_COLUMN]))
-                ]
-                concurrent.futures.wait(futures)
+                place_details = resolve(executor.map)
+
+        self._add_call_counts(self._call_counts(gplaces))
+        for details in place_details:
+            self._add_call_counts(details.call_counts)
 
-                for future in futures:
-                    for key, value in future.result().items():
-                        self.total_api_calls[key] += value
+        self.itinerary_place_details, self.nearby_place_details = self.collect_place_details(
+            place_details
+        )
+        self.retries = retry_budget.spent
 
         return (
             self.itinerary_place_details,
@@ -266,3 +731,240 @@ class SearchPlaces:
             city_coordinates,
             sum(self.total_api_calls.values()),
         )
+
+    def iter_search(
+        self,
+        city: str,
+        itinerary: T.Dict[str, T.List[str]],
+        radius_meters: int = 1500,
+        max_workers: T.Optional[int] = None,
+    ) -> T.Iterator[T.Tuple[int, PlaceDetails]]:
+        """
+        Yield (index of the itinerary entry, PlaceDetails) as soon as each entry's
+        place and nearby lookups finish, in completion order, so callers can show
+        the first entries while the slow ones are still resolving.
+
+        Entries whose place cannot be found are yielded with `place` set to None.
+        The call counters on the instance are updated as entries complete.
+        Closing the generator early cancels lookups that have not started.
+        """
+        yield from self.iter_search_entries(
+            city, enumerate(self.itinerary_entries(itinerary)), radius_meters, max_workers
+        )
+
+    def _plan_group(  # pylint: disable=too-many-arguments
+        self,
+        gplaces: GooglePlacesAPI,
+        group: T.Sequence[T.Tuple[int, T.Tuple[str, str, str], concurrent.futures.Future]],
+        radius_meters: int,
+        retry_budget: RetryBudget,
+        executor: concurrent.futures.Executor,
+    ) -> T.List[T.Tuple[int, PlaceDetails]]:
+        """Nearby searches, filtering and hydration of (index, entry, found place) of a group"""
+        place_details = self._plan_nearby_places(
+            gplaces,
+            [itinerary_info for _, itinerary_info, _ in group],
+            [future.result() for _, _, future in group],
+            radius_meters,
+            executor.map,
+            self.nearby_fields,
+        )
+        place_details = self.filter_place_details(
+            place_details, self.verbose, self.ranking_weights, self.max_nearby_places
+        )
+        if self.max_nearby_places is not None:
+            place_details = self.hydrate_place_details(
+                place_details, functools.partial(self._places_api, retry_budget), executor.map
+            )
+        return [(index, details) for (index, _, _), details in zip(group, place_details)]
+
+    def iter_search_entries(
+        self,
+        city: str,
+        entries: T.Iterable[T.Tuple[T.Hashable, T.Tuple[str, str, str]]],
+        radius_meters: int = 1500,
+        max_workers: T.Optional[int] = None,
+    ) -> T.Iterator[T.Tuple[int, PlaceDetails]]:
+        """
+        Same as `iter_search` for (group, (location, description, activity type))
+        pairs. Consecutive entries of a group, e.g. an itinerary day, have their
+        nearby searches planned together like in `search` and are yielded
+        together once done.
+
+        `entries` may be a lazy iterator, e.g. one fed by a streaming LLM response.
+        It is consumed on a background thread and each entry's place is looked up
+        as soon as it arrives; a group's nearby searches start once the next group
+        begins (or `entries` ends), so the lookups overlap with producing the
+        remaining entries. An exception raised by `entries` is re-raised here.
+        """
+        city_coordinates = get_city_center_coordinates(city)
+
+        if not city_coordinates:
+            raise ValueError(f"Unable to get coordinates for city: {city}")
+
+        logger.debug("{} coordinates: {}", city, city_coordinates)
+
+        self._reset_counters()
+        retry_budget = RetryBudget(SEARCH_RETRY_BUDGET)
+        gplaces = self._places_api(retry_budget)
+        find_place = functools.partial(
+            self._find_place, gplaces, city_name=city, text_search_hedge=self.text_search_hedge
+        )
+
+        # Items are a group's future of [(index, PlaceDetails)] and
+        # (None, number of groups, exception or None) once `entries` is exhausted
+        finished: queue.Queue[T.Any] = queue.Queue()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers)
+        # Groups wait on their calls in `executor`, so they get threads of their own
+        group_executor = concurrent.futures.ThreadPoolExecutor()
+
+        def submit_entries() -> None:
+            groups = 0
+            try:
+                for _, items in itertools.groupby(enumerate(entries), key=lambda item: item[1][0]):
+                    # Each place lookup starts as its entry arrives
+                    group = [
+                        (index, itinerary_info, executor.submit(find_place, itinerary_info))
+                        for index, (_, itinerary_info) in items
+                    ]
+                    group_executor.submit(
+                        self._plan_group, gplaces, group, radius_meters, retry_budget, executor
+                    ).add_done_callback(finished.put)
+                    groups += 1
+            except Exception as exception:  # pylint: disable=broad-except
+                finished.put((None, groups, exception))
+            else:
+                finished.put((None, groups, None))
+
+        producer = threading.Thread(target=submit_entries, daemon=True)
+        producer.start()
+
+        counted: T.Dict[str, int] = {}
+        try:
+            expected: T.Optional[int] = None
+            received = 0
+            while expected is None or received < expected:
+                item = finished.get()
+                if isinstance(item, tuple):
+                    _, expected, exception = item
+                    if exception is not None:
+                        raise exception
+                    continue
+
+                group_details = item.result()
+                # The shared client's calls since the last group, then the group's hydration
+                call_counts = self._call_counts(gplaces)
+                self._add_call_counts(
+                    {key: value - counted.get(key, 0) for key, value in call_counts.items()}
+                )
+                counted = call_counts
+                for _, details in group_details:
+                    self._add_call_counts(details.call_counts)
+                self.retries = retry_budget.spent
+                received += 1
+                yield from group_details
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            group_executor.shutdown(wait=False, cancel_futures=True)
+
+    @metrics.METRICS.timed("search.search_many")
+    def search_many(
+        self,
+        jobs: T.Sequence[SearchJob],
+        radius_meters: int = 1500,
+        max_workers: T.Optional[int] = None,
+    ) -> T.List[SearchResult]:
+        """
+        Search a batch of (city, itinerary) jobs on one shared worker pool.
+
+        Each unique city is geocoded once and each unique (city, itinerary entry)
+        is looked up once for the whole batch, so jobs can share place dicts and
+        they should be treated as read-only. The API calls of a shared lookup are
+        counted against the first job that needed it. Jobs whose city cannot be
+        geocoded come back empty with `city_coordinates` set to None. Nothing is
+        stored on the instance, so it can serve several batches concurrently.
+        """
+        retry_budget = RetryBudget(SEARCH_RETRY_BUDGET * max(1, len(jobs)))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            cities = {city for city, _ in jobs}
+            city_futures = {
+                city: executor.submit(get_city_center_coordinates, city) for city in cities
+            }
+            city_coordinates = {city: future.result() for city, future in city_futures.items()}
+
+            detail_futures: T.Dict[
+                T.Tuple[str, T.Tuple[str, str, str]], concurrent.futures.Future[PlaceDetails]
+            ] = {}
+            for city, itinerary in jobs:
+                if not city_coordinates[city]:
+                    continue
+                for itinerary_info in self.itinerary_entries(itinerary):
+                    key = (city, itinerary_info)
+                    if key in detail_futures:
+                        continue
+                    detail_futures[key] = executor.submit(
+                        self._get_place_details,
+                        self.api_key,
+                        itinerary_info,
+                        city,
+                        radius_meters,
+                        verbose=self.verbose,
+                        transport=self.transport,
+                        cache=self.cache,
+                        spatial_index=self.spatial_index,
+                        retry_budget=retry_budget,
+                        filter_nearby=False,
+                        text_search_hedge=self.text_search_hedge,
+                        nearby_fields=self.nearby_fields,
+                        base_url=self.base_url,
+                    )
+
+            keys = list(detail_futures)
+            filtered_details = self.filter_place_details(
+                [detail_futures[key].result() for key in keys],
+                self.verbose,
+                self.ranking_weights,
+                self.max_nearby_places,
+            )
+            if self.max_nearby_places is not None:
+                filtered_details = self.hydrate_place_details(
+                    filtered_details,
+                    functools.partial(self._places_api, retry_budget),
+                    executor.map,
+                )
+            unique_details = dict(zip(keys, filtered_details))
+
+            counted: T.Set[T.Tuple[str, T.Tuple[str, str, str]]] = set()
+            results = []
+            for city, itinerary in jobs:
+                coordinates = city_coordinates[city]
+                if not coordinates:
+                    logger.warning("Unable to get coordinates for city: {}", city)
+                    results.append(SearchResult([], {}, None, 0))
+                    continue
+
+                place_details = []
+                total_api_calls = 0
+                for itinerary_info in self.itinerary_entries(itinerary):
+                    key = (city, itinerary_info)
+                    details = unique_details[key]
+                    place_details.append(details)
+                    if key not in counted:
+                        counted.add(key)
+                        total_api_calls += details.call_counts["places"]
+                        total_api_calls += details.call_counts["maps"]
+
+                itinerary_place_details, nearby_place_details = self.collect_place_details(
+                    place_details
+                )
+                results.append(
+                    SearchResult(
+                        itinerary_place_details,
+                        nearby_place_details,
+                        coordinates,
+                        total_api_calls,
+                    )
+                )
+
+        return results
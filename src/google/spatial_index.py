@@ -0,0 +1,380 @@
+"""
+Local spatial index of received places
+
+Places are bucketed into geohash-aligned grid cells. Each searchNearby
+response that was not truncated by the result cap proves that every place of
+the requested types inside its circle is known, so the cells fully inside
+the circle are marked as covered for those types (with the fetch time and
+minRating used). A later nearby query whose cells are all covered by fresh
+fetches is answered from the index, and a partly covered one only needs the
+missing `includedTypes` from Google.
+
+Places and coverage remember the field mask they were fetched with, and a
+query is only answered from fetches that requested at least its fields.
+"""
+
+import collections
+import math
+import threading
+import time
+import typing as T
+
+import numpy as np
+
+import log
+from constants import (
+    NEARBY_FILTER_FIELDS,
+    NEARBY_MAX_RESULTS,
+    SPATIAL_INDEX_GEOHASH_PRECISION,
+    SPATIAL_INDEX_TTL_SECONDS,
+)
+from google import place_types
+from google.place import Place
+from google.ranking import distance_meters, haversine_meters
+
+logger = log.get_logger(__name__)
+
+CellType = T.Tuple[int, int]
+FieldsType = T.FrozenSet[str]
+
+# Coverage key of a query without includedTypes, i.e. of every type
+ALL_TYPES = "*"
+METERS_PER_DEGREE_LATITUDE = 111320.0
+# Fetches between two passes dropping stale places and coverage
+PRUNE_INTERVAL = 256
+
+
+class CoverageCircle(T.NamedTuple):
+    latitude: float
+    longitude: float
+    radius_meters: float
+    types: T.FrozenSet[str]
+    min_rating: float
+    fetched_at: float
+    fields: FieldsType
+
+
+class IndexedPlace(T.NamedTuple):
+    place: Place
+    fetched_at: float
+    cell: CellType
+    # `place_types` mask of the place's types
+    types_mask: int
+    # Fields of the field mask(s) the place was fetched with
+    fields: FieldsType
+
+
+class SpatialIndex:
+    """
+    Thread-safe in-memory index of places keyed by grid cell.
+
+    Only responses requested with at least `fields` (what filtering needs)
+    are indexed. A query is answered from the fetches whose field mask
+    contains the query's, so a cached answer always carries the fields the
+    caller asked for.
+    """
+
+    def __init__(
+        self,
+        precision: int = SPATIAL_INDEX_GEOHASH_PRECISION,
+        ttl_seconds: float = SPATIAL_INDEX_TTL_SECONDS,
+        max_results: int = NEARBY_MAX_RESULTS,
+        fields: T.Sequence[str] = tuple(NEARBY_FILTER_FIELDS),
+    ) -> None:
+        # A geohash of `precision` characters interleaves 5 * precision bits, longitude first
+        latitude_bits = 5 * precision // 2
+        longitude_bits = 5 * precision - latitude_bits
+        self.cell_latitude_degrees = 180.0 / 2**latitude_bits
+        self.cell_longitude_degrees = 360.0 / 2**longitude_bits
+        self.ttl_seconds = ttl_seconds
+        self.max_results = max_results
+        self.fields = frozenset(fields)
+
+        self._places: T.Dict[str, IndexedPlace] = {}
+        self._cell_places: T.DefaultDict[CellType, T.Set[str]] = collections.defaultdict(set)
+        # cell -> type -> (fetched at, minRating and fields of the fetch)
+        self._coverage: T.DefaultDict[CellType, T.Dict[str, T.Tuple[float, float, FieldsType]]] = (
+            collections.defaultdict(dict)
+        )
+        # Complete fetches by the cells their circle touches
+        self._circles: T.DefaultDict[CellType, T.List[CoverageCircle]] = collections.defaultdict(
+            list
+        )
+        self._fetches = 0
+        self._unrecordable_masks: T.Set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def mask_fields(field_mask: str) -> FieldsType:
+        return frozenset(field.strip() for field in field_mask.split(",") if field.strip())
+
+    def missing_fields(self, fields: T.Iterable[str]) -> FieldsType:
+        """Fields responses need on top of `fields` to be indexed"""
+        return self.fields.difference(fields)
+
+    def can_record(self, field_mask: str) -> bool:
+        """Warns the first time a mask misses fields, as its responses are never indexed"""
+        missing = self.missing_fields(self.mask_fields(field_mask))
+        if not missing:
+            return True
+        if field_mask not in self._unrecordable_masks:
+            self._unrecordable_masks.add(field_mask)
+            logger.warning(
+                "Nearby searches with field mask {} bypass the spatial index, it needs {}",
+                field_mask,
+                ",".join(sorted(missing)),
+            )
+        return False
+
+    def cell(self, latitude: float, longitude: float) -> CellType:
+        return (
+            math.floor((latitude + 90.0) / self.cell_latitude_degrees),
+            math.floor((longitude + 180.0) / self.cell_longitude_degrees),
+        )
+
+    def _cells(
+        self, latitude: float, longitude: float, radius_meters: float
+    ) -> T.Tuple[T.List[CellType], T.List[CellType]]:
+        """(cells intersecting the circle, cells fully inside it)"""
+        latitude_delta = radius_meters / METERS_PER_DEGREE_LATITUDE
+        longitude_delta = radius_meters / (
+            METERS_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 1e-6)
+        )
+        first_row, first_column = self.cell(latitude - latitude_delta, longitude - longitude_delta)
+        last_row, last_column = self.cell(latitude + latitude_delta, longitude + longitude_delta)
+
+        rows, columns = np.meshgrid(
+            np.arange(first_row, last_row + 1), np.arange(first_column, last_column + 1)
+        )
+        rows, columns = rows.ravel(), columns.ravel()
+        south = rows * self.cell_latitude_degrees - 90.0
+        north = south + self.cell_latitude_degrees
+        west = columns * self.cell_longitude_degrees - 180.0
+        east = west + self.cell_longitude_degrees
+
+        center_latitude = np.full(len(rows), latitude)
+        center_longitude = np.full(len(rows), longitude)
+
+        nearest = haversine_meters(
+            center_latitude,
+            center_longitude,
+            np.clip(latitude, south, north),
+            np.clip(longitude, west, east),
+        )
+        farthest = np.maximum.reduce(
+            [
+                haversine_meters(
+                    center_latitude, center_longitude, corner_latitude, corner_longitude
+                )
+                for corner_latitude in (south, north)
+                for corner_longitude in (west, east)
+            ]
+        )
+
+        cells = list(zip(rows.tolist(), columns.tolist()))
+        intersecting = [cell for cell, hit in zip(cells, nearest <= radius_meters) if hit]
+        inside = [cell for cell, hit in zip(cells, farthest <= radius_meters) if hit]
+        return intersecting, inside
+
+    def _is_fresh(self, fetched_at: float, now: float) -> bool:
+        return now - fetched_at <= self.ttl_seconds
+
+    def add_places(
+        self, places: T.Iterable[T.Dict[str, T.Any]], fetched_at: float, fields: FieldsType
+    ) -> None:
+        """
+        Index places that have an id and a location, fetched with `fields`. A
+        place still fresh from a fetch with other fields keeps those too.
+        """
+        records = [Place.from_json(place) for place in places]
+        with self._lock:
+            for record in records:
+                if record.id is None or record.latitude is None or record.longitude is None:
+                    continue
+                place_id = record.id
+                cell = self.cell(record.latitude, record.longitude)
+                record_fields = fields
+                previous = self._places.get(place_id)
+                if previous is not None:
+                    self._cell_places[previous.cell].discard(place_id)
+                    if self._is_fresh(previous.fetched_at, fetched_at) and not (
+                        previous.fields <= fields
+                    ):
+                        record = Place.from_json({**previous.place.to_json(), **record.to_json()})
+                        record_fields = previous.fields | fields
+                self._places[place_id] = IndexedPlace(
+                    record,
+                    fetched_at,
+                    cell,
+                    place_types.type_mask(record.types or ()),
+                    record_fields,
+                )
+                self._cell_places[cell].add(place_id)
+
+    def missing_types(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        included_types: T.Sequence[str],
+        min_rating: float,
+        field_mask: str,
+    ) -> T.List[str]:
+        """
+        The requested types (or [ALL_TYPES]) that fresh complete fetches with
+        at least the fields of `field_mask` do not cover, either with a single
+        circle containing the query or cell by cell
+        """
+        requested = list(included_types) or [ALL_TYPES]
+        fields = self.mask_fields(field_mask)
+        intersecting, _ = self._cells(latitude, longitude, radius_meters)
+        now = time.time()
+
+        def cell_covers(cell: CellType, place_type: str) -> bool:
+            coverage = self._coverage.get(cell, {})
+            for key in (place_type, ALL_TYPES):
+                if key in coverage:
+                    fetched_at, fetched_min_rating, fetched_fields = coverage[key]
+                    if (
+                        self._is_fresh(fetched_at, now)
+                        and fetched_min_rating <= min_rating
+                        and fields <= fetched_fields
+                    ):
+                        return True
+            return False
+
+        with self._lock:
+            circle_types: T.Set[str] = set()
+            for circle in self._circles.get(self.cell(latitude, longitude), []):
+                distance = distance_meters(circle.latitude, circle.longitude, latitude, longitude)
+                if (
+                    self._is_fresh(circle.fetched_at, now)
+                    and circle.min_rating <= min_rating
+                    and fields <= circle.fields
+                    and distance + radius_meters <= circle.radius_meters
+                ):
+                    circle_types.update(circle.types)
+
+            return [
+                place_type
+                for place_type in requested
+                if ALL_TYPES not in circle_types
+                and place_type not in circle_types
+                and not all(cell_covers(cell, place_type) for cell in intersecting)
+            ]
+
+    def record_fetch(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        types: T.Sequence[str],
+        min_rating: float,
+        places: T.Sequence[T.Dict[str, T.Any]],
+        complete: bool,
+        field_mask: str,
+    ) -> None:
+        """
+        Index the places of a searchNearby response for `types` (or [ALL_TYPES])
+        requested with `field_mask`. Coverage is only recorded for `complete`
+        responses, i.e. ones that were not cut off by the result cap.
+        """
+        fetched_at = time.time()
+        fields = self.mask_fields(field_mask)
+        self.add_places(places, fetched_at, fields)
+
+        if not complete:
+            return
+
+        intersecting, inside = self._cells(latitude, longitude, radius_meters)
+        circle = CoverageCircle(
+            latitude, longitude, radius_meters, frozenset(types), min_rating, fetched_at, fields
+        )
+        with self._lock:
+            for cell in inside:
+                coverage = self._coverage[cell]
+                for place_type in types:
+                    # Keep a fresh coverage that answers queries this one cannot
+                    previous = coverage.get(place_type)
+                    if (
+                        previous is None
+                        or not self._is_fresh(previous[0], fetched_at)
+                        or (min_rating <= previous[1] and previous[2] <= fields)
+                    ):
+                        coverage[place_type] = (fetched_at, min_rating, fields)
+            for cell in intersecting:
+                self._circles[cell].append(circle)
+
+            self._fetches += 1
+            if self._fetches % PRUNE_INTERVAL == 0:
+                self._prune(fetched_at)
+
+    def query(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_meters: float,
+        included_types: T.Sequence[str],
+        min_rating: float,
+        field_mask: str,
+        max_results: T.Optional[int] = None,
+    ) -> T.List[T.Dict[str, T.Any]]:
+        """
+        Fresh indexed places inside the circle with one of `included_types`
+        and the fields of `field_mask`, most rated first as a stand-in for
+        Google's popularity ranking
+        """
+        intersecting, _ = self._cells(latitude, longitude, radius_meters)
+        wanted = place_types.type_mask(included_types)
+        fields = self.mask_fields(field_mask)
+        now = time.time()
+
+        with self._lock:
+            entries = [
+                self._places[place_id]
+                for cell in intersecting
+                for place_id in self._cell_places.get(cell, ())
+            ]
+
+        records = [
+            entry.place
+            for entry in entries
+            if self._is_fresh(entry.fetched_at, now)
+            and (entry.place.rating or 0.0) >= min_rating
+            and place_types.is_compatible(entry.types_mask, wanted)
+            and fields <= entry.fields
+        ]
+        if not records:
+            return []
+
+        distances = haversine_meters(
+            np.full(len(records), latitude),
+            np.full(len(records), longitude),
+            np.array([record.latitude for record in records], dtype=np.float64),
+            np.array([record.longitude for record in records], dtype=np.float64),
+        )
+        records = [
+            record for record, distance in zip(records, distances) if distance <= radius_meters
+        ]
+        records.sort(key=lambda record: record.user_rating_count or 0, reverse=True)
+
+        return [record.to_json() for record in records[: max_results or self.max_results]]
+
+    def _prune(self, now: float) -> None:
+        for place_id, entry in list(self._places.items()):
+            if not self._is_fresh(entry.fetched_at, now):
+                del self._places[place_id]
+                self._cell_places[entry.cell].discard(place_id)
+        for cell, coverage in list(self._coverage.items()):
+            for place_type, (fetched_at, _, _) in list(coverage.items()):
+                if not self._is_fresh(fetched_at, now):
+                    del coverage[place_type]
+            if not coverage:
+                del self._coverage[cell]
+        for cell, circles in list(self._circles.items()):
+            circles[:] = [circle for circle in circles if self._is_fresh(circle.fetched_at, now)]
+            if not circles:
+                del self._circles[cell]
+
+    def __len__(self) -> int:
+        return len(self._places)
@@ -0,0 +1,201 @@
+"""
+Shared, pooled HTTP transport for the Google APIs
+
+A single `requests.Session` is reused for every call so that connections to
+places.googleapis.com and maps.googleapis.com are kept alive between requests
+instead of paying a new TCP/TLS handshake each time.
+"""
+
+import threading
+import typing as T
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+import serialization
+
+DEFAULT_POOL_CONNECTIONS = 4
+DEFAULT_POOL_MAXSIZE = 32
+DEFAULT_ASYNC_POOL_LIMIT = 256
+DEFAULT_KEEP_ALIVE_TIMEOUT_SECONDS = 30.0
+JSON_CONTENT_TYPE = {"Content-Type": "application/json"}
+
+
+def _json_body(
+    headers: T.Optional[T.Dict[str, T.Any]], json_data: T.Optional[T.Dict[str, T.Any]]
+) -> T.Tuple[T.Optional[T.Dict[str, T.Any]], T.Optional[bytes]]:
+    """Headers and body for a JSON request, encoded with orjson instead of the client's encoder"""
+    if json_data is None:
+        return headers, None
+    return {**(headers or {}), **JSON_CONTENT_TYPE}, serialization.dumps(json_data)
+
+
+class HttpTransport:
+    """
+    Thin wrapper around a pooled `requests.Session`.
+
+    `pool_connections` is the number of distinct hosts kept in the pool and
+    `pool_maxsize` the number of connections kept alive per host. The session
+    is safe to share across `ThreadPoolExecutor` workers: urllib3 hands each
+    thread its own connection from the pool, and `pool_block` makes workers
+    wait for a free connection instead of opening throwaway ones. Setting
+    `keep_alive` to False sends `Connection: close` (useful for debugging).
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        pool_block: bool = True,
+        keep_alive: bool = True,
+    ) -> None:
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["Connection"] = "keep-alive" if keep_alive else "close"
+
+    def post(
+        self,
+        url: str,
+        headers: T.Optional[T.Dict[str, T.Any]] = None,
+        params: T.Optional[T.Dict[str, T.Any]] = None,
+        json_data: T.Optional[T.Dict[str, T.Any]] = None,
+        timeout: float = 10.0,
+    ) -> requests.Response:
+        headers, body = _json_body(headers, json_data)
+        return self.session.post(url, headers=headers, params=params, data=body, timeout=timeout)
+
+    def get(
+        self,
+        url: str,
+        headers: T.Optional[T.Dict[str, T.Any]] = None,
+        params: T.Optional[T.Dict[str, T.Any]] = None,
+        timeout: float = 10.0,
+    ) -> requests.Response:
+        return self.session.get(url, headers=headers, params=params, timeout=timeout)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncResponse(T.NamedTuple):
+    """The parts of an `aiohttp` response callers need, read before the connection is released"""
+
+    status_code: int
+    headers: T.Mapping[str, str]
+    content: bytes
+
+    def json(self) -> T.Any:
+        return serialization.loads(self.content)
+
+
+class AsyncHttpTransport:
+    """
+    Pooled `aiohttp` client for use from a single event loop.
+
+    `limit` caps the total number of open connections and `limit_per_host`
+    the connections per host. Idle connections are kept alive for
+    `keep_alive_timeout` seconds. The session is created lazily on first use
+    so the transport can be constructed outside of a running loop.
+    """
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_ASYNC_POOL_LIMIT,
+        limit_per_host: int = DEFAULT_POOL_MAXSIZE,
+        keep_alive_timeout: float = DEFAULT_KEEP_ALIVE_TIMEOUT_SECONDS,
+    ) -> None:
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keep_alive_timeout = keep_alive_timeout
+        self._session: T.Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keep_alive_timeout,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def post(
+        self,
+        url: str,
+        headers: T.Optional[T.Dict[str, T.Any]] = None,
+        params: T.Optional[T.Dict[str, T.Any]] = None,
+        json_data: T.Optional[T.Dict[str, T.Any]] = None,
+        timeout: float = 10.0,
+    ) -> AsyncResponse:
+        session = self._get_session()
+        headers, body = _json_body(headers, json_data)
+        async with session.post(
+            url,
+            headers=headers,
+            params=params,
+            data=body,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            return AsyncResponse(response.status, response.headers, await response.read())
+
+    async def get(
+        self,
+        url: str,
+        headers: T.Optional[T.Dict[str, T.Any]] = None,
+        params: T.Optional[T.Dict[str, T.Any]] = None,
+        timeout: float = 10.0,
+    ) -> AsyncResponse:
+        session = self._get_session()
+        async with session.get(
+            url,
+            headers=headers,
+            params=params,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            return AsyncResponse(response.status, response.headers, await response.read())
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncHttpTransport":
+        return self
+
+    async def __aexit__(self, *args: T.Any) -> None:
+        await self.close()
+
+
+_DEFAULT_TRANSPORT: T.Optional[HttpTransport] = None
+_DEFAULT_TRANSPORT_LOCK = threading.Lock()
+
+
+def get_default_transport() -> HttpTransport:
+    global _DEFAULT_TRANSPORT  # pylint: disable=global-statement
+
+    with _DEFAULT_TRANSPORT_LOCK:
+        if _DEFAULT_TRANSPORT is None:
+            _DEFAULT_TRANSPORT = HttpTransport()
+        return _DEFAULT_TRANSPORT
+
+
+def set_default_transport(transport: HttpTransport) -> None:
+    """Replace the process-wide transport, e.g. to change the pool size at startup"""
+    global _DEFAULT_TRANSPORT  # pylint: disable=global-statement
+
+    with _DEFAULT_TRANSPORT_LOCK:
+        if _DEFAULT_TRANSPORT is not None and _DEFAULT_TRANSPORT is not transport:
+            _DEFAULT_TRANSPORT.close()
+        _DEFAULT_TRANSPORT = transport
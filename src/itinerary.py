@@ -1,8 +1,11 @@
 import re
 import typing as T
 
+import log
 from llm.defs import ACTIVITY_TYPE_COLUMN, DAY_COLUMN, LOCATION_COLUMN
 
+logger = log.get_logger(__name__)
+
 
 class Itinerary:
 
@@ -35,7 +38,7 @@ class Itinerary:
                 place = place.split("(")[0].strip()  # Removes anything within parentheses
                 day_plan.append((activity_type, place))
             else:
-                print(f"Could not parse line: {line}")
+                logger.warning("Could not parse line: {}", line)
 
         return day_plan
 
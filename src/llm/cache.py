@@ -0,0 +1,247 @@
+"""
+Response cache for itinerary generation
+
+Exact tier: responses keyed on the `clean_text` normalized inputs, prompt and
+function schema. Similarity tier (optional): a request whose non-description
+inputs match exactly and whose description is close enough, by cosine
+similarity of hashed TF-IDF vectors, to a cached one reuses that response.
+"""
+
+import collections
+import hashlib
+import json
+import threading
+import typing as T
+import zlib
+
+import numpy as np
+from langchain.prompts import PromptTemplate
+from langchain_core.pydantic_v1 import BaseModel
+
+from cache import LruCache, SqliteCache, TieredCache
+from constants import (
+    LLM_CACHE_DISK_MAX_ENTRIES,
+    LLM_CACHE_EMBEDDING_DIMENSIONS,
+    LLM_CACHE_MAX_ENTRIES_PER_BUCKET,
+    LLM_CACHE_MEMORY_MAX_ENTRIES,
+    LLM_CACHE_TTL_SECONDS,
+)
+from text import clean_text
+
+SIMILARITY_FIELD = "description"
+
+
+def normalize_inputs(inputs: T.Dict[str, T.Any]) -> T.Dict[str, str]:
+    return {key: " ".join(clean_text(str(value)).split()) for key, value in inputs.items()}
+
+
+def _digest(value: T.Any) -> str:
+    serialized = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def _terms(text: str) -> T.List[str]:
+    words = text.split()
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+class HashedTfIdfIndex:
+    """
+    Brute-force cosine similarity search over hashed term frequency vectors.
+
+    Documents are grouped into buckets and only compared within a bucket. IDF
+    weights come from document frequencies over the whole index and are
+    applied at query time, so adding documents never requires re-indexing.
+    """
+
+    def __init__(
+        self,
+        dimensions: int = LLM_CACHE_EMBEDDING_DIMENSIONS,
+        max_entries_per_bucket: int = LLM_CACHE_MAX_ENTRIES_PER_BUCKET,
+    ) -> None:
+        self.dimensions = dimensions
+        self.max_entries_per_bucket = max_entries_per_bucket
+        self._buckets: T.Dict[str, T.OrderedDict[str, np.ndarray]] = collections.defaultdict(
+            collections.OrderedDict
+        )
+        self._document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self._documents = 0
+        self._lock = threading.Lock()
+
+    def vectorize(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for term in _terms(text):
+            vector[zlib.crc32(term.encode("utf-8")) % self.dimensions] += 1.0
+        # Sublinear term frequency
+        np.log1p(vector, out=vector)
+        return vector
+
+    def _idf(self) -> np.ndarray:
+        idf: np.ndarray = np.log((1.0 + self._documents) / (1.0 + self._document_frequency)) + 1.0
+        return idf
+
+    def add(self, bucket: str, key: str, text: str) -> None:
+        vector = self.vectorize(text)
+        with self._lock:
+            documents = self._buckets[bucket]
+            if key in documents:
+                return
+            documents[key] = vector
+            self._document_frequency += vector > 0
+            self._documents += 1
+
+            if len(documents) > self.max_entries_per_bucket:
+                _, evicted = documents.popitem(last=False)
+                self._remove_frequencies(evicted)
+
+    def remove(self, bucket: str, key: str) -> None:
+        with self._lock:
+            documents = self._buckets.get(bucket)
+            vector = documents.pop(key, None) if documents is not None else None
+            if vector is not None:
+                self._remove_frequencies(vector)
+
+    def _remove_frequencies(self, vector: np.ndarray) -> None:
+        self._document_frequency -= vector > 0
+        self._documents -= 1
+
+    def most_similar(self, bucket: str, text: str) -> T.Optional[T.Tuple[str, float]]:
+        query = self.vectorize(text)
+        with self._lock:
+            documents = self._buckets.get(bucket)
+            if not documents:
+                return None
+            keys = list(documents.keys())
+            matrix = np.stack(list(documents.values()))
+            idf = self._idf()
+
+        query *= idf
+        matrix = matrix * idf
+        query_norm = np.linalg.norm(query)
+        matrix_norms = np.linalg.norm(matrix, axis=1)
+        if query_norm == 0.0:
+            return None
+
+        similarities = (matrix @ query) / np.maximum(matrix_norms * query_norm, 1e-12)
+        best = int(np.argmax(similarities))
+        return keys[best], float(similarities[best])
+
+
+class LlmResponseCache:
+    """
+    Two tier response cache for `OpenAiSearch`.
+
+    Responses live in a TTL/LRU `TieredCache` (persistent when `path` is set).
+    By default only exact matches are served. With `similarity_threshold` set
+    (e.g. LLM_CACHE_SIMILARITY_THRESHOLD), the descriptions of cached requests
+    are also indexed, and persisted next to the responses, so near-duplicate
+    requests are answered from the cache too, with an itinerary planned for a
+    slightly different description.
+    """
+
+    def __init__(
+        self,
+        path: T.Optional[str] = None,
+        ttl_seconds: float = LLM_CACHE_TTL_SECONDS,
+        memory_max_entries: int = LLM_CACHE_MEMORY_MAX_ENTRIES,
+        disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES,
+        similarity_threshold: T.Optional[float] = None,
+    ) -> None:
+        memory = LruCache(max_entries=memory_max_entries, ttl_seconds=ttl_seconds)
+        disk = (
+            SqliteCache(path, table="llm", max_entries=disk_max_entries, ttl_seconds=ttl_seconds)
+            if path
+            else None
+        )
+        self.responses = TieredCache(memory, disk)
+        self.similarity_threshold = similarity_threshold
+        self.stats = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+        }
+        self._stats_lock = threading.Lock()
+
+        self.index: T.Optional[HashedTfIdfIndex] = None
+        self._index_store: T.Optional[SqliteCache] = None
+        if similarity_threshold is not None:
+            self.index = HashedTfIdfIndex()
+            if path:
+                self._index_store = SqliteCache(
+                    path,
+                    table="llm_index",
+                    max_entries=disk_max_entries,
+                    ttl_seconds=ttl_seconds,
+                )
+                for key, entry in self._index_store.items():
+                    self.index.add(entry["bucket"], key, entry["text"])
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    @staticmethod
+    def _keys(
+        inputs: T.Dict[str, T.Any],
+        prompt: PromptTemplate,
+        model_function: type[BaseModel],
+        model: str,
+    ) -> T.Tuple[str, str, str]:
+        """Exact key, similarity bucket and normalized description of a request"""
+        normalized = normalize_inputs(inputs)
+        description = normalized.pop(SIMILARITY_FIELD, "")
+        context = [prompt.template, model_function.__name__, model]
+        bucket = _digest([context, normalized])
+        return _digest([bucket, description]), bucket, description
+
+    def get(
+        self,
+        inputs: T.Dict[str, T.Any],
+        prompt: PromptTemplate,
+        model_function: type[BaseModel],
+        model: str,
+    ) -> T.Optional[T.Any]:
+        key, bucket, description = self._keys(inputs, prompt, model_function, model)
+
+        response = self.responses.get(key)
+        if response is not None:
+            self._count("exact_hits")
+            return response
+
+        if self.index is not None and self.similarity_threshold is not None:
+            match = self.index.most_similar(bucket, description)
+            if match is not None and match[1] >= self.similarity_threshold:
+                response = self.responses.get(match[0])
+                if response is not None:
+                    self._count("similar_hits")
+                    return response
+                # The response expired or was evicted
+                self.index.remove(bucket, match[0])
+                if self._index_store is not None:
+                    self._index_store.delete(match[0])
+
+        self._count("misses")
+        return None
+
+    def put(
+        self,
+        inputs: T.Dict[str, T.Any],
+        prompt: PromptTemplate,
+        model_function: type[BaseModel],
+        model: str,
+        response: T.Any,
+    ) -> None:
+        key, bucket, description = self._keys(inputs, prompt, model_function, model)
+
+        self.responses.put(key, response)
+
+        if self.index is not None:
+            self.index.add(bucket, key, description)
+            if self._index_store is not None:
+                self._index_store.put(key, {"bucket": bucket, "text": description})
+
+    @property
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["similar_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
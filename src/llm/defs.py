@@ -8,6 +8,8 @@ DAY_COLUMN = "day"
 ACTIVITY_TYPE_COLUMN = "activity_type"
 LOCATION_COLUMN = "location"
 DESCRIPTION_COLUMN = "description"
+# Order of the values of each `StreamingItinerary` activity
+STREAMING_ACTIVITY_COLUMNS = (DAY_COLUMN, ACTIVITY_TYPE_COLUMN, LOCATION_COLUMN, DESCRIPTION_COLUMN)
 
 
 class Itinerary(BaseModel):
@@ -28,6 +30,26 @@ class Itinerary(BaseModel):
     )
 
 
+class StreamingItinerary(BaseModel):
+    """
+    Row-wise version of `Itinerary` used when streaming. Each activity is
+    generated in full before the next one starts, so it can be handed to the
+    place search while the rest of the itinerary is still being generated.
+    Activities are arrays of values in `STREAMING_ACTIVITY_COLUMNS` order
+    rather than objects, so the model does not write the field names again
+    for every activity and the function call is about as long as `Itinerary`'s.
+    """
+
+    activities: T.List[T.List[str]] = Field(
+        description=(
+            "the activities of the itinerary in order, for every itinerary day, each one a list"
+            " of exactly 4 strings: [the day of the activity, the activity type like breakfast,"
+            " dinner etc, the location that exists in google places of the activity type, a"
+            " brief description of the activity in a 2-3 word phrase]"
+        )
+    )
+
+
 ITINERARY_PROMPT_TEMPLATE = PromptTemplate(
     template="""Given the user's input below:
 Location: {location}
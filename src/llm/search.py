@@ -1,52 +1,178 @@
+import threading
 import typing as T
 
+import httpx
 from langchain.output_parsers.openai_functions import JsonOutputFunctionsParser
 from langchain.prompts import PromptTemplate
 from langchain_core.pydantic_v1 import BaseModel
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import Runnable
 from langchain_core.utils.function_calling import convert_to_openai_function
+from langchain_openai import ChatOpenAI
 from pydantic.v1.types import SecretStr
 
-from llm.utils import calculate_tokens
+import log
+import metrics
+from llm.cache import LlmResponseCache
+from llm.defs import ITINERARY_PROMPT_TEMPLATE, Itinerary, StreamingItinerary
+from llm.utils import calculate_tokens, row_to_activity
+
+logger = log.get_logger(__name__)
 
 
 class OpenAiSearch:
+    """
+    The OpenAI client (and its pooled HTTP connections) is created once per
+    instance and the compiled prompt | model | parser chain is cached per
+    (prompt, model_function), so one instance can be shared by many request
+    handlers and threads.
+
+    With a `cache`, responses are looked up before the model is called, so
+    repeated (or, with the similarity tier, near-duplicate) trips are served
+    without a round trip to OpenAI.
+    """
+
     MODEL = "gpt-3.5-turbo-0125"
+    MAX_CONNECTIONS = 64
+    MAX_KEEPALIVE_CONNECTIONS = 32
 
-    def __init__(self, api_key: SecretStr, verbose: bool = False):
+    def __init__(
+        self,
+        api_key: SecretStr,
+        verbose: bool = False,
+        http_client: T.Optional[httpx.Client] = None,
+        cache: T.Optional[LlmResponseCache] = None,
+        base_url: T.Optional[str] = None,
+    ):
         self.parser = JsonOutputFunctionsParser()
         self.api_key = api_key
         self.verbose = verbose
+        self.cache = cache
+        self.http_client = http_client or httpx.Client(
+            limits=httpx.Limits(
+                max_connections=self.MAX_CONNECTIONS,
+                max_keepalive_connections=self.MAX_KEEPALIVE_CONNECTIONS,
+            )
+        )
+        # None uses the OpenAI API (or OPENAI_BASE_URL)
+        self.model = ChatOpenAI(
+            api_key=api_key,
+            temperature=0,
+            model=self.MODEL,
+            http_client=self.http_client,
+            base_url=base_url,
+        )
+        # Keyed on id(prompt), the prompt is kept in the value so the id stays unique
+        self._chains: T.Dict[T.Tuple[int, type, bool], T.Tuple[PromptTemplate, Runnable]] = {}
+        self._chains_lock = threading.Lock()
+
+    def get_chain(
+        self,
+        prompt: PromptTemplate,
+        model_function: type[BaseModel],
+        force_function_call: bool = False,
+    ) -> Runnable:
+        key = (id(prompt), model_function, force_function_call)
+
+        with self._chains_lock:
+            if key in self._chains:
+                return self._chains[key][1]
+
+            openai_functions = [convert_to_openai_function(model_function)]
+            bind_kwargs: T.Dict[str, T.Any] = {"functions": openai_functions}
+            if force_function_call:
+                bind_kwargs["function_call"] = {"name": openai_functions[0]["name"]}
+
+            chain = prompt | self.model.bind(**bind_kwargs) | self.parser
+            self._chains[key] = (prompt, chain)
+
+            return chain
+
+    def close(self) -> None:
+        self.http_client.close()
 
+    @metrics.METRICS.timed("llm.search")
     def search(
         self,
         inputs: T.Dict[str, str],
         prompt: PromptTemplate,
         model_function: type[BaseModel],
     ) -> T.Any:
-        model = ChatOpenAI(api_key=self.api_key, temperature=0, model=self.MODEL)
+        if self.cache is not None:
+            cached = self.cache.get(inputs, prompt, model_function, self.MODEL)
+            if cached is not None:
+                metrics.set_outcome("cache_hit")
+                return cached
 
-        openai_functions = [convert_to_openai_function(model_function)]
-
-        chain = prompt | model.bind(functions=openai_functions) | self.parser
+        chain = self.get_chain(prompt, model_function)
         output = chain.invoke(inputs)
 
-        if self.verbose:
-            print(output)
+        logger.debug("Generated {}", output)
 
         if not output:
             raise ValueError("No output was generated")
 
+        if self.cache is not None:
+            self.cache.put(inputs, prompt, model_function, self.MODEL, output)
+
         return output
 
+    def stream_activities(
+        self,
+        inputs: T.Dict[str, str],
+        prompt: PromptTemplate,
+    ) -> T.Iterator[T.Dict[str, str]]:
+        """
+        Generate a `StreamingItinerary` and yield each activity as soon as it is
+        complete, i.e. once the model has started on the next one (or finished).
+        """
+        if self.cache is not None:
+            cached = self.cache.get(inputs, prompt, StreamingItinerary, self.MODEL)
+            if cached is not None:
+                yield from cached["activities"]
+                return
+
+        chain = self.get_chain(prompt, StreamingItinerary, force_function_call=True)
+
+        rows: T.List[T.List[str]] = []
+        activities: T.List[T.Dict[str, str]] = []
+        for partial_output in chain.stream(inputs):
+            if not isinstance(partial_output, dict):
+                continue
+            rows = partial_output.get("activities") or []
+            while len(activities) < len(rows) - 1:
+                activities.append(row_to_activity(rows[len(activities)]))
+                yield activities[-1]
+
+        if not rows:
+            raise ValueError("No output was generated")
+
+        for row in rows[len(activities) :]:
+            activities.append(row_to_activity(row))
+            yield activities[-1]
+
+        logger.debug("Generated {}", activities)
+
+        if self.cache is not None:
+            self.cache.put(
+                inputs, prompt, StreamingItinerary, self.MODEL, {"activities": activities}
+            )
+
     def calculate_tokens(
-        self, inputs: T.Dict[str, str], output: T.Dict[str, str]
+        self,
+        inputs: T.Dict[str, str],
+        output: T.Any,
+        prompt: PromptTemplate = ITINERARY_PROMPT_TEMPLATE,
+        model_function: type[BaseModel] = Itinerary,
     ) -> T.Tuple[int, int, int]:
-        input_tokens, output_tokens, total_tokens = calculate_tokens(inputs, output)
+        input_tokens, output_tokens, total_tokens = calculate_tokens(
+            inputs, output, prompt, model_function, self.MODEL
+        )
 
-        if self.verbose:
-            print(f"Input Tokens: {input_tokens}")
-            print(f"Output Tokens: {output_tokens}")
-            print(f"Total Tokens: {total_tokens}")
+        logger.debug(
+            "Input tokens: {}, output tokens: {}, total tokens: {}",
+            input_tokens,
+            output_tokens,
+            total_tokens,
+        )
 
         return input_tokens, output_tokens, total_tokens
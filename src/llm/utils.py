@@ -1,6 +1,30 @@
+import functools
+import json
 import typing as T
 
+import tiktoken
+from langchain.prompts import PromptTemplate
 from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.utils.function_calling import convert_to_openai_function
+
+from llm.defs import (
+    ACTIVITY_TYPE_COLUMN,
+    DAY_COLUMN,
+    DESCRIPTION_COLUMN,
+    ITINERARY_PROMPT_TEMPLATE,
+    LOCATION_COLUMN,
+    STREAMING_ACTIVITY_COLUMNS,
+    Itinerary,
+)
+
+ITINERARY_COLUMNS = [DAY_COLUMN, ACTIVITY_TYPE_COLUMN, LOCATION_COLUMN, DESCRIPTION_COLUMN]
+
+DEFAULT_TOKEN_MODEL = "gpt-3.5-turbo-0125"
+# Encoding used for models tiktoken does not know about
+FALLBACK_ENCODING = "cl100k_base"
+# Chat format overhead: tokens wrapping each message and priming the reply
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
 
 
 def get_model_fields(model: BaseModel):
@@ -13,9 +37,77 @@ def get_model_fields(model: BaseModel):
     return fields
 
 
-def calculate_tokens(data: T.Dict[str, str], output: T.Dict[str, str]) -> T.Tuple[int, int, int]:
-    input_tokens = sum(len(str(value).split()) for value in data.values())
-    output_tokens = sum(len(str(value).split()) for value in output.values())
-    total_tokens = input_tokens + output_tokens
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str = DEFAULT_TOKEN_MODEL) -> tiktoken.Encoding:
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+
+
+@functools.lru_cache(maxsize=None)
+def function_tokens(model_function: type[BaseModel], model: str = DEFAULT_TOKEN_MODEL) -> int:
+    """
+    Tokens of the serialized function definition sent with every request.
+    OpenAI does not document how functions are rendered, so this is an estimate.
+    """
+    definition = json.dumps(convert_to_openai_function(model_function), separators=(",", ":"))
+    return len(get_encoding(model).encode_ordinary(definition))
+
+
+def calculate_tokens_batch(
+    requests: T.Sequence[T.Tuple[T.Dict[str, str], T.Any]],
+    prompt: PromptTemplate = ITINERARY_PROMPT_TEMPLATE,
+    model_function: type[BaseModel] = Itinerary,
+    model: str = DEFAULT_TOKEN_MODEL,
+    num_threads: int = 8,
+) -> T.List[T.Tuple[int, int, int]]:
+    """
+    (input, output, total) tokens for each (inputs, output) pair. The input is
+    the rendered prompt plus the function definition, the output the function
+    call arguments as JSON. Use an empty output to budget a request up front.
+    """
+    encoding = get_encoding(model)
+    fixed_input_tokens = TOKENS_PER_MESSAGE + TOKENS_PER_REPLY
+    fixed_input_tokens += function_tokens(model_function, model)
+    function_name = convert_to_openai_function(model_function)["name"]
+    name_tokens = len(encoding.encode_ordinary(function_name))
+
+    prompts = [prompt.format(**inputs) for inputs, _ in requests]
+    outputs = [json.dumps(output) if output else "" for _, output in requests]
+
+    prompt_tokens = encoding.encode_ordinary_batch(prompts, num_threads=num_threads)
+    output_tokens = encoding.encode_ordinary_batch(outputs, num_threads=num_threads)
+
+    counts = []
+    for prompt_ids, output_ids in zip(prompt_tokens, output_tokens):
+        input_count = fixed_input_tokens + len(prompt_ids)
+        output_count = name_tokens + len(output_ids) if output_ids else 0
+        counts.append((input_count, output_count, input_count + output_count))
+    return counts
+
+
+def calculate_tokens(
+    data: T.Dict[str, str],
+    output: T.Any,
+    prompt: PromptTemplate = ITINERARY_PROMPT_TEMPLATE,
+    model_function: type[BaseModel] = Itinerary,
+    model: str = DEFAULT_TOKEN_MODEL,
+) -> T.Tuple[int, int, int]:
+    return calculate_tokens_batch([(data, output)], prompt, model_function, model)[0]
+
+
+def row_to_activity(row: T.Sequence[T.Any]) -> T.Dict[str, str]:
+    """A `StreamingItinerary` activity as {column: value}, missing values are empty"""
+    values = [str(value) for value in row[: len(STREAMING_ACTIVITY_COLUMNS)]]
+    values += [""] * (len(STREAMING_ACTIVITY_COLUMNS) - len(values))
+    return dict(zip(STREAMING_ACTIVITY_COLUMNS, values))
+
 
-    return input_tokens, output_tokens, total_tokens
+def activities_to_itinerary(activities: T.Iterable[T.Dict[str, str]]) -> T.Dict[str, T.List[str]]:
+    """Convert row-wise `StreamingItinerary` activities to the column-wise `Itinerary` format"""
+    itinerary: T.Dict[str, T.List[str]] = {column: [] for column in ITINERARY_COLUMNS}
+    for activity in activities:
+        for column in ITINERARY_COLUMNS:
+            itinerary[column].append(str(activity.get(column, "")))
+    return itinerary
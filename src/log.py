@@ -0,0 +1,171 @@
+"""
+Logging for the itinerary pipeline
+
+Modules log through `get_logger(__name__)`, an adapter over the standard
+`triptap.<module>` logger, with `{}` placeholders and the values as arguments
+(`logger.debug("Found {} places", count)`), so a message below its logger's
+level is dropped before anything is formatted. `configure` sets the overall and per-module
+levels and routes records through a `QueueHandler`: worker threads only put
+records on a queue and a single listener thread writes them, so threads never
+wait on stderr. With `structured=True` each record is written as one JSON
+object with the message and any `extra` fields.
+
+Until `configure` is called only warnings and errors are shown, through
+Python's last resort handler.
+"""
+
+import atexit
+import copy
+import datetime
+import logging
+import logging.handlers
+import queue
+import sys
+import typing as T
+
+import serialization
+from constants import LOG_FORMAT, LOG_LEVEL
+
+ROOT_LOGGER = "triptap"
+
+# Attributes every LogRecord has, anything else on a record came in through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message",
+    "asctime",
+}
+
+_LISTENER: T.Optional[logging.handlers.QueueListener] = None
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class BraceMessage:
+    """A `{}` style message and its arguments, formatted only when the record is written"""
+
+    __slots__ = ("fmt", "args")
+
+    def __init__(self, fmt: object, args: T.Tuple[T.Any, ...]) -> None:
+        self.fmt = fmt
+        self.args = args
+
+    def __str__(self) -> str:
+        fmt = str(self.fmt)
+        if not self.args:
+            return fmt
+        # Always positional, a dict argument is a value to show like any other
+        return fmt.format(*self.args)
+
+
+class BraceLoggerAdapter(logging.LoggerAdapter):
+    """
+    Takes `{}` placeholders and their values, like `str.format`, and hands the
+    logger a `BraceMessage` so enabled records are formatted by the handlers
+    and disabled ones never are. `extra` is passed through as given.
+    """
+
+    def __init__(self, logger: logging.Logger) -> None:
+        super().__init__(logger, {})
+
+    def log(self, level: int, msg: T.Any, *args: T.Any, **kwargs: T.Any) -> None:
+        if self.isEnabledFor(level):
+            # Report the caller of `debug`/`info`/..., not this method
+            kwargs["stacklevel"] = kwargs.get("stacklevel", 1) + 1
+            self.logger.log(level, BraceMessage(msg, args), **kwargs)
+
+
+def get_logger(name: str) -> BraceLoggerAdapter:
+    """The `triptap.<name>` logger, configurable like any other through `logging`"""
+    return BraceLoggerAdapter(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and the `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: T.Dict[str, T.Any] = {
+            "time": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc)
+            .isoformat(timespec="milliseconds")
+            .replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return serialization.dumps_str(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Merges the arguments into the message on the logging thread but keeps the traceback apart"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACK_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec: str) -> T.Dict[str, str]:
+    """`google.places_api=DEBUG,llm=WARNING` to {module: level}"""
+    levels = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        module, _, level = item.partition("=")
+        if not level:
+            raise ValueError(f"Expected module=LEVEL, got {item!r}")
+        levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def configure(
+    level: T.Union[int, str] = LOG_LEVEL,
+    levels: T.Optional[T.Dict[str, T.Union[int, str]]] = None,
+    structured: bool = False,
+    stream: T.Optional[T.TextIO] = None,
+) -> logging.handlers.QueueListener:
+    """
+    Send the pipeline's logs to `stream` (stderr by default) from a background
+    thread. `levels` overrides `level` per module, e.g. {"google.places_api": "DEBUG"}.
+    Calling it again replaces the previous configuration.
+    """
+    shutdown()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+
+    for module, module_level in (levels or {}).items():
+        get_logger(module).setLevel(module_level)
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if structured else logging.Formatter(LOG_FORMAT))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root.addHandler(_QueueHandler(records))
+
+    global _LISTENER  # pylint: disable=global-statement
+    _LISTENER = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _LISTENER.start()
+    return _LISTENER
+
+
+def shutdown() -> None:
+    """Write the queued records and stop the listener thread"""
+    global _LISTENER  # pylint: disable=global-statement
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+atexit.register(shutdown)
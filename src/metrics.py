@@ -0,0 +1,258 @@
+"""
+Per-stage latency metrics
+
+Named spans time a stage of the itinerary pipeline (LLM generation, geocoding,
+each Places call, candidate filtering, the end to end search). Every span
+name keeps a latency histogram, a window of recent latencies for
+p50/p95/p99, the bytes received, retries and a count per outcome (ok, error,
+cache_hit, ...). Spans nest through a context variable, so code deep in a
+call (e.g. `call_api`) reports bytes, retries and outcomes to the innermost
+open span without it being passed down.
+
+`METRICS` is shared by the whole process and can be exported as Prometheus
+text (`to_prometheus`, `serve_prometheus`) or as a JSON snapshot (`snapshot`).
+"""
+
+import asyncio
+import bisect
+import collections
+import contextlib
+import contextvars
+import functools
+import http.server
+import itertools
+import threading
+import time
+import typing as T
+
+import numpy as np
+
+from constants import METRICS_LATENCY_BUCKETS_SECONDS, METRICS_MAX_SAMPLES
+
+OK = "ok"
+ERROR = "error"
+PROMETHEUS_PREFIX = "triptap_span"
+
+Func = T.TypeVar("Func", bound=T.Callable[..., T.Any])
+
+
+class Span:
+    """One timed run of a stage, updated by the code running inside it"""
+
+    __slots__ = ("name", "outcome", "bytes_received", "retries")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.outcome = OK
+        self.bytes_received = 0
+        self.retries = 0
+
+
+class SpanStats:
+    def __init__(self, buckets: T.Sequence[float], max_samples: int) -> None:
+        self.buckets = buckets
+        # Non-cumulative, the last one counts latencies above every bucket
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes_received = 0
+        self.retries = 0
+        self.outcomes: T.Counter[str] = collections.Counter()
+        self.samples: T.Deque[float] = collections.deque(maxlen=max_samples)
+
+    def add(self, span: Span, seconds: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes_received += span.bytes_received
+        self.retries += span.retries
+        self.outcomes[span.outcome] += 1
+        self.samples.append(seconds)
+
+
+_CURRENT_SPAN: contextvars.ContextVar[T.Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Metrics:
+    """Thread-safe registry of span statistics keyed by span name"""
+
+    def __init__(
+        self,
+        buckets: T.Sequence[float] = METRICS_LATENCY_BUCKETS_SECONDS,
+        max_samples: int = METRICS_MAX_SAMPLES,
+    ) -> None:
+        self.buckets = sorted(buckets)
+        self.max_samples = max_samples
+        self._stats: T.Dict[str, SpanStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: Span, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats.get(span.name)
+            if stats is None:
+                stats = SpanStats(self.buckets, self.max_samples)
+                self._stats[span.name] = stats
+            stats.add(span, seconds)
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> T.Iterator[Span]:
+        """Time the block, an exception escaping it sets the outcome to `error`"""
+        span = Span(name)
+        token = _CURRENT_SPAN.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException:
+            span.outcome = ERROR
+            raise
+        finally:
+            _CURRENT_SPAN.reset(token)
+            self.record(span, time.perf_counter() - start)
+
+    def timed(self, name: str) -> T.Callable[[Func], Func]:
+        """Decorator running each call of a function or coroutine function in a span"""
+
+        def decorator(func: Func) -> Func:
+            if asyncio.iscoroutinefunction(func):
+
+                @functools.wraps(func)
+                async def async_wrapper(*args: T.Any, **kwargs: T.Any) -> T.Any:
+                    with self.span(name):
+                        return await func(*args, **kwargs)
+
+                return T.cast(Func, async_wrapper)
+
+            @functools.wraps(func)
+            def wrapper(*args: T.Any, **kwargs: T.Any) -> T.Any:
+                with self.span(name):
+                    return func(*args, **kwargs)
+
+            return T.cast(Func, wrapper)
+
+        return decorator
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def snapshot(self) -> T.Dict[str, T.Dict[str, T.Any]]:
+        """JSON serializable summary per span name, percentiles cover the recent samples"""
+        snapshot = {}
+        with self._lock:
+            for name, stats in sorted(self._stats.items()):
+                p50, p95, p99 = np.percentile(np.array(stats.samples), [50, 95, 99]).tolist()
+                snapshot[name] = {
+                    "count": stats.count,
+                    "sum_seconds": stats.sum_seconds,
+                    "mean_seconds": stats.sum_seconds / stats.count,
+                    "p50_seconds": p50,
+                    "p95_seconds": p95,
+                    "p99_seconds": p99,
+                    "max_seconds": stats.max_seconds,
+                    "bytes_received": stats.bytes_received,
+                    "retries": stats.retries,
+                    "outcomes": dict(stats.outcomes),
+                }
+        return snapshot
+
+    def to_prometheus(self) -> str:
+        """The spans in the Prometheus text exposition format"""
+        seconds = [
+            f"# HELP {PROMETHEUS_PREFIX}_seconds Latency of instrumented pipeline stages",
+            f"# TYPE {PROMETHEUS_PREFIX}_seconds histogram",
+        ]
+        received = [
+            f"# HELP {PROMETHEUS_PREFIX}_bytes_received_total Response bytes received in a stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_bytes_received_total counter",
+        ]
+        retries = [
+            f"# HELP {PROMETHEUS_PREFIX}_retries_total Retried requests in a stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_retries_total counter",
+        ]
+        outcomes = [
+            f"# HELP {PROMETHEUS_PREFIX}_outcomes_total Finished stages by outcome",
+            f"# TYPE {PROMETHEUS_PREFIX}_outcomes_total counter",
+        ]
+
+        with self._lock:
+            for name, stats in sorted(self._stats.items()):
+                label = f'span="{_escape(name)}"'
+                bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+                for bound, cumulative in zip(bounds, itertools.accumulate(stats.bucket_counts)):
+                    seconds.append(
+                        f'{PROMETHEUS_PREFIX}_seconds_bucket{{{label},le="{bound}"}} {cumulative}'
+                    )
+                seconds.append(f"{PROMETHEUS_PREFIX}_seconds_sum{{{label}}} {stats.sum_seconds}")
+                seconds.append(f"{PROMETHEUS_PREFIX}_seconds_count{{{label}}} {stats.count}")
+                received.append(
+                    f"{PROMETHEUS_PREFIX}_bytes_received_total{{{label}}} {stats.bytes_received}"
+                )
+                retries.append(f"{PROMETHEUS_PREFIX}_retries_total{{{label}}} {stats.retries}")
+                for outcome, count in sorted(stats.outcomes.items()):
+                    outcomes.append(
+                        f"{PROMETHEUS_PREFIX}_outcomes_total"
+                        f'{{{label},outcome="{_escape(outcome)}"}} {count}'
+                    )
+
+        return "\n".join(seconds + received + retries + outcomes) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def current_span() -> T.Optional[Span]:
+    return _CURRENT_SPAN.get()
+
+
+def set_outcome(outcome: str) -> None:
+    """Set the outcome of the innermost open span, if any"""
+    span = _CURRENT_SPAN.get()
+    if span is not None:
+        span.outcome = outcome
+
+
+def add_bytes_received(size: int) -> None:
+    span = _CURRENT_SPAN.get()
+    if span is not None:
+        span.bytes_received += size
+
+
+def add_retry() -> None:
+    span = _CURRENT_SPAN.get()
+    if span is not None:
+        span.retries += 1
+
+
+def serve_prometheus(
+    port: int, host: str = "0.0.0.0", metrics: T.Optional["Metrics"] = None
+) -> http.server.ThreadingHTTPServer:
+    """Serve `GET /metrics` on a daemon thread, call `shutdown()` on the result to stop it"""
+    registry = metrics or METRICS
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: T.Any) -> None:  # pylint: disable=arguments-differ
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Shared by every instrumented stage in the process
+METRICS = Metrics()
@@ -0,0 +1,79 @@
+"""
+End to end itinerary planning: LLM generation followed by Places lookups
+"""
+
+import typing as T
+
+from langchain.prompts import PromptTemplate
+
+from google.geocode import get_city_center_coordinates
+from google.search import (
+    ItineraryPlaceDetailsType,
+    NearbyPlaceDetailsType,
+    PlaceDetails,
+    SearchPlaces,
+)
+from google.utils import Coordinates
+from llm.defs import ITINERARY_PROMPT_TEMPLATE
+from llm.search import OpenAiSearch
+from llm.utils import activities_to_itinerary
+
+
+class PlannedTrip(T.NamedTuple):
+    itinerary: T.Dict[str, T.List[str]]
+    itinerary_place_details: ItineraryPlaceDetailsType
+    nearby_place_details: NearbyPlaceDetailsType
+    city_coordinates: Coordinates
+    total_api_calls: int
+
+
+def plan_trip_streaming(
+    llm: OpenAiSearch,
+    search: SearchPlaces,
+    inputs: T.Dict[str, str],
+    prompt: PromptTemplate = ITINERARY_PROMPT_TEMPLATE,
+    radius_meters: int = 1500,
+) -> PlannedTrip:
+    """
+    Generate an itinerary for `inputs` and resolve its places, starting the
+    Google lookups for each activity as soon as the LLM has finished writing it
+    so the end to end latency is close to max(LLM, Places) rather than the sum.
+    The nearby searches of a day are planned together once the LLM moves on
+    to the next day, as `SearchPlaces.search` plans the whole itinerary's.
+
+    Results are in itinerary order and `itinerary` is in the column-wise
+    `Itinerary` format returned by `OpenAiSearch.search`.
+    """
+    city = inputs["location"]
+
+    city_coordinates = get_city_center_coordinates(city)
+
+    if not city_coordinates:
+        raise ValueError(f"Unable to get coordinates for city: {city}")
+
+    activities: T.List[T.Dict[str, str]] = []
+
+    def entries() -> T.Iterator[T.Tuple[str, T.Tuple[str, str, str]]]:
+        for activity in llm.stream_activities(inputs, prompt):
+            activities.append(activity)
+            yield str(activity.get("day", "")), (
+                str(activity.get("location", "")),
+                str(activity.get("description", "")),
+                str(activity.get("activity_type", "")),
+            )
+
+    place_details: T.Dict[int, PlaceDetails] = dict(
+        search.iter_search_entries(city, entries(), radius_meters=radius_meters)
+    )
+
+    itinerary_place_details, nearby_place_details = SearchPlaces.collect_place_details(
+        place_details[index] for index in sorted(place_details)
+    )
+
+    return PlannedTrip(
+        activities_to_itinerary(activities),
+        itinerary_place_details,
+        nearby_place_details,
+        city_coordinates,
+        sum(search.total_api_calls.values()),
+    )
@@ -0,0 +1,170 @@
+"""
+Client side rate limiting
+"""
+
+import asyncio
+import email.utils
+import random
+import threading
+import time
+import typing as T
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at `rate` per second up to `capacity`. `acquire` reserves
+    tokens under the lock and sleeps outside of it, so concurrent callers are
+    served in arrival order and the long run rate never exceeds `rate`.
+    """
+
+    def __init__(self, rate: float, capacity: T.Optional[float] = None) -> None:
+        assert rate > 0.0, "Rate must be positive"
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self, tokens: float) -> float:
+        """Take `tokens` (possibly going into debt) and return how long to wait"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0.0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available and return the time spent waiting"""
+        wait_seconds = self._reserve(tokens)
+        if wait_seconds > 0.0:
+            time.sleep(wait_seconds)
+        return wait_seconds
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        wait_seconds = self._reserve(tokens)
+        if wait_seconds > 0.0:
+            await asyncio.sleep(wait_seconds)
+        return wait_seconds
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket per endpoint with additive-increase / multiplicative-decrease
+    rate control.
+
+    Each throttled response halves the endpoint's rate (down to `min_rate`) and
+    each successful one adds `recovery_step` back (up to the configured rate),
+    so sustained throughput settles just under the server side quota.
+    """
+
+    def __init__(
+        self,
+        rates: T.Dict[str, float],
+        default_rate: float,
+        min_rate: float = 1.0,
+        recovery_step: float = 0.1,
+    ) -> None:
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step
+        self._buckets: T.Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, endpoint: str) -> TokenBucket:
+        with self._lock:
+            if endpoint not in self._buckets:
+                self._buckets[endpoint] = TokenBucket(self.rates.get(endpoint, self.default_rate))
+            return self._buckets[endpoint]
+
+    def set_rate(self, endpoint: str, rate: float) -> None:
+        """Change the configured rate of an endpoint, e.g. to lift it for a local stub server"""
+        with self._lock:
+            self.rates[endpoint] = rate
+        self.bucket(endpoint).set_rate(rate)
+
+    def acquire(self, endpoint: str) -> float:
+        return self.bucket(endpoint).acquire()
+
+    async def acquire_async(self, endpoint: str) -> float:
+        return await self.bucket(endpoint).acquire_async()
+
+    def on_throttled(self, endpoint: str) -> None:
+        bucket = self.bucket(endpoint)
+        bucket.set_rate(max(self.min_rate, bucket.rate / 2.0))
+
+    def on_success(self, endpoint: str) -> None:
+        bucket = self.bucket(endpoint)
+        max_rate = self.rates.get(endpoint, self.default_rate)
+        if bucket.rate < max_rate:
+            bucket.set_rate(min(max_rate, bucket.rate + self.recovery_step))
+
+
+class RetryBudget:
+    """Thread-safe cap on the number of retries spent by one unit of work"""
+
+    def __init__(self, max_retries: int) -> None:
+        self.max_retries = max_retries
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.spent >= self.max_retries:
+                return False
+            self.spent += 1
+            return True
+
+
+def parse_retry_after(value: T.Optional[str]) -> T.Optional[float]:
+    """Seconds to wait from a Retry-After header, either delay-seconds or an HTTP date"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def backoff_delay(
+    attempt: int,
+    base_delay: float,
+    max_delay: float,
+    retry_after: T.Optional[float] = None,
+) -> float:
+    """
+    Full-jitter exponential backoff for the given (0 based) retry attempt.
+    A server supplied Retry-After is used as the lower bound, capped at `max_delay`.
+    """
+    delay = random.uniform(0.0, min(max_delay, base_delay * (2**attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
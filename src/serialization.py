@@ -0,0 +1,62 @@
+"""
+JSON encoding and decoding for the I/O path
+
+API responses, request bodies, the batch result files, structured logs and the
+SQLite cache tiers all go through here. orjson parses straight from the
+response bytes and encodes to bytes several times faster than the stdlib
+`json`. Output is compact unless `pretty` is set (2 space indent, the only
+indent orjson supports).
+
+Cache keys are still built with the stdlib encoder (see `make_places_cache_key`)
+so the keys of existing SQLite caches do not change.
+"""
+
+import typing as T
+
+import orjson
+
+# Subclass of json.JSONDecodeError (and ValueError)
+JSONDecodeError = orjson.JSONDecodeError
+
+
+def loads(data: T.Union[bytes, bytearray, memoryview, str]) -> T.Any:
+    return orjson.loads(data)
+
+
+def dumps(
+    value: T.Any,
+    pretty: bool = False,
+    sort_keys: bool = False,
+    default: T.Optional[T.Callable[[T.Any], T.Any]] = None,
+) -> bytes:
+    """
+    UTF-8 encoded JSON. `default` converts values orjson cannot serialize
+    (dataclasses, numpy arrays and datetimes are handled natively).
+    """
+    option = orjson.OPT_SERIALIZE_NUMPY
+    if pretty:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(value, default=default, option=option)
+
+
+def dumps_str(
+    value: T.Any,
+    pretty: bool = False,
+    sort_keys: bool = False,
+    default: T.Optional[T.Callable[[T.Any], T.Any]] = None,
+) -> str:
+    return dumps(value, pretty, sort_keys, default).decode("utf-8")
+
+
+def dump(value: T.Any, outfile: T.BinaryIO, pretty: bool = False) -> None:
+    """Write `value` to a file opened in binary mode"""
+    outfile.write(dumps(value, pretty))
+
+
+def dump_line(value: T.Any, outfile: T.BinaryIO) -> None:
+    """Append `value` as one compact JSONL line to a file opened in binary mode"""
+    outfile.write(
+        orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+    )
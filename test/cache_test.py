@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+import cache
+from google.places_cache import PlacesCache, make_places_cache_key
+
+
+class Clock:
+    """Stands in for the `time` module of `cache`"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_lru_cache_expires_entries(clock):
+    lru = cache.LruCache(max_entries=4, ttl_seconds=10.0)
+    lru.put("a", 1)
+    lru.put("b", 2, ttl_seconds=30.0)
+
+    clock.now += 11.0
+    assert lru.get("a") is None
+    assert lru.get("b") == 2
+    assert len(lru) == 1
+
+
+def test_lru_cache_evicts_least_recently_used(clock):  # pylint: disable=unused-argument
+    lru = cache.LruCache(max_entries=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+
+    assert lru.get("b") is None
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+
+
+def test_sqlite_cache_expires_and_persists(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    disk = cache.SqliteCache(path, table="test", ttl_seconds=10.0)
+    disk.put("a", {"value": 1})
+    disk.put("b", {"value": 2}, ttl_seconds=30.0)
+    disk.close()
+
+    clock.now += 11.0
+    reopened = cache.SqliteCache(path, table="test", ttl_seconds=10.0)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == {"value": 2}
+    reopened.close()
+
+
+def test_tiered_cache_promotes_disk_hits(tmp_path, clock):  # pylint: disable=unused-argument
+    path = str(tmp_path / "cache.db")
+    writer = cache.TieredCache(cache.LruCache(), cache.SqliteCache(path, table="test"))
+    writer.put("a", {"value": 1})
+
+    reader = cache.TieredCache(cache.LruCache(), cache.SqliteCache(path, table="test"))
+    assert reader.get("a") == {"value": 1}
+    assert reader.get("a") == {"value": 1}
+    assert reader.get("missing") is None
+    assert reader.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 1}
+    assert reader.hit_rate == pytest.approx(2 / 3)
+
+
+def test_tiered_cache_async_matches_sync(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = cache.TieredCache(cache.LruCache(), cache.SqliteCache(path, table="test"))
+    asyncio.run(writer.put_async("a", {"value": 1}))
+
+    reader = cache.TieredCache(cache.LruCache(), cache.SqliteCache(path, table="test"))
+
+    async def lookups():
+        return [await reader.get_async(key) for key in ["a", "a", "missing"]]
+
+    assert asyncio.run(lookups()) == [{"value": 1}, {"value": 1}, None]
+    assert reader.stats == {"memory_hits": 1, "disk_hits": 1, "misses": 1}
+
+
+def test_places_cache_returns_fresh_dicts():
+    places_cache = PlacesCache()
+    response = {"places": [{"id": "p0", "displayName": {"text": "P0", "languageCode": "en"}}]}
+    places_cache.put("key", response)
+
+    first = places_cache.get("key")
+    assert first == response
+    first["places"].clear()
+    assert places_cache.get("key") == response
+
+
+def test_places_cache_key_normalizes_requests():
+    url = "https://places.googleapis.com/v1/places:searchText"
+
+    def key(query, latitude, fields):
+        body = {
+            "textQuery": query,
+            "locationBias": {
+                "circle": {"center": {"latitude": latitude, "longitude": -80.13}, "radius": 500.0}
+            },
+        }
+        return make_places_cache_key(url, body, fields)
+
+    assert key("Joe's  Stone Crab", 25.78261, "places.id,places.rating") == key(
+        "joe's stone crab", 25.78259, "places.rating, places.id"
+    )
+    assert key("Joe's Stone Crab", 25.78, "places.id") != key(
+        "Joe's Stone Crab", 25.79, "places.id"
+    )
@@ -0,0 +1,60 @@
+import cache
+from google.geocode import Geocoder
+from google.utils import Coordinates
+
+MIAMI = Coordinates(lat=25.7617, lng=-80.1918)
+
+
+class Clock:
+    """Stands in for the `time` module of `cache`"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class FakeLookup:
+    def __init__(self, known):
+        self.known = known
+        self.calls = []
+
+    def __call__(self, city_name):
+        self.calls.append(city_name)
+        return self.known.get(city_name)
+
+
+def test_geocoder_caches_normalized_cities():
+    lookup = FakeLookup({"Miami, FL": MIAMI})
+    geocoder = Geocoder(lookup=lookup, requests_per_second=1e6)
+
+    assert geocoder.get_city_center_coordinates("Miami, FL") == MIAMI
+    assert geocoder.get_city_center_coordinates("  miami,   fl ") == MIAMI
+    assert lookup.calls == ["Miami, FL"]
+
+
+def test_geocoder_caches_misses_for_the_negative_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    lookup = FakeLookup({})
+    geocoder = Geocoder(lookup=lookup, negative_ttl_seconds=60.0, requests_per_second=1e6)
+
+    assert geocoder.get_city_center_coordinates("Atlantis") is None
+    assert geocoder.get_city_center_coordinates("Atlantis") is None
+    assert lookup.calls == ["Atlantis"]
+
+    clock.now += 61.0
+    lookup.known["Atlantis"] = MIAMI
+    assert geocoder.get_city_center_coordinates("Atlantis") == MIAMI
+    assert lookup.calls == ["Atlantis", "Atlantis"]
+
+
+def test_geocoder_persists_to_disk(tmp_path):
+    path = str(tmp_path / "geocode.db")
+    lookup = FakeLookup({"Miami": MIAMI})
+    Geocoder(path, lookup=lookup, requests_per_second=1e6).get_city_center_coordinates("Miami")
+
+    reopened = Geocoder(path, lookup=lookup, requests_per_second=1e6)
+    assert reopened.get_city_center_coordinates("Miami") == MIAMI
+    assert lookup.calls == ["Miami"]
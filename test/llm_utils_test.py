@@ -0,0 +1,30 @@
+from llm.utils import activities_to_itinerary, row_to_activity
+
+
+def test_row_to_activity_names_the_values_in_order():
+    assert row_to_activity(["1", "breakfast", "Corner Cafe", "quick coffee"]) == {
+        "day": "1",
+        "activity_type": "breakfast",
+        "location": "Corner Cafe",
+        "description": "quick coffee",
+    }
+
+
+def test_row_to_activity_pads_short_rows_and_drops_extra_values():
+    assert row_to_activity(["2", "dinner"]) == {
+        "day": "2",
+        "activity_type": "dinner",
+        "location": "",
+        "description": "",
+    }
+    assert row_to_activity(["1", "lunch", "Trattoria", "pasta", "extra"])["description"] == "pasta"
+
+
+def test_activities_to_itinerary_is_column_wise():
+    rows = [["1", "breakfast", "Corner Cafe", "coffee"], ["1", "dinner", "Prime Grill", "steak"]]
+    assert activities_to_itinerary(row_to_activity(row) for row in rows) == {
+        "day": ["1", "1"],
+        "activity_type": ["breakfast", "dinner"],
+        "location": ["Corner Cafe", "Prime Grill"],
+        "description": ["coffee", "steak"],
+    }
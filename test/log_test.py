@@ -0,0 +1,81 @@
+import io
+import json
+import logging
+
+import pytest
+
+import log
+
+
+@pytest.fixture(name="stream")
+def fixture_stream():
+    stream = io.StringIO()
+    yield stream
+    log.shutdown()
+
+
+def test_brace_message_formats_positional_arguments():
+    assert str(log.BraceMessage("Found {} places near {}", (3, "P0"))) == "Found 3 places near P0"
+    assert str(log.BraceMessage("{:.2f}s", (1.234,))) == "1.23s"
+
+
+def test_brace_message_without_arguments_is_left_as_is():
+    assert str(log.BraceMessage("Literal {braces}", ())) == "Literal {braces}"
+
+
+def test_brace_message_formats_a_dict_argument():
+    stats = {"hedged": 2, "won": 1}
+    assert str(log.BraceMessage("Text search hedging: {}", (stats,))) == (
+        f"Text search hedging: {stats}"
+    )
+
+
+def test_logger_writes_a_dict_argument(stream):
+    log.configure("DEBUG", stream=stream)
+    log.get_logger("test").info("Generated {}", {"activities": []})
+    log.shutdown()
+    assert "Generated {'activities': []}" in stream.getvalue()
+    assert "Logging error" not in stream.getvalue()
+
+
+def test_disabled_levels_are_not_formatted(stream):
+    class Unformattable:
+        def __format__(self, spec):
+            raise AssertionError("formatted")
+
+    log.configure("INFO", stream=stream)
+    log.get_logger("test").debug("Hidden {}", Unformattable())
+    log.shutdown()
+    assert stream.getvalue() == ""
+
+
+def test_per_module_levels(stream):
+    log.configure("DEBUG", {"quiet": "WARNING"}, stream=stream)
+    log.get_logger("quiet").info("hidden")
+    log.get_logger("loud").info("shown")
+    log.shutdown()
+    assert "hidden" not in stream.getvalue()
+    assert "triptap.loud: shown" in stream.getvalue()
+
+
+def test_loggers_are_standard_loggers():
+    assert log.get_logger("google.search").logger is logging.getLogger("triptap.google.search")
+
+
+def test_structured_records_keep_extra_fields(stream):
+    log.configure("INFO", structured=True, stream=stream)
+    log.get_logger("test").info("Finished {}", "r1", extra={"request_id": "r1"})
+    log.shutdown()
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Finished r1"
+    assert entry["request_id"] == "r1"
+    assert entry["logger"] == "triptap.test"
+
+
+def test_parse_levels():
+    assert log.parse_levels("google.places_api=debug, llm=WARNING,") == {
+        "google.places_api": "DEBUG",
+        "llm": "WARNING",
+    }
+    with pytest.raises(ValueError):
+        log.parse_levels("google")
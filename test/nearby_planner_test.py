@@ -0,0 +1,93 @@
+import math
+
+from google import nearby_planner
+from google.nearby_planner import AreaDensity, NearbyRequest
+
+METERS_PER_DEGREE = 111320.0
+RESTAURANT = ("restaurant",)
+
+
+def request(north_meters, radius_meters=500.0, included_types=RESTAURANT):
+    latitude = 25.78 + north_meters / METERS_PER_DEGREE
+    return NearbyRequest(latitude, -80.13, radius_meters, included_types)
+
+
+def place(north_meters, name="p"):
+    return {
+        "id": name,
+        "location": {"latitude": 25.78 + north_meters / METERS_PER_DEGREE, "longitude": -80.13},
+    }
+
+
+def test_overlapping_requests_with_the_same_types_are_merged():
+    requests = [request(0), request(600), request(5000), request(300, included_types=("bar",))]
+    queries = nearby_planner.plan_nearby_queries(requests)
+    assert [query.members for query in queries] == [[0, 1], [2], [3]]
+    merged = queries[0]
+    assert math.isclose(merged.radius_meters, 800.0, rel_tol=0.01)
+    assert merged.included_types == RESTAURANT
+
+
+def test_merges_stay_within_the_maximum_radius():
+    requests = [request(0), request(900)]
+    queries = nearby_planner.plan_nearby_queries(requests, max_radius_meters=800.0)
+    assert [query.members for query in queries] == [[0], [1]]
+
+
+def test_split_results_keeps_the_places_inside_each_circle_in_order():
+    requests = [request(0), request(600)]
+    query = nearby_planner.plan_nearby_queries(requests)[0]
+    places = [place(300, "both"), place(-400, "first"), place(1000, "second")]
+    assert nearby_planner.split_results(query, places, requests) == {
+        0: [places[0], places[1]],
+        1: [places[0], places[2]],
+    }
+
+
+def test_truncated_merged_queries_fall_back_to_their_members():
+    requests = [request(0), request(600), request(5000)]
+    queries = nearby_planner.plan_nearby_queries(requests)
+    truncated = [place(0, str(index)) for index in range(nearby_planner.NEARBY_MAX_RESULTS)]
+    single = [place(5000, "alone")]
+    nearby, fallback = nearby_planner.assign_results(queries, [truncated, single], requests)
+    assert fallback == [0, 1]
+    assert nearby == {2: single}
+
+
+def test_requests_are_not_merged_without_a_known_density():
+    requests = [request(0), request(600)]
+    queries = nearby_planner.plan_nearby_queries(requests, density=AreaDensity())
+    assert [query.members for query in queries] == [[0], [1]]
+
+
+def test_requests_are_merged_where_earlier_responses_were_sparse():
+    density = AreaDensity()
+    requests = [request(0), request(600)]
+    for item in requests:
+        density.record(item, 2)
+    queries = nearby_planner.plan_nearby_queries(requests, density=density)
+    assert [query.members for query in queries] == [[0, 1]]
+
+
+def test_truncated_responses_stop_merging_in_their_area():
+    density = AreaDensity()
+    requests = [request(0), request(600)]
+    queries = nearby_planner.plan_nearby_queries(requests)
+    truncated = [place(0, str(index)) for index in range(nearby_planner.NEARBY_MAX_RESULTS)]
+    nearby_planner.assign_results(queries, [truncated], requests, density)
+    query = queries[0]
+    assert (
+        density.expected_results(query.latitude, query.longitude, query.radius_meters, requests)
+        == math.inf
+    )
+    assert len(nearby_planner.plan_nearby_queries(requests, density=density)) == 2
+
+
+def test_expected_results_scale_with_the_circle_area():
+    density = AreaDensity()
+    density.record(request(0, radius_meters=1000.0), 10)
+    circle = request(0)
+    expected = density.expected_results(25.78, -80.13, 500.0, [circle])
+    assert expected is not None and math.isclose(expected, 2.5)
+    other_types = request(0, included_types=("bar",))
+    assert density.expected_results(25.78, -80.13, 500.0, [other_types]) is None
@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from google.place import BusinessStatus, Place, PlacesResponse, PriceLevel
+
+FIXTURES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "src",
+    "benchmarks",
+    "fixtures",
+    "south_beach_places.json",
+)
+
+
+def load_responses():
+    with open(FIXTURES, "rb") as infile:
+        return json.load(infile)
+
+
+def test_places_responses_round_trip():
+    for response in load_responses():
+        assert PlacesResponse.from_json(response).to_json() == response
+
+
+def test_place_is_parsed_into_fields():
+    place = Place.from_json(
+        {
+            "id": "p0",
+            "displayName": {"text": "Joe's", "languageCode": "en"},
+            "location": {"latitude": 25.77, "longitude": -80.13},
+            "businessStatus": "OPERATIONAL",
+            "priceLevel": "PRICE_LEVEL_EXPENSIVE",
+            "types": ["restaurant", "food"],
+            "editorialSummary": {"text": "Stone crabs", "languageCode": "en"},
+            "goodForChildren": True,
+        }
+    )
+    assert place.display_name == "Joe's"
+    assert (place.latitude, place.longitude) == (25.77, -80.13)
+    assert place.business_status is BusinessStatus.OPERATIONAL
+    assert place.price_level is PriceLevel.PRICE_LEVEL_EXPENSIVE
+    assert place.types == ("restaurant", "food")
+    assert place.editorial_summary == "Stone crabs"
+    assert place.good_for_children is True
+    assert place.extras is None
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        {"id": "p0", "displayName": {}},
+        {"id": "p0", "displayName": {"text": "No language"}},
+        {"id": "p0", "businessStatus": "SOMETHING_NEW", "priceLevel": "PRICE_LEVEL_NEW"},
+        {"id": "p0", "location": {"latitude": 25.77}},
+        {"id": "p0", "types": "restaurant", "rating": None},
+        {"id": "p0", "currentOpeningHours": {"openNow": True}},
+    ],
+)
+def test_unexpected_shapes_round_trip(data):
+    assert Place.from_json(data).to_json() == data
+
+
+@pytest.mark.parametrize(
+    "data", [{}, {"nextPageToken": "t"}, {"places": [], "nextPageToken": "t"}, {"places": "?"}]
+)
+def test_places_response_keeps_other_keys(data):
+    assert PlacesResponse.from_json(data).to_json() == data
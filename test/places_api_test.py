@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from google.places_api import AsyncSingleFlight
+
+
+def test_async_single_flight_shares_one_call():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"places": []}
+
+    async def run():
+        return await asyncio.gather(*[flight.do("key", fetch) for _ in range(4)])
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True, True]
+    assert all(response == {"places": []} for response, _ in results)
+    assert flight.coalesced_calls == 3
+
+
+def test_async_single_flight_shares_exceptions():
+    flight = AsyncSingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def run():
+        return await asyncio.gather(
+            *[flight.do("key", fail) for _ in range(2)], return_exceptions=True
+        )
+
+    assert [type(result) for result in asyncio.run(run())] == [ValueError, ValueError]
+    with pytest.raises(ValueError):
+        asyncio.run(flight.do("alone", fail))
+
+
+def test_async_single_flight_survives_a_cancelled_follower():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        leader = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0.005)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == ("done", False)
@@ -0,0 +1,102 @@
+import random
+
+import numpy as np
+import pytest
+
+from google import ranking
+from google.search import SearchPlaces
+
+TYPES = ["restaurant", "bar", "cafe", "museum", None]
+STATUSES = ["OPERATIONAL", "CLOSED_TEMPORARILY", None]
+
+
+def baseline_filter(original, nearby_places):
+    """The nearby filtering the search started from: accept, then same primary type first"""
+    accepted = [
+        place for place in nearby_places if SearchPlaces.is_acceptable_location(original, place)
+    ]
+    primary_type = original.get("primaryType")
+    return [place for place in accepted if place.get("primaryType") == primary_type] + [
+        place for place in accepted if place.get("primaryType") != primary_type
+    ]
+
+
+def random_place(rng, place_id):
+    place = {"id": place_id}
+    if rng.random() < 0.9:
+        place["rating"] = round(rng.uniform(2.5, 5.0), 1)
+    if rng.random() < 0.9:
+        place["userRatingCount"] = rng.randint(0, 400)
+    status = rng.choice(STATUSES)
+    if status is not None:
+        place["businessStatus"] = status
+    primary_type = rng.choice(TYPES)
+    if primary_type is not None:
+        place["primaryType"] = primary_type
+    if rng.random() < 0.9:
+        place["location"] = {
+            "latitude": 25.78 + rng.uniform(-0.01, 0.01),
+            "longitude": -80.13 + rng.uniform(-0.01, 0.01),
+        }
+    return place
+
+
+def random_groups(seed, groups=20):
+    rng = random.Random(seed)
+    result = []
+    for group in range(groups):
+        original = random_place(rng, f"g{group}")
+        original["types"] = rng.sample([t for t in TYPES if t is not None], 2)
+        nearby = [random_place(rng, f"g{group}p{index}") for index in range(rng.randint(0, 15))]
+        if nearby and rng.random() < 0.3:
+            # The original place is often in its own nearby results
+            nearby.insert(rng.randrange(len(nearby)), dict(original))
+        result.append((original, nearby))
+    return result
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_default_order_matches_the_baseline(seed):
+    groups = random_groups(seed)
+    accepted, rejected = ranking.filter_and_rank(groups)
+
+    for (original, nearby), kept, dropped in zip(groups, accepted, rejected):
+        assert kept == baseline_filter(original, nearby)
+        assert len(kept) + len(dropped) == len(nearby)
+        assert SearchPlaces.filter_nearby_places(original, nearby) == kept
+
+
+def test_default_order_with_a_cap_keeps_the_baseline_prefix():
+    for original, nearby in random_groups(7):
+        assert SearchPlaces.filter_nearby_places(original, nearby, max_places=3) == (
+            baseline_filter(original, nearby)[:3]
+        )
+
+
+def test_weighted_order_is_by_descending_score():
+    groups = random_groups(11)
+    weights = ranking.RankingWeights()
+    accepted, _ = ranking.filter_and_rank(groups, weights=weights, k=4)
+
+    for (original, nearby), kept in zip(groups, accepted):
+        expected = baseline_filter(original, nearby)
+        assert len(kept) == min(4, len(expected))
+        assert {place["id"] for place in kept} <= {place["id"] for place in expected}
+
+        scores = ranking.score(ranking.NearbyCandidates.from_groups([(original, kept)]), weights)
+        assert np.all(np.diff(scores) <= 1e-12)
+
+
+def test_score_defaults_to_the_configured_weights():
+    candidates = ranking.NearbyCandidates.from_groups(random_groups(3, groups=3))
+    np.testing.assert_array_equal(
+        ranking.score(candidates), ranking.score(candidates, ranking.RankingWeights())
+    )
+
+
+def test_empty_groups():
+    assert ranking.filter_and_rank([]) == ([], [])
+    assert ranking.filter_and_rank([({"id": "a"}, [])], weights=ranking.RankingWeights()) == (
+        [[]],
+        [[]],
+    )
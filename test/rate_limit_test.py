@@ -0,0 +1,115 @@
+import asyncio
+import email.utils
+import time
+
+import pytest
+
+import rate_limit
+
+
+class Clock:
+    """Stands in for the `time` module of `rate_limit`, asyncio keeps the real clock"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    @staticmethod
+    def time():
+        return time.time()
+
+
+@pytest.fixture(name="clock")
+def fixture_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_up_to_capacity(clock):  # pylint: disable=unused-argument
+    bucket = rate_limit.TokenBucket(rate=2.0, capacity=3.0)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_refills_at_rate(clock):
+    bucket = rate_limit.TokenBucket(rate=2.0, capacity=2.0)
+    assert bucket.try_acquire(2.0)
+    assert not bucket.try_acquire()
+
+    clock.now += 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+    clock.now += 10.0
+    assert bucket.try_acquire(2.0)
+    assert not bucket.try_acquire()
+
+
+def test_token_bucket_acquire_waits_in_arrival_order(clock):
+    bucket = rate_limit.TokenBucket(rate=4.0, capacity=1.0)
+    waits = [bucket._reserve(1.0) for _ in range(3)]  # pylint: disable=protected-access
+    assert waits == pytest.approx([0.0, 0.25, 0.5])
+
+    clock.now += 10.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.25)
+    assert clock.slept == pytest.approx([0.25])
+
+
+def test_token_bucket_acquire_async(clock):  # pylint: disable=unused-argument
+    bucket = rate_limit.TokenBucket(rate=1000.0, capacity=1.0)
+
+    async def acquire_twice():
+        return [await bucket.acquire_async() for _ in range(2)]
+
+    assert asyncio.run(acquire_twice()) == pytest.approx([0.0, 0.001])
+
+
+def test_adaptive_rate_limiter_backs_off_and_recovers(clock):  # pylint: disable=unused-argument
+    limiter = rate_limit.AdaptiveRateLimiter({"searchText": 8.0}, default_rate=4.0, min_rate=1.0)
+    assert limiter.bucket("searchText").rate == 8.0
+    assert limiter.bucket("other").rate == 4.0
+
+    for _ in range(5):
+        limiter.on_throttled("searchText")
+    assert limiter.bucket("searchText").rate == 1.0
+
+    for _ in range(1000):
+        limiter.on_success("searchText")
+    assert limiter.bucket("searchText").rate == 8.0
+
+
+def test_retry_budget():
+    budget = rate_limit.RetryBudget(2)
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.spent == 2
+
+
+@pytest.mark.parametrize("attempt", range(6))
+def test_backoff_delay_is_full_jitter_capped(attempt):
+    delays = [rate_limit.backoff_delay(attempt, 0.5, 4.0) for _ in range(200)]
+    assert all(0.0 <= delay <= min(4.0, 0.5 * 2**attempt) for delay in delays)
+
+
+def test_backoff_delay_respects_retry_after():
+    assert rate_limit.backoff_delay(0, 0.5, 16.0, retry_after=3.0) >= 3.0
+    assert rate_limit.backoff_delay(0, 0.5, 16.0, retry_after=60.0) == 16.0
+
+
+def test_parse_retry_after():
+    assert rate_limit.parse_retry_after(None) is None
+    assert rate_limit.parse_retry_after("") is None
+    assert rate_limit.parse_retry_after(" 7 ") == 7.0
+    assert rate_limit.parse_retry_after("soon") is None
+
+    in_a_minute = email.utils.formatdate(time.time() + 60.0, usegmt=True)
+    assert rate_limit.parse_retry_after(in_a_minute) == pytest.approx(60.0, abs=5.0)
+    past = email.utils.formatdate(time.time() - 60.0, usegmt=True)
+    assert rate_limit.parse_retry_after(past) == 0.0
@@ -0,0 +1,117 @@
+import json
+import typing as T
+
+import pytest
+
+from executables import run_trip_tap
+
+
+def write_lines(path, results, tail=b""):
+    with open(path, "wb") as outfile:
+        for result in results:
+            outfile.write(json.dumps(result).encode("utf-8") + b"\n")
+        outfile.write(tail)
+
+
+def read_lines(path):
+    with open(path, "rb") as infile:
+        return [json.loads(line) for line in infile]
+
+
+def requests_for(*request_ids):
+    return [(request_id, {"location": f"City {request_id}"}) for request_id in request_ids]
+
+
+def run_batch(path, request_ids, retry_failed=False):
+    # `run_request` is faked, so no LLM or search is needed
+    return run_trip_tap.run_batch(
+        T.cast(T.Any, None),
+        T.cast(T.Any, None),
+        requests_for(*request_ids),
+        str(path),
+        concurrency=2,
+        radius_meters=1500,
+        retry_failed=retry_failed,
+    )
+
+
+@pytest.fixture(name="fake_run_request")
+def fixture_fake_run_request(monkeypatch):
+    failing: T.Set[str] = set()
+    ran = []
+
+    def run_request(llm, search, request, radius_meters):  # pylint: disable=unused-argument
+        request_id, inputs = request
+        ran.append(request_id)
+        if request_id in failing:
+            raise ValueError(f"Unable to get coordinates for city: {inputs['location']}")
+        return {"id": request_id, "inputs": inputs, "itinerary": {}}
+
+    monkeypatch.setattr(run_trip_tap, "run_request", run_request)
+    return failing, ran
+
+
+def test_load_checkpoint_without_output_file(tmp_path):
+    assert not run_trip_tap.load_checkpoint(str(tmp_path / "missing.jsonl"))
+
+
+def test_load_checkpoint_resumes_from_written_ids(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_lines(path, [{"id": "a"}, {"id": 2}, {"id": "c", "error": "ValueError()"}])
+    assert run_trip_tap.load_checkpoint(str(path)) == {"a", "2", "c"}
+    assert run_trip_tap.load_checkpoint(str(path), retry_failed=True) == {"a", "2"}
+
+
+def test_load_checkpoint_truncates_incomplete_tail(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_lines(path, [{"id": "a"}], tail=b'{"id": "b", "itin')
+    assert run_trip_tap.load_checkpoint(str(path)) == {"a"}
+    assert path.read_bytes() == b'{"id": "a"}\n'
+
+
+def test_run_batch_skips_done_requests(tmp_path, fake_run_request):
+    _, ran = fake_run_request
+    path = tmp_path / "results.jsonl"
+    write_lines(path, [{"id": "a"}], tail=b'{"id": "b"')
+
+    counts = run_batch(path, ["a", "b"])
+
+    assert counts == {"succeeded": 1, "failed": 0, "skipped": 1}
+    assert ran == ["b"]
+    assert [result["id"] for result in read_lines(path)] == ["a", "b"]
+
+
+def test_run_batch_retry_replaces_error_lines(tmp_path, fake_run_request):
+    failing, ran = fake_run_request
+    path = tmp_path / "results.jsonl"
+    failing.update({"b", "c"})
+    run_batch(path, ["a", "b", "c"])
+    assert sorted(result["id"] for result in read_lines(path) if "error" in result) == ["b", "c"]
+
+    failing.discard("b")
+    ran.clear()
+    counts = run_batch(path, ["a", "b", "c"], retry_failed=True)
+
+    assert counts == {"succeeded": 1, "failed": 1, "skipped": 1}
+    assert sorted(ran) == ["b", "c"]
+    results = {result["id"]: result for result in read_lines(path)}
+    assert len(read_lines(path)) == 3
+    assert "error" not in results["b"]
+    assert "error" in results["c"]
+
+
+def test_drop_superseded_errors_keeps_the_last_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_lines(
+        path,
+        [
+            {"id": "a", "error": "first"},
+            {"id": "b"},
+            {"id": "a", "error": "second"},
+            {"id": "a"},
+            {"id": "c", "error": "only"},
+        ],
+    )
+    assert run_trip_tap.drop_superseded_errors(str(path)) == 2
+    assert read_lines(path) == [{"id": "b"}, {"id": "a"}, {"id": "c", "error": "only"}]
+    assert run_trip_tap.drop_superseded_errors(str(path)) == 0